@@ -2,4 +2,12 @@
 from .classes import *
 from .functions import *
 from .test_tools import User, spin_users, stop_users, list_users
-from .grid_maker import Grid_maker, grid_from_poly
\ No newline at end of file
+from .grid_maker import Grid_maker, grid_from_poly
+from .async_handler import AsyncHandler, listen_all, serve_tables
+from .handler_pool import HandlerPool
+from .change_sources import ChangeSource, PollingChangeSource, PushChangeSource, SSEChangeSource, WebSocketChangeSource
+from .poll_policies import PollPolicy, RestModePolicy, BackoffPolicy
+from .geometry import GeometryStore
+from .graph import GridGraph
+from .heatmap import merge_heatmaps, HeatmapFrame
+from .codecs import JSONCodec, OrjsonCodec, UjsonCodec, get_codec
@@ -0,0 +1,421 @@
+import asyncio
+import requests
+import webbrowser
+import traceback
+from warnings import warn
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from .classes import Handler
+from .change_sources import PollingChangeSource
+from .helpers import urljoin
+try:
+	import aiohttp
+except:
+	aiohttp = None
+
+_request_errors = (requests.exceptions.RequestException,OSError,asyncio.TimeoutError)+((aiohttp.ClientError,) if aiohttp is not None else ())
+
+class AsyncHandler(Handler):
+	'''
+	Asyncio version of :class:`brix.Handler`.
+	Polling, GEOGRID and GEOGRIDDATA fetches, and indicator posts are coroutines, which allows one process to serve many tables on a single event loop.
+	Indicators are added using the same API as :class:`brix.Handler` (see :func:`brix.Handler.add_indicator`), but :func:`brix.AsyncHandler.update_package`, :func:`brix.AsyncHandler.perform_update`, and :func:`brix.AsyncHandler.listen` are coroutines.
+
+	If `aiohttp` is installed, requests are made without blocking the event loop.
+	Otherwise, requests are made with the pooled session of :class:`brix.Handler` in a small thread pool shared by all AsyncHandlers.
+	Indicators are always computed in an executor, so that a slow indicator does not stall polling for other tables.
+	Changes are detected by the change source of the handler (see :func:`brix.Handler.set_change_source`): the default polling source is awaited on the event loop, while push sources wait for their messages in the default executor of the loop, taking one of its threads per table.
+
+	Parameters
+	----------
+	table_name : str
+		Table name to lisen to.
+	executor : concurrent.futures.Executor, optional
+		Executor used to compute the indicators and update GEOGRIDDATA.
+		Defaults to a thread pool shared by all AsyncHandlers. See :func:`brix.AsyncHandler.get_default_executor`.
+		The AsyncHandler never shuts it down. Requests use a separate pool (see :func:`brix.AsyncHandler.get_io_executor`), and the indicators of the table are computed in the pool given by `executor_mode` (see :func:`brix.Handler.get_indicator_executor`).
+	**kwargs :
+		Other keyword arguments are passed to :class:`brix.Handler`.
+
+	Example
+	-------
+	>>> H1 = AsyncHandler('table_one')
+	>>> H1.add_indicator(MyIndicator())
+	>>> H2 = AsyncHandler('table_two')
+	>>> H2.add_indicator(MyIndicator())
+	>>> serve_tables([H1,H2])
+	'''
+	io_workers = 16
+	_default_executor = None
+	_io_executor = None
+	_client_sessions = {}
+
+	def __init__(self,table_name,executor=None,**kwargs):
+		super(AsyncHandler, self).__init__(table_name,**kwargs)
+		self.update_executor = executor
+		self.listening = False
+		self.show_front = False
+
+	@classmethod
+	def get_default_executor(cls):
+		'''
+		Returns the thread pool used to compute indicators when no executor is passed to the AsyncHandler.
+		'''
+		if cls._default_executor is None:
+			cls._default_executor = ThreadPoolExecutor(thread_name_prefix='brix-async-updates')
+		return cls._default_executor
+
+	@classmethod
+	def get_io_executor(cls):
+		'''
+		Returns the thread pool used to make requests when `aiohttp` is not installed.
+		'''
+		if cls._io_executor is None:
+			cls._io_executor = ThreadPoolExecutor(max_workers=cls.io_workers,thread_name_prefix='brix-io')
+		return cls._io_executor
+
+	@classmethod
+	async def close_client_sessions(cls):
+		'''
+		Closes all `aiohttp` sessions opened by AsyncHandlers.
+		'''
+		for client_session in cls._client_sessions.values():
+			await client_session.close()
+		cls._client_sessions = {}
+
+	async def _get_client_session(self):
+		'''
+		Returns the `aiohttp` session for the running loop, shared between AsyncHandlers that point at the same host.
+		'''
+		loop = asyncio.get_running_loop()
+		key = (id(loop),self.host,self.pool_size,self.keep_alive)
+		client_session = self._client_sessions.get(key)
+		if (client_session is None) or client_session.closed:
+			connector = aiohttp.TCPConnector(limit_per_host=self.pool_size,force_close=(not self.keep_alive))
+			client_session = aiohttp.ClientSession(connector=connector)
+			self._client_sessions[key] = client_session
+		return client_session
+
+	async def _run(self,func,*args,**kwargs):
+		'''
+		Runs the given function in the executor used to compute indicators.
+		'''
+		loop = asyncio.get_running_loop()
+		executor = self.update_executor if self.update_executor is not None else self.get_default_executor()
+		return await loop.run_in_executor(executor,partial(func,*args,**kwargs))
+
+	async def _arequest(self,method,url,data=None,params=None,headers=None):
+		'''
+		Makes a request without blocking the event loop.
+
+		Returns
+		-------
+		status_code : int
+			Status code of the response.
+		content : bytes
+			Body of the response.
+		headers : dict
+			Headers of the response.
+		'''
+		if aiohttp is not None:
+			client_session = await self._get_client_session()
+			timeout = aiohttp.ClientTimeout(total=self.timeout)
+			async with client_session.request(method,url,data=data,params=params,headers=headers,timeout=timeout) as r:
+				content = await r.read()
+				return r.status,content,r.headers
+		else:
+			loop = asyncio.get_running_loop()
+			request = partial(self.session.request,method,url,data=data,params=params,headers=headers,timeout=self.timeout)
+			r = await loop.run_in_executor(self.get_io_executor(),request)
+			return r.status_code,r.content,r.headers
+
+	async def _aget_url(self,url,params=None,raise_warning=True,headers=None,decode=True):
+		'''
+		Coroutine version of :func:`brix.Handler._get_url`.
+
+		Returns
+		-------
+		status_code : int
+			Status code of the last attempt.
+		content : dict or list
+			Decoded body of the response, or `None` if the request failed.
+			If `decode` is `False`, the raw body and the headers of the response are returned instead.
+		'''
+		attempts = 0
+		while attempts < self.nAttempts:
+			if not self.quietly:
+				print(url,'Attempt:',attempts)
+			status_code,content,response_headers = await self._arequest('GET',url,params=params,headers=self._request_headers(headers))
+			self._count_received(url,content,response_headers)
+			if status_code in [200,304]:
+				if not decode:
+					return status_code,(content,response_headers)
+				return status_code,(self.codec.loads(content) if status_code==200 else None)
+			attempts+=1
+		if raise_warning:
+			warn('FAILED TO RETRIEVE URL: '+url)
+		return status_code,(None if decode else (None,{}))
+
+	async def _aget_json(self,url,varname=None,decode_unchanged=True):
+		'''
+		Coroutine version of :func:`brix.Handler._get_json`.
+		'''
+		skip,headers,hash_id = self._conditional_headers(url,varname)
+		if skip:
+			status_code,content,response_headers = 304,None,{}
+		else:
+			status_code,(content,response_headers) = await self._aget_url(url,headers=headers,decode=False)
+		return self._handle_conditional(url,status_code,content,response_headers,hash_id,decode_unchanged=decode_unchanged)
+
+	async def _apost_url(self,url,data=None,headers=None):
+		'''
+		Coroutine version of :func:`brix.Handler._post_url`.
+		'''
+		if headers is None:
+			headers = self.post_headers
+		body,headers = self._encode_body(url,data,headers)
+		status_code,content,response_headers = await self._arequest('POST',url,data=body,headers=headers)
+		return status_code
+
+	async def aget_grid_hash(self):
+		'''
+		Coroutine version of :func:`brix.Handler.get_grid_hash`.
+		'''
+		self.poll_policy.on_poll()
+		try:
+			status_code,hashes = await self._aget_url(urljoin(self.cityIO_get_url,'meta/hashes'))
+		except _request_errors as e:
+			warn('Cant access cityIO hashes: '+str(e))
+			self.poll_policy.on_error()
+			return self.grid_hash_id
+		if status_code==200:
+			self.poll_policy.on_success()
+			grid_hash_id = self._parse_grid_hash(hashes)
+		else:
+			warn('Cant access cityIO hashes')
+			self.poll_policy.on_error()
+			grid_hash_id = self.grid_hash_id
+		return grid_hash_id
+
+	async def aget_GEOGRID(self,force_get=False):
+		'''
+		Coroutine version of :func:`brix.Handler.get_GEOGRID`.
+		'''
+		if (self.GEOGRID is None)|force_get:
+			status_code,geogrid = await self._aget_json(urljoin(self.cityIO_get_url,self.GEOGRID_varname),self.GEOGRID_varname,decode_unchanged=(self.GEOGRID is None))
+			if geogrid is not None:
+				self._set_GEOGRID(geogrid)
+			elif status_code!=304:
+				warn('WARNING: Cant access GEOGRID')
+		return self.GEOGRID
+
+	async def aget_GEOGRIDDATA(self):
+		'''
+		Coroutine version of :func:`brix.Handler.get_GEOGRIDDATA`.
+		'''
+		status_code,geogrid_data = await self._aget_json(urljoin(self.cityIO_get_url,self.GEOGRIDDATA_varname),self.GEOGRIDDATA_varname)
+		if status_code not in [200,304]:
+			warn('WARNING: Cant access GEOGRIDDATA')
+		return geogrid_data
+
+	async def aget_geogrid_data(self,include_geometries=False,with_properties=False):
+		'''
+		Coroutine version of :func:`brix.Handler.get_geogrid_data`.
+		'''
+		geogrid_data = await self.aget_GEOGRIDDATA()
+		await self.aget_GEOGRID()
+		return await self._run(self._build_grid_data,geogrid_data,include_geometries=include_geometries,with_properties=with_properties)
+
+	async def update_package(self,geogrid_data=None,append=False):
+		'''
+		Coroutine version of :func:`brix.Handler.update_package`.
+		Indicators are computed in the executor of the AsyncHandler.
+		'''
+		if geogrid_data is None:
+			geogrid_data = await self.aget_geogrid_data()
+		new_values = await self._run(self._evaluate_indicators,geogrid_data)
+
+		if append:
+			current_numeric = None
+			current_access  = None
+			if len(new_values['numeric'])!=0:
+				status_code,current_numeric = await self._aget_url(urljoin(self.cityIO_get_url,'indicators'))
+			if len(new_values['heatmap'])!=0:
+				status_code,current_access  = await self._aget_url(urljoin(self.cityIO_get_url,'access'))
+			self._append_current(new_values,current_numeric,current_access)
+
+		return await self._run(self._package_values,new_values)
+
+	async def perform_update(self,grid_hash_id=None,append=False,return_update_package=False):
+		'''
+		Coroutine version of :func:`brix.Handler.perform_update`.
+		'''
+		if grid_hash_id is None:
+			grid_hash_id = await self.aget_grid_hash()
+		if not self.quietly:
+			print('Updating table with hash:',grid_hash_id)
+
+		new_values = await self.update_package(append=append)
+
+		if self._count_values(new_values)==0:
+			if not self.quietly:
+				print('No values to update')
+		else:
+			await self._apost_indicators(new_values)
+			if not self.quietly:
+				print('Done with update')
+		self.grid_hash_id = grid_hash_id
+		if not self.quietly:
+			print('Local grid hash:',grid_hash_id)
+		if return_update_package:
+			return new_values
+
+	async def _apost_indicators(self,new_values,post_empty=False):
+		'''
+		Coroutine version of :func:`brix.Handler._post_indicators`.
+		All endpoints are posted concurrently.
+		'''
+		posts = self._changed_posts(self._indicator_posts(new_values,post_empty=post_empty))
+		status_codes = await asyncio.gather(*[self._apost_url(url,data=data) for url,data in posts])
+		for (url,data),status_code in zip(posts,status_codes):
+			self._record_post(url,data,status_code)
+
+	async def _aupdate(self,grid_hash_id):
+		'''
+		Updates GEOGRIDDATA (if needed) and all indicators after a change in the grid.
+		'''
+		if await self._run(self.perform_geogrid_data_update):
+			grid_hash_id = await self.aget_grid_hash()
+		await self.perform_update(grid_hash_id=grid_hash_id,append=self.append_on_post)
+
+	async def listen(self,showFront=False,append=False,clear_endpoints=False,robust=False):
+		'''
+		Coroutine version of :func:`brix.Handler.listen`.
+		Listens for changes in the table's geogrid and update all indicators accordingly until :func:`brix.AsyncHandler.stop` is called.
+		To listen to many tables at once, see :func:`brix.listen_all`.
+
+		Parameters
+		----------
+		showFront : boolean, defaults to `False`
+			If `True` it will open the front-end URL in a webbrowser at start.
+		append : boolean, defaults to `False`
+			If `True` it will append the new indicators to whatever is already there.
+		clear_endpoints : boolean, defaults to `False`
+			If `True`, it will clear all existing heatmap, numeric, and textual indicators.
+		robust : boolean, defaults to `False`
+			If `True`, whenever a grid configuration breaks an indicator, the module will not stop, but rather wait until the grid changes and try to update again.
+		'''
+		unlinked_indicators = self.list_all_unlinked_indicators()
+		if len(unlinked_indicators)>0:
+			unlinked_indicators = ', '.join(unlinked_indicators)
+			warn(f'You have unlinked indicators: {unlinked_indicators}')
+		self.append_on_post = append
+		self.robust = robust
+		self.listening = True
+		if clear_endpoints:
+			await self._apost_indicators({'numeric': None,'heatmap': None,'textual': None},post_empty=True)
+
+		if not self.quietly:
+			print('Table URL:',self.front_end_url)
+			print('Testing indicators')
+		await self.aget_GEOGRID()
+		await self._run(self.test_indicators)
+
+		if not self.quietly:
+			print('Performing initial update')
+		await self._aupdate(None)
+
+		if showFront:
+			webbrowser.open(self.front_end_url, new=2)
+		self.change_source.start()
+		self.grid_hash_id = await self.aget_grid_hash()
+		try:
+			while self.listening:
+				grid_hash_id = await self._await_change()
+				if not self.listening:
+					break
+				if grid_hash_id!=self.grid_hash_id:
+					self.wake_up()
+					if not robust:
+						await self._aupdate(grid_hash_id)
+					else:
+						try:
+							await self._aupdate(grid_hash_id)
+						except Exception:
+							warn('I was not able to update grid with hash: '+str(grid_hash_id))
+							warn(traceback.format_exc())
+							warn('Waiting until a new grid appears')
+							self.grid_hash_id = grid_hash_id
+				else:
+					self.check_rest()
+		finally:
+			self.change_source.close()
+
+	async def _await_change(self):
+		'''
+		Coroutine version of :func:`brix.ChangeSource.wait_for_change` for the change source of the handler.
+		'''
+		if isinstance(self.change_source,PollingChangeSource):
+			await asyncio.sleep(self.sleep_time())
+			return await self.aget_grid_hash()
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(None,self.change_source.wait_for_change,self.grid_hash_id)
+
+	def stop(self):
+		'''
+		Stops :func:`brix.AsyncHandler.listen` after the current iteration and closes the change source.
+		'''
+		self.listening = False
+		self.change_source.close()
+
+	def listen_in_thread(self,showFront=False,append=False,clear_endpoints=False,robust=False):
+		'''
+		Runs :func:`brix.AsyncHandler.listen` with its own event loop in a separate thread.
+		Equivalent to ``brix.Handler.listen(new_thread=True)``. Parameters are the same as :func:`brix.AsyncHandler.listen`.
+		'''
+		self.show_front = showFront
+		self.append_on_post = append
+		self.robust = robust
+		if clear_endpoints:
+			self.clear_endpoints()
+		self.start()
+
+	def run(self):
+		'''
+		Run method to be called by :func:`threading.Thread.start`.
+		It runs :func:`brix.AsyncHandler.listen` in a new event loop, with the options stored in the handler (see :func:`brix.AsyncHandler.listen_in_thread`).
+		'''
+		asyncio.run(self.listen(showFront=self.show_front,append=self.append_on_post,robust=self.robust))
+
+async def listen_all(handlers,**kwargs):
+	'''
+	Listens to all the given tables on the running event loop.
+	A table that fails does not stop the others.
+
+	Parameters
+	----------
+	handlers : list
+		List of :class:`brix.AsyncHandler` objects.
+	**kwargs :
+		Keyword arguments passed to :func:`brix.AsyncHandler.listen`.
+	'''
+	results = await asyncio.gather(*[H.listen(**kwargs) for H in handlers],return_exceptions=True)
+	for H,result in zip(handlers,results):
+		if isinstance(result,Exception):
+			warn(f'Table {H.table_name} stopped listening: {result}')
+	if aiohttp is not None:
+		await AsyncHandler.close_client_sessions()
+
+def serve_tables(handlers,**kwargs):
+	'''
+	Blocking entry point that listens to all the given tables on one event loop.
+	See :func:`brix.listen_all`.
+
+	Parameters
+	----------
+	handlers : list
+		List of :class:`brix.AsyncHandler` objects.
+	**kwargs :
+		Keyword arguments passed to :func:`brix.AsyncHandler.listen`.
+	'''
+	asyncio.run(listen_all(handlers,**kwargs))
@@ -0,0 +1,252 @@
+import json
+from time import sleep
+from warnings import warn
+from threading import Thread, Event, Lock
+try:
+	import websocket
+except:
+	websocket = None
+
+class ChangeSource:
+	'''
+	Parent class of the objects that tell a :class:`brix.Handler` when the grid changed.
+	:func:`brix.Handler.listen` calls :func:`brix.ChangeSource.wait_for_change` in a loop and updates the indicators every time the returned hash differs from the current one.
+
+	To build a new source, define a subclass and override :func:`brix.ChangeSource.wait_for_change`.
+	'''
+	def __init__(self):
+		self.H = None
+
+	def attach(self,H):
+		'''
+		Links the source to the :class:`brix.Handler` that will use it.
+		'''
+		self.H = H
+
+	def start(self):
+		'''
+		Called by :func:`brix.Handler.listen` before the first call to :func:`brix.ChangeSource.wait_for_change`.
+		'''
+		pass
+
+	def wait_for_change(self,grid_hash_id):
+		'''
+		Blocks until the grid might have changed and returns the current hash of GEOGRIDDATA.
+
+		Parameters
+		----------
+		grid_hash_id : str
+			Hash of the last state of the grid processed by the Handler.
+
+		Returns
+		-------
+		grid_hash_id : str
+			Current hash of GEOGRIDDATA. If it is equal to the one passed, the Handler does nothing.
+		'''
+		raise NotImplementedError
+
+	def close(self):
+		'''
+		Releases any connection opened by the source.
+		'''
+		pass
+
+class PollingChangeSource(ChangeSource):
+	'''
+	Polls the meta/hashes endpoint of the table every :func:`brix.Handler.sleep_time` seconds.
+	This is the default change source of :class:`brix.Handler`.
+	'''
+	def wait_for_change(self,grid_hash_id):
+		sleep(self.H.sleep_time())
+		return self.H.get_grid_hash()
+
+class PushChangeSource(ChangeSource):
+	'''
+	Parent class of the sources that receive change notifications from a server.
+	Messages are read in a background thread and :func:`brix.PushChangeSource.wait_for_change` returns as soon as one arrives.
+	If no message is received for `fallback_interval` seconds, the hashes are polled once, so that a dropped connection never hides a change for long.
+
+	Messages can either contain the hashes of the table (the same dictionary returned by meta/hashes), or anything else.
+	In the second case, the hashes are requested from cityIO after receiving the message.
+
+	Parameters
+	----------
+	url : str
+		Url to subscribe to.
+	fallback_interval : float, defaults to 30
+		Maximum time, in seconds, to wait for a message before polling the hashes.
+	reconnect_delay : float, defaults to 1
+		Time, in seconds, to wait before reconnecting when the connection drops.
+	'''
+	def __init__(self,url,fallback_interval=30,reconnect_delay=1):
+		super(PushChangeSource, self).__init__()
+		self.url = url
+		self.fallback_interval = fallback_interval
+		self.reconnect_delay = reconnect_delay
+		self.connected = False
+		self._changed = Event()
+		self._closed = Event()
+		self._lock = Lock()
+		self._latest_hash = None
+		self._thread = None
+
+	def start(self):
+		if (self._thread is None) or (not self._thread.is_alive()):
+			self._closed.clear()
+			self._thread = Thread(target=self._read,daemon=True)
+			self._thread.start()
+
+	def _stream(self):
+		'''
+		Generator that connects to the server and yields the body of every message received.
+		'''
+		raise NotImplementedError
+
+	def _read(self):
+		'''
+		Reads messages until the source is closed, reconnecting if the connection drops.
+		'''
+		while not self._closed.is_set():
+			try:
+				for message in self._stream():
+					if self._closed.is_set():
+						break
+					self.on_message(message)
+			except Exception as e:
+				if not self._closed.is_set():
+					warn(f'Change source disconnected from {self.url}: {e}')
+			self.connected = False
+			self._closed.wait(self.reconnect_delay)
+
+	def _on_connect(self):
+		'''
+		Changes made while disconnected are not notified, so the hashes are checked after every (re)connection.
+		'''
+		self.connected = True
+		self._changed.set()
+
+	def on_message(self,message):
+		'''
+		Handles one message received from the server.
+		'''
+		grid_hash_id = None
+		try:
+			hashes = json.loads(message)
+		except:
+			hashes = None
+		if isinstance(hashes,dict) and (self.H.GEOGRIDDATA_varname in hashes):
+			grid_hash_id = self.H._parse_grid_hash(hashes)
+		with self._lock:
+			self._latest_hash = grid_hash_id
+		self._changed.set()
+
+	def wait_for_change(self,grid_hash_id):
+		if not self._changed.wait(self.fallback_interval):
+			return self.H.get_grid_hash()
+		self._changed.clear()
+		with self._lock:
+			latest_hash = self._latest_hash
+			self._latest_hash = None
+		if latest_hash is None:
+			latest_hash = self.H.get_grid_hash()
+		return latest_hash
+
+	def close(self):
+		self._closed.set()
+		self._changed.set()
+
+class SSEChangeSource(PushChangeSource):
+	'''
+	Subscribes to a server-sent events stream.
+	Each event is handled as a message (see :class:`brix.PushChangeSource`).
+	It uses the pooled session of the :class:`brix.Handler` (see :func:`brix.Handler.get_session`).
+	If the stream stays silent for longer than `fallback_interval`, the connection is reopened.
+
+	Parameters
+	----------
+	url : str
+		Url of the event stream.
+	events : list, optional
+		Event types to listen to. If not provided, all events are considered changes.
+	**kwargs :
+		Other keyword arguments are passed to :class:`brix.PushChangeSource`.
+	'''
+	def __init__(self,url,events=None,**kwargs):
+		super(SSEChangeSource, self).__init__(url,**kwargs)
+		self.events = events
+
+	def _stream(self):
+		headers = {'Accept':'text/event-stream','Cache-Control':'no-cache'}
+		with self.H.session.get(self.url,headers=headers,stream=True,timeout=(self.H.timeout,self.fallback_interval)) as r:
+			if r.status_code!=200:
+				raise NameError(f'Event stream returned status code {r.status_code}')
+			self._on_connect()
+			event_type = 'message'
+			data = []
+			# Events are small: reading one byte at a time makes sure they are handled as soon as they arrive
+			for line in r.iter_lines(chunk_size=1,decode_unicode=True):
+				if self._closed.is_set():
+					break
+				if line is None:
+					continue
+				if line=='':
+					if (len(data)!=0) and ((self.events is None) or (event_type in self.events)):
+						yield '\n'.join(data)
+					event_type = 'message'
+					data = []
+				elif line.startswith(':'):
+					continue
+				else:
+					field,_,value = line.partition(':')
+					value = value[1:] if value.startswith(' ') else value
+					if field=='data':
+						data.append(value)
+					elif field=='event':
+						event_type = value
+
+class WebSocketChangeSource(PushChangeSource):
+	'''
+	Subscribes to a websocket.
+	Each message received is handled as a change (see :class:`brix.PushChangeSource`).
+	Requires the `websocket-client` package.
+
+	Parameters
+	----------
+	url : str
+		Url of the websocket (ws:// or wss://).
+	subscribe_message : dict or str, optional
+		Message sent right after connecting, for servers that need a subscription.
+	**kwargs :
+		Other keyword arguments are passed to :class:`brix.PushChangeSource`.
+	'''
+	def __init__(self,url,subscribe_message=None,**kwargs):
+		if websocket is None:
+			raise NameError('WebSocketChangeSource requires websocket-client. Install it with: pip install websocket-client')
+		super(WebSocketChangeSource, self).__init__(url,**kwargs)
+		self.subscribe_message = subscribe_message
+		self._ws = None
+
+	def _stream(self):
+		self._ws = websocket.create_connection(self.url,timeout=self.H.timeout)
+		try:
+			if self.subscribe_message is not None:
+				message = self.subscribe_message
+				self._ws.send(message if isinstance(message,str) else json.dumps(message))
+			self._ws.settimeout(None)
+			self._on_connect()
+			while not self._closed.is_set():
+				message = self._ws.recv()
+				if message is None or message=='':
+					break
+				yield message
+		finally:
+			self._ws.close()
+			self._ws = None
+
+	def close(self):
+		super(WebSocketChangeSource, self).close()
+		if self._ws is not None:
+			try:
+				self._ws.close()
+			except:
+				pass
@@ -1,18 +1,27 @@
 import requests
 import webbrowser
 import json
-import pygeohash as pgh
 import joblib
 import numpy as np
 import pandas as pd
 import geopandas as gpd
 import hashlib
+import gzip
 import weakref
+import pickle
 from warnings import warn
-from time import sleep, time as right_now
-from collections import defaultdict
+from time import time as right_now
+from collections import defaultdict, OrderedDict
+from collections.abc import MutableMapping
 from .helpers import is_number, get_buffer_size, urljoin, get_timezone_offset
-from threading import Thread
+from .change_sources import ChangeSource, PollingChangeSource
+from .poll_policies import PollPolicy, RestModePolicy
+from .geometry import GeometryStore
+from .heatmap import merge_heatmaps, HeatmapFrame
+from .codecs import get_codec, is_json_value
+from threading import Thread, Lock, get_ident, local
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from shapely.ops import unary_union
 from shapely.geometry import shape
 from copy import deepcopy
@@ -22,6 +31,15 @@ except:
 	warn('Networkx not found.')
 import traceback
 
+def _copy_on_write():
+	'''
+	Returns `True` if the copy-on-write mode of pandas is enabled.
+	'''
+	try:
+		return bool(pd.get_option('mode.copy_on_write'))
+	except Exception:
+		return False
+
 class GEOGRIDDATA(list):
 	'''
 	Class to package the input needed by each indicator. 
@@ -37,11 +55,12 @@ class GEOGRIDDATA(list):
 		super(GEOGRIDDATA, self).__init__()
 		if isinstance(geogrid_data,dict):
 			raise NameError('Invalid GEOGRIDDATA endpoint. You need to update your grid at least once. See Handler.reset_geogrid_data()')
-		for e in geogrid_data:
-			self.append(e)
+		list.extend(self,geogrid_data)
 		self.geogrid_props = None
 		self.GEOGRID = None
 		self.GEOGRID_EDGES = None
+		self.geometry_store = None
+		self.type_table = None
 		self.classification_list = []
 		self.df = None
 		self.graph = None
@@ -66,8 +85,30 @@ class GEOGRIDDATA(list):
 		self.set_geogrid(tableHandler.get_GEOGRID())
 
 	def set_geogrid(self,GEOGRID):
+		if GEOGRID is not self.GEOGRID:
+			self.geometry_store = None
+			self.type_table = None
 		self.GEOGRID = GEOGRID
 
+	def set_geometry_store(self,geometry_store):
+		self.geometry_store = geometry_store
+
+	def get_geometry_store(self):
+		'''
+		Returns the :class:`brix.GeometryStore` of the GEOGRID of this object.
+		Requires that GEOGRID is set.
+
+		Returns
+		-------
+		geometry_store : :class:`brix.GeometryStore`
+			Parsed geometries of GEOGRID.
+		'''
+		if self.geometry_store is None:
+			if self.GEOGRID is None:
+				raise NameError('GEOGRIDDATA object does not have GEOGRID attribute.')
+			self.geometry_store = GeometryStore(self.GEOGRID)
+		return self.geometry_store
+
 	def set_geogrid_edges(self,GEOGRID_EDGES):
 		self.GEOGRID_EDGES = GEOGRID_EDGES
 
@@ -87,6 +128,179 @@ class GEOGRIDDATA(list):
 			if 'geometry' in cell.keys():
 				del cell['geometry']
 
+	def attach_geometries(self):
+		'''
+		Adds the geometry of the corresponding feature of GEOGRID to each cell, in place.
+		Cells are matched with the features of GEOGRID by position.
+		'''
+		if self.GEOGRID is None:
+			raise NameError('GEOGRIDDATA object does not have GEOGRID attribute.')
+		for cell,feature in zip(self,self.GEOGRID['features']):
+			cell['geometry'] = feature['geometry']
+
+	def attach_properties(self):
+		'''
+		Adds the properties of the type of each cell, as defined in GEOGRID (including static types), in place.
+		Cells of unknown types are left unchanged.
+		'''
+		types_def = self._types_properties()
+		for cell in self:
+			if cell['name'] in types_def:
+				cell['properties'] = types_def[cell['name']]
+
+	def _types_properties(self):
+		'''
+		Returns the dictionary of the properties of each type, including the static types of GEOGRID. The type 'None' maps to `None`.
+		'''
+		if self.GEOGRID is None:
+			raise NameError('GEOGRIDDATA object does not have GEOGRID attribute.')
+		geogrid_props = self.GEOGRID['properties']
+		types_def = geogrid_props['types'].copy()
+		if 'static_types' in geogrid_props:
+			types_def.update(geogrid_props['static_types'])
+		types_def['None'] = None
+		return types_def
+
+	def with_inputs(self,include_geometries=False,with_properties=False):
+		'''
+		Returns the object an indicator with the given requirements should receive (see :attr:`brix.Indicator.requires_geometry` and :attr:`brix.Indicator.requires_geogrid_props`).
+		If nothing is required, it returns the object itself.
+		Otherwise, it returns a copy of the cells with geometries and/or type properties attached, sharing GEOGRID and the other attributes of the object.
+		The geometries and properties are the objects stored in GEOGRID, and :class:`brix.Handler` shares each copy among several indicators, so it should be treated as read-only.
+		'''
+		if not (include_geometries or with_properties):
+			return self
+		view = self._copy_cells()
+		if include_geometries:
+			view.attach_geometries()
+		if with_properties:
+			view.attach_properties()
+		return view
+
+	def _copy_cells(self):
+		'''
+		Returns a new object with a copy of each cell and the same attributes (GEOGRID, geometry store, type table, ...), without the cached frames and graph.
+		'''
+		new = GEOGRIDDATA([dict(cell) for cell in self])
+		new.__dict__.update({k:v for k,v in self.__dict__.items() if k not in ['_frames','graph']})
+		return new
+
+	def _for_worker(self):
+		'''
+		Returns a light object with the same cells and without GEOGRID or anything built from it, to be sent to the process pool of :class:`brix.Handler`.
+		The worker restores GEOGRID from the copy it received when it started (see :func:`brix.classes._init_indicator_worker`).
+		'''
+		new = self.__class__.__new__(self.__class__)
+		new.__dict__.update({k:v for k,v in self.__dict__.items() if k not in ['_frames','graph']})
+		new.__dict__.update({'GEOGRID':None,'GEOGRID_EDGES':None,'geometry_store':None,'type_table':None,'graph':None,'_worker_GEOGRID':True})
+		new.df = None
+		list.extend(new,self)
+		return new
+
+	def content_hash(self):
+		'''
+		Returns a hash of the dynamic content of the grid.
+		Geometries and properties are ignored since they are taken from GEOGRID.
+		Two objects with the same cells return the same hash, regardless of how they were obtained.
+
+		Returns
+		-------
+		content_hash : str
+			md5 hash of the cells.
+		'''
+		cells = [{k:cell[k] for k in cell if k not in ['geometry','properties']} for cell in self]
+		return hashlib.md5(json.dumps(cells,sort_keys=True,default=str).encode('utf-8')).hexdigest()
+
+	def snapshot(self):
+		'''
+		Returns a light copy of the cells, without geometries or properties, to be compared later using :func:`brix.GEOGRIDDATA.diff`.
+		'''
+		return [{k:cell[k] for k in cell if k not in ['geometry','properties']} for cell in self]
+
+	def diff(self,other):
+		'''
+		Returns the ids of the cells that changed with respect to a previous state of the grid.
+		Geometries and properties are ignored.
+
+		Parameters
+		----------
+		other : list
+			Previous state of the grid, either a :class:`brix.GEOGRIDDATA` object or the result of :func:`brix.GEOGRIDDATA.snapshot`.
+
+		Returns
+		-------
+		changed_cells : list
+			List of ids of the cells that changed. Returns `None` if both grids do not have the same cells, in which case they cannot be compared cell by cell.
+		'''
+		if (other is None) or (len(other)!=len(self)):
+			return None
+		changed_cells = []
+		for cell,old_cell in zip(self,other):
+			if cell.get('id')!=old_cell.get('id'):
+				return None
+			for k in set(cell.keys())|set(old_cell.keys()):
+				if (k not in ['geometry','properties']) and (cell.get(k)!=old_cell.get(k)):
+					changed_cells.append(cell.get('id'))
+					break
+		return changed_cells
+
+	def to_records(self):
+		'''
+		Returns the cells as a list of plain dictionaries, ready to be serialized.
+		'''
+		return [dict(cell) for cell in self]
+
+	def ids_array(self):
+		'''
+		Returns the ids of the cells as a numpy array.
+		'''
+		return np.array([cell['id'] for cell in self],dtype=np.int64)
+
+	def types_array(self):
+		'''
+		Returns the types of the cells as a :class:`pandas.Categorical`.
+		Use :func:`brix.GEOGRIDDATA.type_codes_array` and :func:`brix.GEOGRIDDATA.type_categories` to work with integer codes instead.
+		'''
+		return pd.Categorical([cell['name'] for cell in self])
+
+	def type_codes_array(self):
+		'''
+		Returns the type of each cell as an integer code. See :func:`brix.GEOGRIDDATA.type_categories`.
+		'''
+		return np.asarray(self.types_array().codes)
+
+	def type_categories(self):
+		'''
+		Returns the list of types, ordered by the codes returned by :func:`brix.GEOGRIDDATA.type_codes_array`.
+		'''
+		return list(self.types_array().categories)
+
+	def heights_array(self):
+		'''
+		Returns the heights of the cells as a numpy array. Cells without height are set to `nan`.
+		'''
+		return np.array([cell.get('height',np.nan) for cell in self],dtype=float)
+
+	def interactive_array(self):
+		'''
+		Returns a boolean numpy array that is `True` for the interactive cells (interactive set to Web).
+		'''
+		return np.array([cell.get('interactive')=='Web' for cell in self],dtype=bool)
+
+	def colors_array(self):
+		'''
+		Returns the colors of the cells as a numpy array with one RGBA row per cell.
+		Cells without transparency get an alpha of 255, and cells without color get zeros.
+		'''
+		colors = np.zeros((len(self),4),dtype=np.uint8)
+		for i,cell in enumerate(self):
+			color = cell.get('color')
+			if color is not None:
+				colors[i,:len(color)] = color[:4]
+				if len(color)==3:
+					colors[i,3] = 255
+		return colors
+
 	def get_geogrid_props(self):
 		'''
 		Get the value of :attr:`brix.Handler.geogrid_props` from the corresponding :class:`brix.Handler`.
@@ -144,14 +358,14 @@ class GEOGRIDDATA(list):
 		'''
 		Checks if all ids are in GEOGRIDDATA or if some are missing by comparing the number of unique ids of the current object with the grid size as return by :func:`brix.GEOGRIDDATA.grid_size`.
 		Does not raise an error, but returns a boolean. 
-		See :func:`brix.GEOGRIDDATA.fill_missing_cells`
+		See :func:`brix.GEOGRIDDATA.fill_missing_cells` and :func:`brix.GEOGRIDDATA.validate`
 
 		Returns
 		-------
 		validity: boolean
 			If `False`, the number of unique ids does not match the grid size. 
 		'''
-		n_unique_ids = len(set([cell['id'] for cell in self]))
+		n_unique_ids = len(set(self._cell_ids()))
 		if n_unique_ids==self.grid_size():
 			return True
 		else:
@@ -165,40 +379,113 @@ class GEOGRIDDATA(list):
 
 		This is useful when working only with interactive cells.
 		'''
-		available_ids = [cell['id'] for cell in self]
-		for cell in self.GEOGRID['features']:
-			cell = cell['properties']
-			if cell['id'] not in available_ids:
-				self.append(cell)
+		self.validate(fill_missing=True)
+
+	def _cell_ids(self):
+		'''
+		Returns the list of ids of the cells.
+		'''
+		return [cell['id'] for cell in self]
+
+	def _cell_types(self):
+		'''
+		Returns the set of types used by the cells.
+		'''
+		return set([cell['name'] for cell in self])
+
+	def validate(self,fill_missing=False):
+		'''
+		Checks the ids and types of the cells against GEOGRID in a single pass.
+		Requires that GEOGRID is set.
+
+		Parameters
+		----------
+		fill_missing: boolean, defaults to `False`
+			If `True`, cells of GEOGRID that are missing from the object are appended to it, taking their values from GEOGRID.
+
+		Returns
+		-------
+		report: dict
+			Dictionary with the following keys:
+
+			- `valid_ids`: `True` if the number of unique ids matches the grid size (see :func:`brix.GEOGRIDDATA.check_id_validity`).
+			- `valid_types`: `True` if all the types are defined in GEOGRID (see :func:`brix.GEOGRIDDATA.check_type_validity`).
+			- `valid`: `True` if both ids and types are valid.
+			- `missing_ids`: ids of GEOGRID that are not in the object (before filling).
+			- `duplicate_ids`: ids that appear more than once.
+			- `unknown_ids`: ids that are not in GEOGRID.
+			- `unknown_types`: types that are not defined in GEOGRID.
+			- `filled`: number of cells added from GEOGRID.
+		'''
+		if self.GEOGRID is None:
+			raise NameError('GEOGRIDDATA object does not have GEOGRID attribute.')
+		features = self.GEOGRID['features']
+		grid_index = {cell['properties']['id']:i for i,cell in enumerate(features)}
+
+		seen = set()
+		duplicate_ids = []
+		unknown_ids = []
+		for cell_id in self._cell_ids():
+			if cell_id in seen:
+				duplicate_ids.append(cell_id)
+			else:
+				seen.add(cell_id)
+				if cell_id not in grid_index:
+					unknown_ids.append(cell_id)
+		missing_ids = [cell_id for cell_id in grid_index if cell_id not in seen]
+		unknown_types = sorted(self._cell_types().difference(self.get_type_set()),key=str)
+
+		filled = 0
+		if fill_missing and (len(missing_ids)!=0):
+			self.extend([dict(features[grid_index[cell_id]]['properties']) for cell_id in missing_ids])
+			filled = len(missing_ids)
+
+		valid_ids = (len(seen)+filled==len(features))
+		valid_types = (len(unknown_types)==0)
+		return {
+			'valid': valid_ids and valid_types,
+			'valid_ids': valid_ids,
+			'valid_types': valid_types,
+			'missing_ids': missing_ids,
+			'duplicate_ids': duplicate_ids,
+			'unknown_ids': unknown_ids,
+			'unknown_types': unknown_types,
+			'filled': filled
+		}
 
 	def remap_colors(self):
 		'''
 		Forces the colors to match the define colors of the cell type.
+		Cells that define a transparency keep it.
 		Requires that GEOGRIDDATA is set.
 		'''
 		if self.GEOGRID is None:
 			raise NameError('GEOGRIDDATA object does not have GEOGRID attribute.')
 		self.check_type_validity()
-		GEOGRID = self.GEOGRID
-		for cell in self:
-			cell_type = cell['name']
-			if cell_type!='None':
-				if 'color' in cell.keys():
-					current_color = cell['color']
-				type_color = GEOGRID['properties']['types'][cell_type]['color']
-				if isinstance(type_color,str):
-					h = type_color.replace('#','')
-					color = list(int(h[i:i+2], 16) for i in (0, 2, 4))
-				elif isinstance(type_color,list):
-					color = type_color[:]
-				if len(current_color)==4:
-					if len(color)==4: # replace type transparency
-						color[3] = current_color[-1]
-					else:
-						color.append(current_color[-1]) #used to handle user-defined transparencies
-				cell['color'] = color
-			else:
-				cell['color'] = [0,0,0,0]
+		table = self.get_type_table()
+		codes = table.codes(self.types_array())
+		missing_colors = set([table.types[c] for c in np.unique(codes[table.color_lengths[codes]==0])])
+		if len(missing_colors)!=0:
+			raise NameError('Some types defined in GEOGRID do not have a color:',missing_colors)
+		colors = table.colors[codes]
+		lengths = table.color_lengths[codes].astype(np.int64)
+		alphas,has_alpha = self._current_alphas()
+		has_alpha &= (codes!=table.index['None'])
+		colors[has_alpha,3] = alphas[has_alpha]
+		lengths[has_alpha] = 4
+		self._assign_colors(colors,lengths)
+
+	def _current_alphas(self):
+		'''
+		Returns the transparency of each cell, and a boolean array that is `True` for the cells that define one.
+		'''
+		colors = [cell.get('color') for cell in self]
+		alphas = np.array([(color[3] if (color is not None) and (len(color)==4) else -1) for color in colors],dtype=np.int64)
+		return alphas,(alphas>=0)
+
+	def _assign_colors(self,colors,lengths):
+		for cell,color,n in zip(self,colors.tolist(),lengths.tolist()):
+			cell['color'] = color[:n]
 
 	def remap_interactive(self):
 		'''
@@ -207,63 +494,116 @@ class GEOGRIDDATA(list):
 		'''
 		if self.GEOGRID is None:
 			raise NameError('GEOGRIDDATA object does not have GEOGRID attribute.')
-		GEOGRID = self.GEOGRID
-		for cell in self:
-			cell_type = cell['name']
-			if cell_type!='None':
-				h = GEOGRID['properties']['types'][cell_type]
-				if 'interactive' in h.keys():
-					cell['interactive'] = h['interactive']
-				else:
-					if 'interactive' in cell.keys():
-						del cell['interactive']
+		table = self.get_type_table()
+		codes = table.codes(self.types_array())
+		self._assign_interactive(table,codes)
+
+	def _assign_interactive(self,table,codes):
+		has_interactive = table.has_interactive[codes].tolist()
+		interactive = table.interactive
+		for cell,code,has in zip(self,codes.tolist(),has_interactive):
+			if has:
+				cell['interactive'] = interactive[code]
 			elif 'interactive' in cell.keys():
 				del cell['interactive']
 
-	def as_df(self,include_geometries=None):
+	def set_type_table(self,type_table):
+		self.type_table = type_table
+
+	def get_type_table(self):
+		'''
+		Returns the :class:`brix.TypeTable` of the GEOGRID of this object, building it if the types of GEOGRID changed.
+		Requires that GEOGRID is set.
+		'''
+		if self.GEOGRID is None:
+			raise NameError('GEOGRIDDATA object does not have GEOGRID attribute.')
+		if (self.type_table is None) or (not self.type_table.matches(self.GEOGRID)):
+			self.type_table = TypeTable(self.GEOGRID)
+		return self.type_table
+
+	@property
+	def df(self):
+		'''
+		Frame of the grid, without changing the geometries. See :func:`brix.GEOGRIDDATA.as_df`.
+		Setting it to `None` clears all the cached frames.
+		'''
+		return self._frames.get((None,True))
+
+	@df.setter
+	def df(self,value):
+		self._frames = {}
+		if value is not None:
+			self._frames[(None,True)] = value
+
+	def as_df(self,include_geometries=None,expand_classifications=True,copy=True):
 		'''
 		Returns the dataframe version of the geogriddata object.
+		Frames are built once per variant and cached. Geometries taken from GEOGRID are parsed once per GEOGRID.
 
 		Parameters
 		----------
 		include_geometries: None
 			If set, it will override the default option. 
-		'''
-		if self.df is None:
-			geogrid_data = deepcopy(self)
-			for cell in geogrid_data:
-				if 'properties' in cell.keys():
-					cell_props = cell['properties']
-					for k in cell_props:
-						if cell_props[k] is not None:
-							if k not in self.classification_list:
-								cell[f'property_{k}'] = cell_props[k]
-							else:
-								for code in cell_props[k]:
-									cell[f'{k}_{code}'] = cell_props[k][code]
-					del cell['properties']
-			geogrid_data = pd.DataFrame(geogrid_data)
-			columns_order = [c for c in geogrid_data.columns if c.split('_')[0] not in self.classification_list]
-			columns_order+= sorted([c for c in geogrid_data.columns if c.split('_')[0] in self.classification_list])
-			geogrid_data = geogrid_data[columns_order]
-
-			if 'geometry' in geogrid_data.columns:
-				geogrid_data = gpd.GeoDataFrame(geogrid_data.drop('geometry',1),geometry=geogrid_data['geometry'].apply(lambda x: shape(x)),crs='EPSG:4326')
-			self.df = geogrid_data
-
-		geogrid_data = deepcopy(self.df)
-		if include_geometries is not None:
-			if include_geometries:
+		expand_classifications: boolean, defaults to `True`
+			If `True`, classifications (e.g. LBCS and NAICS) in the properties of the cells are expanded into one column per code.
+			If `False`, they are kept as a dictionary in a single column.
+		copy: boolean, defaults to `True`
+			If `False`, it will return the cached frame itself, which should not be modified.
+			If `True`, it will return a copy of the data of the cached frame (geometries and other python objects are not copied).
+			When the copy-on-write mode of pandas is enabled, the copy is shallow and data is only copied when modified.
+		'''
+		geogrid_data = self._frame(include_geometries=include_geometries,expand_classifications=expand_classifications)
+		if not copy:
+			return geogrid_data
+		return geogrid_data.copy(deep=(not _copy_on_write()))
+
+	def _frame(self,include_geometries=None,expand_classifications=True):
+		'''
+		Returns the cached frame for the given variant, building it if needed. See :func:`brix.GEOGRIDDATA.as_df`.
+		'''
+		key = (include_geometries,expand_classifications)
+		if key not in self._frames:
+			if include_geometries is None:
+				geogrid_data = self._records_frame(expand_classifications=expand_classifications)
+				columns_order = [c for c in geogrid_data.columns if c.split('_')[0] not in self.classification_list]
+				columns_order+= sorted([c for c in geogrid_data.columns if c.split('_')[0] in self.classification_list])
+				geogrid_data = geogrid_data[columns_order]
+				if 'geometry' in geogrid_data.columns:
+					geometries = (self.get_geometry_store().shapes(geogrid_data['geometry']) if self.GEOGRID is not None else geogrid_data['geometry'].apply(lambda x: shape(x)).tolist())
+					geogrid_data = gpd.GeoDataFrame(geogrid_data.drop(columns='geometry'),geometry=gpd.GeoSeries(geometries,index=geogrid_data.index,crs='EPSG:4326'),crs='EPSG:4326')
+			elif include_geometries:
+				geogrid_data = self._frame(expand_classifications=expand_classifications)
 				if 'geometry' not in geogrid_data.columns:
-					geos = pd.DataFrame([(cell['properties']['id'],cell['geometry']) for cell in self.GEOGRID['features']],columns=['id','geometry'])
-					geogrid_data = pd.merge(geogrid_data,geos)
-					geogrid_data = gpd.GeoDataFrame(geogrid_data.drop('geometry',1),geometry=geogrid_data['geometry'].apply(lambda x: shape(x)),crs='EPSG:4326')
+					if self.GEOGRID is None:
+						raise NameError('GEOGRIDDATA object does not have GEOGRID attribute.')
+					geogrid_data = pd.merge(geogrid_data,pd.DataFrame(self.get_geometry_store().frame()))
+					geogrid_data = gpd.GeoDataFrame(geogrid_data,geometry='geometry',crs='EPSG:4326')
 			else:
-				geogrid_data = geogrid_data.drop('geometry',1,errors='ignore')
-		
-		return geogrid_data
-
-	def as_graph(self,edges_only=False):
+				geogrid_data = self._frame(expand_classifications=expand_classifications)
+				geogrid_data = pd.DataFrame(geogrid_data.drop(columns='geometry',errors='ignore'))
+			self._frames[key] = geogrid_data
+		return self._frames[key]
+
+	def _records_frame(self,expand_classifications=True):
+		'''
+		Returns the cells as a DataFrame, with the properties of each cell expanded into columns.
+		Cells are copied one level deep, and the objects they hold are shared with the frame.
+		'''
+		records = self.to_records()
+		for cell in records:
+			if 'properties' in cell.keys():
+				cell_props = cell['properties']
+				for k in cell_props:
+					if cell_props[k] is not None:
+						if (k not in self.classification_list) or (not expand_classifications):
+							cell[f'property_{k}'] = cell_props[k]
+						else:
+							for code in cell_props[k]:
+								cell[f'{k}_{code}'] = cell_props[k][code]
+				del cell['properties']
+		return pd.DataFrame(records)
+
+	def as_graph(self,edges_only=False,backend='networkx',neighborhood=4):
 		'''
 		Returns the geogriddata object as a networkx.Graph.
 
@@ -271,6 +611,11 @@ class GEOGRIDDATA(list):
 		----------
 		edges_only: boolean, defaults to `False`
 			If True, it will return the edgelist instead
+		backend: str, defaults to `networkx`
+			If `sparse`, it returns the :class:`brix.GridGraph` of GEOGRID instead, which stores the neighbors as a sparse adjacency and is shared by all the objects with the same GEOGRID.
+			Use it for traversals (see :func:`brix.GridGraph.hop_distances`), connected components, or clusters (see :func:`brix.GEOGRIDDATA.type_clusters`), since it does not copy the cells into the graph.
+		neighborhood: int, defaults to 4
+			Either 4 (cells sharing a side) or 8 (cells sharing a side or a corner).
 
 		Returns
 		-------
@@ -278,17 +623,52 @@ class GEOGRIDDATA(list):
 			Graph connecting each cell to its first neighbors.
 			If edges_only=True, returns a list of edges instead. 
 		'''
-
-		if not edges_only:
-			if (self.graph is None)&(self.GEOGRID_EDGES is not None):
-				geogrid_data = self.as_df(include_geometries=False)
-				G = nx.Graph()
-				G.add_nodes_from([(index,dict(row)) for index,row in geogrid_data.drop('geometry',1,errors='ignore').set_index('id').iterrows()])
-				G.add_edges_from(self.GEOGRID_EDGES)
-				self.graph = G
-			return self.graph
-		else:
+		if backend not in ['networkx','sparse']:
+			raise NameError(f'backend should either be networkx or sparse. Current backend: {backend}')
+		if edges_only:
+			if neighborhood!=4:
+				return self.get_geometry_store().edges(neighborhood=neighborhood)
 			return self.GEOGRID_EDGES
+		if backend=='sparse':
+			return self.get_geometry_store().graph(neighborhood=neighborhood)
+		if neighborhood!=4:
+			return self._networkx_graph(self.get_geometry_store().edges(neighborhood=neighborhood))
+		if (self.graph is None)&(self.GEOGRID_EDGES is not None):
+			self.graph = self._networkx_graph(self.GEOGRID_EDGES)
+		return self.graph
+
+	def _networkx_graph(self,edges):
+		'''
+		Builds a networkx.Graph with the given edges and the columns of the frame as node attributes.
+		'''
+		geogrid_data = self.as_df(include_geometries=False,copy=False)
+		G = nx.Graph()
+		G.add_nodes_from(zip(geogrid_data['id'].tolist(),geogrid_data.drop(columns='id').to_dict('records')))
+		G.add_edges_from(edges)
+		return G
+
+	def type_clusters(self,neighborhood=4):
+		'''
+		Finds the clusters of neighboring cells of the same type.
+		Requires that GEOGRID is set.
+
+		Parameters
+		----------
+		neighborhood: int, defaults to 4
+			Either 4 (cells sharing a side) or 8 (cells sharing a side or a corner).
+
+		Returns
+		-------
+		clusters: pandas.DataFrame
+			Table with the id, type (name), and cluster number of each cell. Cells in the same cluster share their type and are connected through neighbors of that type.
+		'''
+		graph = self.as_graph(backend='sparse',neighborhood=neighborhood)
+		ids = self._cell_ids()
+		rows = graph.rows(ids)
+		labels = np.full(len(graph),None,dtype=object)
+		labels[rows] = np.array(self.types_array(),dtype=object)
+		clusters = graph.clusters(labels)
+		return pd.DataFrame({'id':ids,'name':labels[rows],'cluster':clusters[rows]})
 
 	def remove_noninteractive(self):
 		'''
@@ -332,7 +712,7 @@ class GEOGRIDDATA(list):
 		limit: shapely.Polygon or list
 			Bounds of the table. If `bbox=True` it will return a horizontal bounding box.
 		'''
-		geogrid_data = self.as_df(include_geometries=True)
+		geogrid_data = self.as_df(include_geometries=True,copy=False)
 
 		# grid = [shape(cell['geometry']) for cell in self]
 		# limit = unary_union(grid)
@@ -352,6 +732,746 @@ class GEOGRIDDATA(list):
 			return limit
 
 
+class _MissingValue:
+	'''
+	Marks the keys that are not set in a cell of a :class:`brix.ColumnarGEOGRIDDATA` object. Survives copies and pickling.
+	'''
+	def __repr__(self):
+		return 'MISSING'
+
+	def __reduce__(self):
+		return '_MISSING'
+
+	def __copy__(self):
+		return self
+
+	def __deepcopy__(self,memo):
+		return self
+
+_MISSING = _MissingValue()
+
+class CellView(MutableMapping):
+	'''
+	Dictionary-like view of one cell of a :class:`brix.ColumnarGEOGRIDDATA` object.
+	Reading or writing a key reads or writes the corresponding column.
+	'''
+	__slots__ = ('_parent','_row')
+
+	def __init__(self,parent,row):
+		self._parent = parent
+		self._row = row
+
+	def __getitem__(self,key):
+		return self._parent._get_value(self._row,key)
+
+	def __setitem__(self,key,value):
+		self._parent._set_value(self._row,key,value)
+
+	def __delitem__(self,key):
+		self._parent._del_value(self._row,key)
+
+	def __contains__(self,key):
+		return self._parent._has_value(self._row,key)
+
+	def __iter__(self):
+		return iter(self._parent._row_keys(self._row))
+
+	def __len__(self):
+		return len(self._parent._row_keys(self._row))
+
+	def __repr__(self):
+		return repr(dict(self))
+
+	def copy(self):
+		return dict(self)
+
+	def __deepcopy__(self,memo):
+		return deepcopy(dict(self),memo)
+
+	def __reduce__(self):
+		return (dict,(dict(self),))
+
+class ColumnarGEOGRIDDATA(GEOGRIDDATA):
+	'''
+	Version of :class:`brix.GEOGRIDDATA` that stores the grid in numpy columns instead of one dictionary per cell.
+	Ids, types, heights, colors, and interactive values are stored as arrays, and types are stored as integer codes pointing to a list of categories.
+	Other keys (e.g. geometry or properties) are stored as lists.
+
+	The object still behaves as a list of dictionaries: each element is a :class:`brix.CellView` that reads and writes the columns.
+	The column accessors (see :func:`brix.ColumnarGEOGRIDDATA.ids_array`, :func:`brix.ColumnarGEOGRIDDATA.type_codes_array`, :func:`brix.ColumnarGEOGRIDDATA.heights_array`, and :func:`brix.ColumnarGEOGRIDDATA.colors_array`) return read-only views of the columns, without copying them.
+
+	Values that cannot be stored in a column (e.g. a height that is not a number) move the whole column to a list.
+	Colors are returned as new lists, so they should be modified by assigning a new value (``cell['color'] = color``) and not in place.
+	Use :func:`brix.GEOGRIDDATA.to_records` to get plain dictionaries (e.g. to serialize the object).
+
+	Parameters
+	----------
+	geogrid_data : list
+		List of cells to convert. Every cell should have an id and a name.
+	'''
+	_missing = _MISSING
+
+	def __init__(self,geogrid_data):
+		if isinstance(geogrid_data,dict):
+			raise NameError('Invalid GEOGRIDDATA endpoint. You need to update your grid at least once. See Handler.reset_geogrid_data()')
+		super(ColumnarGEOGRIDDATA, self).__init__([])
+		self._set_columns([dict(cell) for cell in geogrid_data])
+
+	def _set_columns(self,records):
+		'''
+		Builds the columns from a list of dictionaries and fills the list with one view per cell.
+		'''
+		missing = self._missing
+		n_cells = len(records)
+		try:
+			self._ids = np.array([cell['id'] for cell in records],dtype=np.int64).reshape(n_cells)
+			names = [cell['name'] for cell in records]
+		except (KeyError,TypeError,ValueError):
+			raise NameError('Every cell of a ColumnarGEOGRIDDATA object needs an integer id and a name. Use GEOGRIDDATA instead.')
+		self._types = list(dict.fromkeys(names))
+		self._type_index = {t:i for i,t in enumerate(self._types)}
+		self._type_codes = np.array([self._type_index[t] for t in names],dtype=np.int32).reshape(n_cells)
+		self._columns = set(['id','name'])
+		self._extras = {}
+		self._pending = []
+		self._aligned = True
+
+		heights = [cell.get('height',missing) for cell in records]
+		self._has_height = np.array([h is not missing for h in heights],dtype=bool).reshape(n_cells)
+		if all([self._valid_height(h) for h in heights if h is not missing]):
+			self._heights = np.array([(h if h is not missing else 0) for h in heights]).reshape(n_cells)
+			if self._heights.dtype.kind not in 'iuf':
+				self._heights = self._heights.astype(float)
+			self._columns.add('height')
+		else:
+			self._heights = None
+			self._extras['height'] = heights
+
+		colors = [cell.get('color',missing) for cell in records]
+		self._colors = np.zeros((n_cells,4),dtype=np.uint8)
+		self._color_lengths = np.zeros(n_cells,dtype=np.uint8)
+		if all([self._valid_color(c) for c in colors if c is not missing]):
+			for i,c in enumerate(colors):
+				if c is not missing:
+					self._colors[i,:len(c)] = c
+					self._colors[i,len(c):] = 255
+					self._color_lengths[i] = len(c)
+			self._columns.add('color')
+		else:
+			self._extras['color'] = colors
+
+		interactive = [cell.get('interactive',missing) for cell in records]
+		try:
+			self._interactive_values = list(dict.fromkeys([v for v in interactive if v is not missing]))
+			self._interactive_index = {v:i for i,v in enumerate(self._interactive_values)}
+			self._interactive_codes = np.array([(self._interactive_index[v] if v is not missing else -1) for v in interactive],dtype=np.int16).reshape(n_cells)
+			self._columns.add('interactive')
+		except TypeError:
+			self._interactive_values = []
+			self._interactive_index = {}
+			self._interactive_codes = np.full(n_cells,-1,dtype=np.int16)
+			self._extras['interactive'] = interactive
+
+		for cell in records:
+			for k in cell:
+				if (k not in ['id','name','height','color','interactive']) and (k not in self._extras):
+					self._extras[k] = [c.get(k,missing) for c in records]
+
+		self._n = n_cells
+		list.clear(self)
+		list.extend(self,[CellView(self,i) for i in range(n_cells)])
+		self.df = None
+
+	@staticmethod
+	def _valid_height(height):
+		return isinstance(height,(int,float,np.integer,np.floating)) and not isinstance(height,bool)
+
+	@staticmethod
+	def _valid_color(color):
+		return isinstance(color,(list,tuple)) and (len(color) in [3,4]) and all([isinstance(c,(int,np.integer)) and not isinstance(c,bool) and (0<=c<=255) for c in color])
+
+	def _ready(self):
+		'''
+		Adds the cells appended since the last call to the columns and reorders the columns to match the order of the list.
+		'''
+		if len(self._pending)!=0:
+			self._flush()
+		if not self._aligned:
+			self._align()
+
+	def _flush(self):
+		pending = self._pending
+		self._pending = []
+		n_new = len(pending)
+		self._ids = np.concatenate([self._ids,np.zeros(n_new,dtype=np.int64)])
+		self._type_codes = np.concatenate([self._type_codes,np.zeros(n_new,dtype=np.int32)])
+		self._has_height = np.concatenate([self._has_height,np.zeros(n_new,dtype=bool)])
+		if self._heights is not None:
+			self._heights = np.concatenate([self._heights,np.zeros(n_new,dtype=self._heights.dtype)])
+		self._colors = np.concatenate([self._colors,np.zeros((n_new,4),dtype=np.uint8)])
+		self._color_lengths = np.concatenate([self._color_lengths,np.zeros(n_new,dtype=np.uint8)])
+		self._interactive_codes = np.concatenate([self._interactive_codes,np.full(n_new,-1,dtype=np.int16)])
+		for k in self._extras:
+			self._extras[k].extend([self._missing]*n_new)
+		first_row = self._n
+		self._n += n_new
+		for i,cell in enumerate(pending):
+			if ('id' not in cell) or ('name' not in cell):
+				raise NameError('Every cell of a ColumnarGEOGRIDDATA object needs an id and a name.')
+			for k in cell:
+				self._set_value(first_row+i,k,cell[k])
+
+	def _align(self):
+		rows = np.array([cell._row for cell in self],dtype=np.int64)
+		seen = set()
+		for i,cell in enumerate(self):
+			if cell._row in seen:
+				list.__setitem__(self,i,CellView(self,cell._row))
+			seen.add(cell._row)
+		self._ids = self._ids[rows]
+		self._type_codes = self._type_codes[rows]
+		self._has_height = self._has_height[rows]
+		if self._heights is not None:
+			self._heights = self._heights[rows]
+		self._colors = self._colors[rows]
+		self._color_lengths = self._color_lengths[rows]
+		self._interactive_codes = self._interactive_codes[rows]
+		for k in self._extras:
+			values = self._extras[k]
+			self._extras[k] = [values[r] for r in rows]
+		self._n = len(rows)
+		for i,cell in enumerate(self):
+			cell._row = i
+		self._aligned = True
+
+	def _demote(self,key):
+		'''
+		Moves a column to a list, to store values that do not fit in the column.
+		'''
+		missing = self._missing
+		values = [missing]*self._n
+		for row in range(self._n):
+			if self._has_value(row,key):
+				values[row] = self._get_value(row,key)
+		self._columns.discard(key)
+		self._extras[key] = values
+		if key=='height':
+			self._heights = None
+
+	def _get_value(self,row,key):
+		if row>=self._n:
+			self._flush()
+		if key in self._columns:
+			if key=='id':
+				return int(self._ids[row])
+			if key=='name':
+				return self._types[self._type_codes[row]]
+			if key=='height':
+				if self._has_height[row]:
+					return self._heights[row].item()
+			elif key=='color':
+				n = self._color_lengths[row]
+				if n!=0:
+					return self._colors[row,:n].tolist()
+			elif key=='interactive':
+				code = self._interactive_codes[row]
+				if code!=-1:
+					return self._interactive_values[code]
+			raise KeyError(key)
+		value = self._extras[key][row] if key in self._extras else self._missing
+		if value is self._missing:
+			raise KeyError(key)
+		return value
+
+	def _has_value(self,row,key):
+		try:
+			self._get_value(row,key)
+			return True
+		except KeyError:
+			return False
+
+	def _row_keys(self,row):
+		if row>=self._n:
+			self._flush()
+		return [k for k in ['id','name','height','color','interactive'] if (k in self._columns) and self._has_value(row,k)]+[k for k in self._extras if self._extras[k][row] is not self._missing]
+
+	def _set_value(self,row,key,value):
+		if row>=self._n:
+			self._flush()
+		self.df = None
+		self.graph = None
+		if key in self._columns:
+			if key=='id':
+				if isinstance(value,(int,np.integer)) and not isinstance(value,bool):
+					self._ids[row] = value
+					return
+				raise NameError('Cell ids of a ColumnarGEOGRIDDATA object should be integers.')
+			if key=='name':
+				if value not in self._type_index:
+					self._type_index[value] = len(self._types)
+					self._types.append(value)
+				self._type_codes[row] = self._type_index[value]
+				return
+			if key=='height' and self._valid_height(value):
+				if isinstance(value,(float,np.floating)) and self._heights.dtype.kind!='f':
+					self._heights = self._heights.astype(float)
+				self._heights[row] = value
+				self._has_height[row] = True
+				return
+			if key=='color' and self._valid_color(value):
+				self._colors[row,:len(value)] = value
+				self._colors[row,len(value):] = 255
+				self._color_lengths[row] = len(value)
+				return
+			if key=='interactive':
+				try:
+					if value not in self._interactive_index:
+						self._interactive_index[value] = len(self._interactive_values)
+						self._interactive_values.append(value)
+					self._interactive_codes[row] = self._interactive_index[value]
+					return
+				except TypeError:
+					pass
+			if key in ['id','name']:
+				raise NameError(f'Invalid value for {key}: {value}')
+			self._demote(key)
+		if key not in self._extras:
+			self._extras[key] = [self._missing]*self._n
+		self._extras[key][row] = value
+
+	def _del_value(self,row,key):
+		if row>=self._n:
+			self._flush()
+		if not self._has_value(row,key):
+			raise KeyError(key)
+		self.df = None
+		self.graph = None
+		if key in ['id','name']:
+			raise NameError(f'{key} cannot be removed from a cell of a ColumnarGEOGRIDDATA object.')
+		if key=='height':
+			self._has_height[row] = False
+		elif key=='color':
+			self._color_lengths[row] = 0
+			self._colors[row] = 0
+		elif key=='interactive':
+			self._interactive_codes[row] = -1
+		else:
+			self._extras[key][row] = self._missing
+
+	def _adopt(self,cell):
+		'''
+		Returns a view of the given cell, adding it to the columns if needed.
+		'''
+		if isinstance(cell,CellView) and (cell._parent is self):
+			self._aligned = False
+			return cell
+		self._pending.append(dict(cell))
+		return CellView(self,self._n+len(self._pending)-1)
+
+	def append(self,cell):
+		list.append(self,self._adopt(cell))
+		self.df = None
+
+	def extend(self,cells):
+		list.extend(self,[self._adopt(cell) for cell in cells])
+		self.df = None
+
+	def __iadd__(self,cells):
+		self.extend(cells)
+		return self
+
+	def insert(self,index,cell):
+		list.insert(self,index,self._adopt(cell))
+		self._aligned = False
+		self.df = None
+
+	def __setitem__(self,index,value):
+		if isinstance(index,slice):
+			value = [self._adopt(cell) for cell in value]
+		else:
+			value = self._adopt(value)
+		list.__setitem__(self,index,value)
+		self._aligned = False
+		self.df = None
+
+	def __delitem__(self,index):
+		list.__delitem__(self,index)
+		self._aligned = False
+		self.df = None
+
+	def pop(self,index=-1):
+		cell = list.pop(self,index)
+		self._aligned = False
+		self.df = None
+		return cell
+
+	def remove(self,cell):
+		list.remove(self,cell)
+		self._aligned = False
+		self.df = None
+
+	def clear(self):
+		list.clear(self)
+		self._aligned = False
+		self.df = None
+
+	def sort(self,*args,**kwargs):
+		list.sort(self,*args,**kwargs)
+		self._aligned = False
+		self.df = None
+
+	def reverse(self):
+		list.reverse(self)
+		self._aligned = False
+		self.df = None
+
+	def __deepcopy__(self,memo):
+		self._ready()
+		new = ColumnarGEOGRIDDATA.__new__(ColumnarGEOGRIDDATA)
+		memo[id(self)] = new
+		new.__dict__.update(deepcopy(self.__dict__,memo))
+		list.extend(new,[CellView(new,i) for i in range(new._n)])
+		return new
+
+	def _copy_cells(self):
+		'''
+		Returns a new object with copies of the columns. Values stored in the cells (e.g. properties) are shared.
+		'''
+		self._ready()
+		new = ColumnarGEOGRIDDATA.__new__(ColumnarGEOGRIDDATA)
+		state = {k:(v.copy() if k.startswith('_') and isinstance(v,(np.ndarray,list,dict,set)) else v) for k,v in self.__dict__.items() if k not in ['_frames','graph']}
+		state['_extras'] = {k:list(v) for k,v in self._extras.items()}
+		new.__dict__.update(state)
+		new.df = None
+		new.graph = None
+		list.extend(new,[CellView(new,i) for i in range(new._n)])
+		return new
+
+	def _for_worker(self):
+		self._ready()
+		return super(ColumnarGEOGRIDDATA, self)._for_worker()
+
+	def attach_geometries(self):
+		if self.GEOGRID is None:
+			raise NameError('GEOGRIDDATA object does not have GEOGRID attribute.')
+		self._ready()
+		features = self.GEOGRID['features']
+		geometries = self._extras.get('geometry',[self._missing]*self._n)
+		self._extras['geometry'] = [f['geometry'] for f in features[:self._n]]+geometries[len(features):]
+		self.df = None
+
+	def attach_properties(self):
+		types_def = self._types_properties()
+		self._ready()
+		missing = self._missing
+		lookup = [types_def.get(t,missing) for t in self._types]
+		known = np.array([t in types_def for t in self._types],dtype=bool)
+		properties = self._extras.get('properties',[missing]*self._n)
+		if known.all():
+			self._extras['properties'] = [lookup[code] for code in self._type_codes.tolist()]
+		else:
+			self._extras['properties'] = [(lookup[code] if known[code] else value) for code,value in zip(self._type_codes.tolist(),properties)]
+		self.df = None
+
+	def __reduce__(self):
+		self._ready()
+		return (_rebuild_columnar,(self.__dict__,))
+
+	@staticmethod
+	def _read_only(array):
+		view = array.view()
+		view.flags.writeable = False
+		return view
+
+	def ids_array(self):
+		'''
+		Returns a read-only view of the ids of the cells.
+		'''
+		self._ready()
+		return self._read_only(self._ids)
+
+	def _cell_ids(self):
+		self._ready()
+		return self._ids.tolist()
+
+	def _cell_types(self):
+		self._ready()
+		return set([self._types[code] for code in np.unique(self._type_codes)])
+
+	def _current_alphas(self):
+		self._ready()
+		if 'color' not in self._columns:
+			return super(ColumnarGEOGRIDDATA, self)._current_alphas()
+		return self._colors[:,3].astype(np.int64),(self._color_lengths==4)
+
+	def _assign_colors(self,colors,lengths):
+		self._ready()
+		if ('color' not in self._columns) or (colors.min(initial=0)<0) or (colors.max(initial=0)>255):
+			return super(ColumnarGEOGRIDDATA, self)._assign_colors(colors,lengths)
+		self.df = None
+		self.graph = None
+		self._colors[:] = colors
+		self._colors[lengths==3,3] = 255
+		self._color_lengths[:] = lengths
+
+	def _assign_interactive(self,table,codes):
+		self._ready()
+		if 'interactive' not in self._columns:
+			return super(ColumnarGEOGRIDDATA, self)._assign_interactive(table,codes)
+		self.df = None
+		self.graph = None
+		type_interactive = np.full(len(table.types),-1,dtype=self._interactive_codes.dtype)
+		for code in np.flatnonzero(table.has_interactive):
+			value = table.interactive[code]
+			try:
+				if value not in self._interactive_index:
+					self._interactive_index[value] = len(self._interactive_values)
+					self._interactive_values.append(value)
+			except TypeError:
+				return super(ColumnarGEOGRIDDATA, self)._assign_interactive(table,codes)
+			type_interactive[code] = self._interactive_index[value]
+		self._interactive_codes[:] = type_interactive[codes]
+
+	def types_array(self):
+		'''
+		Returns the types of the cells as a :class:`pandas.Categorical` built on top of the type codes.
+		'''
+		self._ready()
+		try:
+			return pd.Categorical.from_codes(self._read_only(self._type_codes),categories=self._types)
+		except ValueError:
+			return pd.Categorical(np.array(self._types,dtype=object)[self._type_codes])
+
+	def type_codes_array(self):
+		'''
+		Returns a read-only view of the type code of each cell. See :func:`brix.ColumnarGEOGRIDDATA.type_categories`.
+		'''
+		self._ready()
+		return self._read_only(self._type_codes)
+
+	def type_categories(self):
+		'''
+		Returns the list of types, ordered by the codes returned by :func:`brix.ColumnarGEOGRIDDATA.type_codes_array`.
+		'''
+		self._ready()
+		return list(self._types)
+
+	def heights_array(self):
+		'''
+		Returns the heights of the cells. If all cells have a height, this is a read-only view of the column.
+		Cells without height are set to `nan`.
+		'''
+		self._ready()
+		if 'height' not in self._columns:
+			return super(ColumnarGEOGRIDDATA, self).heights_array()
+		if self._has_height.all():
+			return self._read_only(self._heights)
+		return np.where(self._has_height,self._heights,np.nan)
+
+	def interactive_array(self):
+		'''
+		Returns a boolean numpy array that is `True` for the interactive cells (interactive set to Web).
+		'''
+		self._ready()
+		if 'interactive' not in self._columns:
+			return super(ColumnarGEOGRIDDATA, self).interactive_array()
+		if 'Web' not in self._interactive_index:
+			return np.zeros(self._n,dtype=bool)
+		return self._interactive_codes==self._interactive_index['Web']
+
+	def colors_array(self):
+		'''
+		Returns a read-only view of the colors of the cells, with one RGBA row per cell.
+		Cells without transparency have an alpha of 255, and cells without color have zeros.
+		'''
+		self._ready()
+		if 'color' not in self._columns:
+			return super(ColumnarGEOGRIDDATA, self).colors_array()
+		return self._read_only(self._colors)
+
+	def to_records(self):
+		self._ready()
+		return [dict(cell) for cell in self]
+
+	def _records_frame(self,expand_classifications=True):
+		self._ready()
+		if 'properties' in self._extras:
+			return super(ColumnarGEOGRIDDATA, self)._records_frame(expand_classifications=expand_classifications)
+		missing = self._missing
+		columns = {}
+		columns['id'] = self._ids.copy()
+		columns['name'] = np.array(self._types,dtype=object)[self._type_codes]
+		if 'height' in self._columns:
+			columns['height'] = self.heights_array().copy()
+		if 'color' in self._columns:
+			columns['color'] = [self._colors[i,:n].tolist() if n!=0 else np.nan for i,n in enumerate(self._color_lengths)]
+		if 'interactive' in self._columns:
+			columns['interactive'] = [self._interactive_values[c] if c!=-1 else np.nan for c in self._interactive_codes]
+		for k in self._extras:
+			columns[k] = [v if v is not missing else np.nan for v in self._extras[k]]
+		return pd.DataFrame(columns)
+
+def _rebuild_columnar(state):
+	'''
+	Rebuilds a :class:`brix.ColumnarGEOGRIDDATA` object from its state. Used by pickle.
+	'''
+	new = ColumnarGEOGRIDDATA.__new__(ColumnarGEOGRIDDATA)
+	new.__dict__.update(state)
+	list.extend(new,[CellView(new,i) for i in range(new._n)])
+	return new
+
+class TypeTable:
+	'''
+	Colors and interactive flags of the types defined in a GEOGRID, stored as arrays indexed by type code.
+	It is built once per GEOGRID (see :func:`brix.Handler.get_type_table`) and used by :func:`brix.GEOGRIDDATA.remap_colors` and :func:`brix.GEOGRIDDATA.remap_interactive` to remap every cell with a single gather over the type codes.
+	The type `None` is always included, with a transparent color and no interactive flag.
+
+	Parameters
+	----------
+	GEOGRID : dict
+		GEOGRID object, as returned by :func:`brix.Handler.get_GEOGRID`.
+
+	Attributes
+	----------
+	types : list
+		Type names, ordered by code.
+	index : dict
+		Dictionary that maps each type name to its code.
+	colors : numpy.ndarray
+		Array of shape (n_types, 4) with the RGBA color of each type. Types without transparency have an alpha of 255.
+	color_lengths : numpy.ndarray
+		Number of channels of the color of each type (3 or 4), or 0 if the type does not define a color.
+	interactive : list
+		Interactive flag of each type, or `None` if the type does not define one.
+	'''
+	def __init__(self,GEOGRID):
+		types_def = GEOGRID['properties']['types']
+		self.types_def = deepcopy(types_def)
+		self.types = [t for t in types_def if t!='None']+['None']
+		self.index = {t:i for i,t in enumerate(self.types)}
+		n_types = len(self.types)
+		self.colors = np.zeros((n_types,4),dtype=np.int64)
+		self.color_lengths = np.zeros(n_types,dtype=np.int8)
+		self.has_interactive = np.zeros(n_types,dtype=bool)
+		self.interactive = [None]*n_types
+		for code,t in enumerate(self.types[:-1]):
+			type_info = types_def[t] if isinstance(types_def[t],dict) else {}
+			type_color = type_info.get('color')
+			if isinstance(type_color,str):
+				h = type_color.replace('#','')
+				color = list(int(h[i:i+2], 16) for i in (0, 2, 4))
+			elif isinstance(type_color,list):
+				color = type_color[:4]
+			else:
+				color = []
+			self.colors[code,:len(color)] = color
+			self.colors[code,len(color):] = 255
+			self.color_lengths[code] = len(color)
+			if 'interactive' in type_info:
+				self.has_interactive[code] = True
+				self.interactive[code] = type_info['interactive']
+		self.colors[-1] = 0
+		self.color_lengths[-1] = 4
+
+	def matches(self,GEOGRID):
+		'''
+		Returns `True` if the types of the given GEOGRID are the ones used to build the table.
+		'''
+		return GEOGRID['properties']['types']==self.types_def
+
+	def codes(self,types):
+		'''
+		Returns the code of each type of the given :class:`pandas.Categorical`.
+		Only the categories are looked up, the codes of the cells are gathered from them.
+		Types that are not in the table get the code of `None`.
+		'''
+		types = pd.Categorical(types)
+		none_code = self.index['None']
+		category_codes = np.array([self.index.get(t,none_code) for t in types.categories]+[none_code],dtype=np.int64)
+		return category_codes[np.asarray(types.codes)]
+
+class ResultCache:
+	'''
+	Thread-safe LRU cache used by :class:`brix.Handler` to store the values returned by each indicator for a given grid.
+	Keys are tuples of the form ``(indicator_name, content_hash)``. See :func:`brix.GEOGRIDDATA.content_hash`.
+
+	Parameters
+	----------
+	max_size : int, defaults to 128
+		Maximum number of values to keep. If 0, nothing is stored.
+	ttl : float, optional
+		Time, in seconds, after which a value expires. If not provided, values do not expire.
+	'''
+	def __init__(self,max_size=128,ttl=None):
+		self.max_size = max_size
+		self.ttl = ttl
+		self._values = OrderedDict()
+		self._lock = Lock()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def __len__(self):
+		return len(self._values)
+
+	def lookup(self,key):
+		'''
+		Returns the cached value for the given key.
+
+		Returns
+		-------
+		found : boolean
+			`True` if the key was found and has not expired.
+		value : object
+			Cached value, or `None` if not found.
+		'''
+		with self._lock:
+			if key in self._values:
+				stored_at,value = self._values[key]
+				if (self.ttl is None) or (right_now()-stored_at<=self.ttl):
+					self._values.move_to_end(key)
+					self.hits += 1
+					return True,value
+				del self._values[key]
+			self.misses += 1
+			return False,None
+
+	def store(self,key,value):
+		'''
+		Stores the value for the given key, evicting the least recently used values if needed.
+		'''
+		if self.max_size<=0:
+			return
+		with self._lock:
+			self._values[key] = (right_now(),value)
+			self._values.move_to_end(key)
+			while len(self._values)>self.max_size:
+				self._values.popitem(last=False)
+				self.evictions += 1
+
+	def invalidate(self,indicator_name=None):
+		'''
+		Removes the values of the given indicator, or all values if no indicator is given.
+		'''
+		with self._lock:
+			if indicator_name is None:
+				self._values = OrderedDict()
+			else:
+				for key in [key for key in self._values if key[0]==indicator_name]:
+					del self._values[key]
+
+	def stats(self):
+		'''
+		Returns the hit and miss counters of the cache.
+
+		Returns
+		-------
+		stats : dict
+			Dictionary with the number of hits, misses, evictions, and stored values.
+		'''
+		with self._lock:
+			return {'hits':self.hits,'misses':self.misses,'evictions':self.evictions,'size':len(self._values)}
+
 class Handler(Thread):
 	'''Class to handle the connection for indicators built based on data from the GEOGRID. To use, instantiate the class and use the :func:`~brix.Handler.add_indicator` method to pass it a set of :class:`~brix.Indicator` objects.
 
@@ -371,19 +1491,84 @@ class Handler(Thread):
 		Dictionary for reference values for each indicator.
 	shell_mode : Boolean, optional defaults to False
 		If True, it will not get the current hash when instantiating the class. Useful for testing. 
+	pool_size : int, defaults to 10
+		Maximum number of connections kept alive per host by the HTTP session.
+		Handlers pointing to the same host with the same pool settings share one connection pool. See :func:`brix.Handler.get_session`.
+	timeout : float, defaults to 30
+		Timeout in seconds for every request made to cityIO. Set to `None` to wait forever.
+	keep_alive : boolean, defaults to `True`
+		If `False`, connections will be closed after each request.
+	executor_mode : str, optional
+		If 'thread' or 'process', independent indicators will be computed concurrently in a thread or process pool.
+		Composite indicators are computed once all other indicators are done.
+		When using 'process', indicators that cannot be pickled are computed in the main process, and changes to the state of the indicator made inside `return_indicator` are lost.
+		Each process receives GEOGRID once, so only the cells are sent with every update.
+		If not provided, indicators are computed one after another.
+	max_workers : int, optional
+		Maximum number of workers used when `executor_mode` is set.
+	cache_size : int, defaults to 128
+		Maximum number of indicator values kept in memory. When the grid goes back to a state that was already seen, values of the indicators that set :attr:`brix.Indicator.cache_results` are taken from the cache instead of calling `return_indicator`.
+		Set to 0 to disable the cache. See :class:`brix.ResultCache`.
+	cache_ttl : float, optional
+		Time, in seconds, after which a cached value expires. If not provided, values do not expire.
+	conditional_get : boolean, defaults to `True`
+		If `True`, GEOGRID and GEOGRIDDATA are requested with the validators (ETag or Last-Modified) returned by the previous response, and the last body is reused when the server answers 304.
+		When the cityIO hash of the endpoint was polled less than :attr:`brix.Handler.hash_max_age` seconds ago and has not changed, the request is skipped altogether.
+		Servers that do not return validators are handled as if this option were `False`.
+	change_source : :class:`brix.ChangeSource`, optional
+		Object that tells the Handler when the grid changed while listening.
+		Defaults to :class:`brix.PollingChangeSource`, which polls the hashes of the table. Use :class:`brix.SSEChangeSource` or :class:`brix.WebSocketChangeSource` to be notified of changes instead.
+	poll_policy : :class:`brix.PollPolicy`, optional
+		Object that decides how long to wait between polls. See :func:`brix.Handler.sleep_time`.
+		Defaults to :class:`brix.RestModePolicy`. Use :class:`brix.BackoffPolicy` to back off exponentially when the table is idle.
+	columnar : boolean, defaults to `False`
+		If `True`, indicators receive a :class:`brix.ColumnarGEOGRIDDATA` object, which stores the grid in numpy columns.
+	skip_unchanged : boolean, defaults to `True`
+		If `True`, the Handler keeps a fingerprint of the last payload successfully posted to each indicator endpoint, and does not post it again while it has not changed.
+		The number of posts and bytes sent and skipped are counted in :attr:`brix.Handler.post_stats`. See also :func:`brix.Handler.reset_post_fingerprints`.
+	codec : str or :class:`brix.JSONCodec`, optional
+		Codec used to encode and decode every cityIO payload: 'orjson', 'ujson', 'json', or a codec object.
+		If not provided, it uses the standard library. See :func:`brix.get_codec`.
+	compress_posts : boolean, defaults to `False`
+		If `True`, bodies of at least `compress_min_size` bytes are gzipped before being posted, with the `Content-Encoding: gzip` header.
+		Only use it with servers that accept compressed requests.
+		Responses are always requested compressed (see :attr:`brix.Handler.get_headers`).
+		Bytes before and after compression are counted per url in :attr:`brix.Handler.transfer_stats`.
+	compress_min_size : int, defaults to 1024
+		Minimum size, in bytes, of the bodies compressed when `compress_posts` is `True`.
 	'''
 	remote_host = 'https://cityio.media.mit.edu'
 	cityio_post_headers  = {'Content-Type': 'application/json'}
+	cityio_get_headers   = {'Accept-Encoding': 'gzip, deflate'}
 	GEOGRIDDATA_endpoint = 'GEOGRIDDATA'
 	GEOGRID_endpoint     = 'GEOGRID'
 	_indicator_instances = set()
+	_adapters = {}
+	_sessions_lock = Lock()
+	_thread_sessions = local()
+	hash_max_age = 5
 
 	def __init__(self, table_name, 
 			quietly=False, 
 			host_mode ='remote', 
 			host_name = None,
 			reference = None,
-			shell_mode = False
+			shell_mode = False,
+			pool_size = 10,
+			timeout = 30,
+			keep_alive = True,
+			executor_mode = None,
+			max_workers = None,
+			cache_size = 128,
+			cache_ttl = None,
+			conditional_get = True,
+			change_source = None,
+			poll_policy = None,
+			columnar = False,
+			skip_unchanged = True,
+			codec = None,
+			compress_posts = False,
+			compress_min_size = 1024
 		):
 
 		super(Handler, self).__init__()
@@ -394,6 +1579,18 @@ class Handler(Thread):
 			self.host = host_name.strip('/')
 		self.host = 'http://127.0.0.1:5000/' if host_mode=='local' else self.host
 		self.post_headers = self.cityio_post_headers
+		self.get_headers  = self.cityio_get_headers
+		self.codec = get_codec(codec)
+		self.compress_posts = compress_posts
+		self.compress_min_size = compress_min_size
+		self.transfer_stats = {}
+
+		self.pool_size  = pool_size
+		self.timeout    = timeout
+		self.keep_alive = keep_alive
+		self.conditional_get = conditional_get
+		self._validators = {}
+		self._hashes = (None,{})
 
 		self.sleep_time_short = 0.5
 		self.sleep_time_long  = 2
@@ -403,6 +1600,8 @@ class Handler(Thread):
 
 		self.nAttempts = 5
 		self.append_on_post = False
+		self.robust = False
+		self.listening = False
 
 		self.table_name = table_name
 	
@@ -421,11 +1620,29 @@ class Handler(Thread):
 
 		self.GEOGRID = None
 		self.GEOGRID_EDGES = None
+		self.geometry_store = None
+		self.type_table = None
 
 		self.quietly = quietly
 
 		self.indicators = {}
+		self._input_requirements = {}
 		self.update_geogrid_data_functions = []
+
+		if executor_mode not in [None,'thread','process']:
+			raise NameError('executor_mode should either be None, thread, or process. Current mode: '+str(executor_mode))
+		self.executor_mode = executor_mode
+		self.max_workers = max_workers
+		self.indicator_executor = None
+		self._indicator_threads = set()
+		self._worker_GEOGRID = None
+		self._picklable_indicators = {}
+		self._composite_order_cache = None
+		self.result_cache = ResultCache(max_size=cache_size,ttl=cache_ttl)
+		self._incremental_state = {}
+		self.set_change_source(change_source)
+		self.set_poll_policy(poll_policy)
+		self.columnar = columnar
 		self.grid_hash_id = None
 
 		self.shell_mode = shell_mode
@@ -441,6 +1658,11 @@ class Handler(Thread):
 
 		self.previous_indicators = None
 		self.previous_access = None
+		self._static_heatmap = None
+
+		self.skip_unchanged = skip_unchanged
+		self._post_fingerprints = {}
+		self.post_stats = {'sent':0,'skipped':0,'sent_bytes':0,'skipped_bytes':0}
 
 		self.none_character = 0
 		self.geogrid_props=None
@@ -450,6 +1672,63 @@ class Handler(Thread):
 
 		self.OSM_data = {}
 
+	@classmethod
+	def get_session(cls,host,pool_size=10,keep_alive=True):
+		'''
+		Returns the connection-pooled session used for the given host in the current thread.
+		Since `requests.Session` is not thread-safe, each thread gets its own session, created once and shared between all Handlers that point at the same host with the same settings.
+		All these sessions use the same adapter, so connections are pooled across threads.
+
+		Parameters
+		----------
+		host : str
+			Host the session will be used for.
+		pool_size : int, defaults to 10
+			Maximum number of connections kept alive per host.
+		keep_alive : boolean, defaults to `True`
+			If `False`, connections will be closed after each request.
+
+		Returns
+		-------
+		session : requests.Session
+			Shared session.
+		'''
+		key = (host,pool_size,keep_alive)
+		with cls._sessions_lock:
+			if key not in cls._adapters:
+				cls._adapters[key] = HTTPAdapter(pool_connections=pool_size,pool_maxsize=pool_size)
+			adapter = cls._adapters[key]
+		sessions = getattr(cls._thread_sessions,'sessions',None)
+		if sessions is None:
+			sessions = cls._thread_sessions.sessions = {}
+		# Sessions built before close_sessions point to an old adapter
+		if (key not in sessions) or (sessions[key].get_adapter('http://') is not adapter):
+			session = requests.Session()
+			session.mount('http://',adapter)
+			session.mount('https://',adapter)
+			if not keep_alive:
+				session.headers['Connection'] = 'close'
+			sessions[key] = session
+		return sessions[key]
+
+	@classmethod
+	def close_sessions(cls):
+		'''
+		Closes all pooled connections.
+		Sessions are created again, with new pools, the next time they are needed.
+		'''
+		with cls._sessions_lock:
+			for adapter in cls._adapters.values():
+				adapter.close()
+			cls._adapters = {}
+
+	@property
+	def session(self):
+		'''
+		Session used by this Handler in the current thread. See :func:`brix.Handler.get_session`.
+		'''
+		return self.get_session(self.host,pool_size=self.pool_size,keep_alive=self.keep_alive)
+
 	def is_table(self):
 		'''
 		Checks it table exists by getting the base url.
@@ -464,7 +1743,7 @@ class Handler(Thread):
 		if r.status_code!=200:
 			raise NameError(f'Unable to retrieve list of tables: status code ={r.status_code}')
 		else:
-			table_list = [t.strip('/').split('/')[-1] for t in r.json()]
+			table_list = [t.strip('/').split('/')[-1] for t in self.codec.loads(r.content)]
 			if self.table_name in table_list:
 				return True
 			else:
@@ -479,11 +1758,12 @@ class Handler(Thread):
 			delete_table = input(f'Are you sure you want to delete {self.table_name}?')
 			delete_table = (delete_table.lower().strip()[0] == 'y')
 			if delete_table:
-				r = requests.delete(self.cityIO_post_url)
+				r = self.session.delete(self.cityIO_post_url,timeout=self.timeout)
 				if r.status_code==200:
 					if not self.quietly:
 						print(f'{self.table_name} deleted')
 					self.is_table = None
+					self.reset_post_fingerprints()
 				else:
 					warn(f'Something went wrong, status_code:{r.status_code}')
 			else:
@@ -492,35 +1772,64 @@ class Handler(Thread):
 		else:
 			print('Table does not exist')
 
+	def set_change_source(self,change_source=None):
+		'''
+		Sets the object used to detect changes in the grid while listening.
+
+		Parameters
+		----------
+		change_source : :class:`brix.ChangeSource`, optional
+			If not provided, it will use :class:`brix.PollingChangeSource`.
+		'''
+		if change_source is None:
+			change_source = PollingChangeSource()
+		if not isinstance(change_source,ChangeSource):
+			raise NameError('change_source should be a brix.ChangeSource object')
+		change_source.attach(self)
+		self.change_source = change_source
+
+	def set_poll_policy(self,poll_policy=None):
+		'''
+		Sets the object that decides how long to wait between polls.
+
+		Parameters
+		----------
+		poll_policy : :class:`brix.PollPolicy`, optional
+			If not provided, it will use :class:`brix.RestModePolicy`.
+		'''
+		if poll_policy is None:
+			poll_policy = RestModePolicy()
+		if not isinstance(poll_policy,PollPolicy):
+			raise NameError('poll_policy should be a brix.PollPolicy object')
+		poll_policy.attach(self)
+		self.poll_policy = poll_policy
+
 	def sleep_time(self):
 		'''
-		Returns sleep time in seconds, handling whether the table is in rest_mode or not. 
+		Returns sleep time in seconds, as given by :attr:`brix.Handler.poll_policy`.
+		With the default policy, this handles whether the table is in rest_mode or not.
 		'''
-		if self.rest_mode:
-			return self.sleep_time_long
-		else:
-			return self.sleep_time_short
+		return self.poll_policy.sleep_time()
 
 	def wake_up(self):
 		'''
-		Turns off rest mode.
+		Tells the poll policy that the grid changed. With the default policy, this turns off rest mode.
 		'''
 		if not self.quietly:
 			print('Waking up!')
-		self.rest_mode = False
-		self.active_start = right_now()
+		self.poll_policy.on_change()
 
 	def check_rest(self):
 		'''
-		Checks if module should be put in resting mode
+		Tells the poll policy that the grid did not change. With the default policy, this checks if module should be put in resting mode.
 		'''
-		if not self.rest_mode:
-			current_time = right_now()
-			if current_time-self.active_start>=self.total_active_time:
-				if not self.quietly:
-					print('Going into rest mode')
-					print('Time active:',current_time-self.active_start)
-				self.rest_mode = True
+		self.poll_policy.on_idle()
+
+	def poll_stats(self):
+		'''
+		Returns the number of polls made and the effective request rate. See :func:`brix.PollPolicy.stats`.
+		'''
+		return self.poll_policy.stats()
 
 	def grid_bounds(self,bbox=False,buffer_percent=None):
 		'''
@@ -583,7 +1892,7 @@ class Handler(Thread):
 		else:
 			raise NameError('Indicator type should either be numeric, heatmap, or access. Current type: '+str(indicator_type))
 		if r.status_code==200:
-			return r.json()
+			return self.codec.loads(r.content)
 		else:
 			warn('Cant access cityIO hashes')
 			return {}
@@ -643,7 +1952,7 @@ class Handler(Thread):
 		lat,lon = props['latitude'],props['longitude']
 		hour_offset = get_timezone_offset(lat,lon)
 		url = urljoin(self.cityIO_post_url,'GEOGRID','properties','header','tz')
-		r = requests.post(url,data=str(int(hour_offset)),headers=self.post_headers)
+		r = self._post_url(url,data=str(int(hour_offset)))
 		if r.status_code==200:
 			if not self.quietly:
 				print('Timezone set to:',hour_offset)
@@ -657,8 +1966,8 @@ class Handler(Thread):
 		lat = grid_center.y
 		lat_url = urljoin(self.cityIO_GEOGRID_post_url,'properties','header','latitude')
 		lon_url = urljoin(self.cityIO_GEOGRID_post_url,'properties','header','longitude')
-		r = requests.post(lat_url,data=str(lat),headers=self.post_headers)
-		r = requests.post(lon_url,data=str(lon),headers=self.post_headers)
+		r = self._post_url(lat_url,data=str(lat))
+		r = self._post_url(lon_url,data=str(lon))
 
 	def indicator(self,name):
 		'''Returns the :class:`brix.Indicator` with the given name.
@@ -712,14 +2021,19 @@ class Handler(Thread):
 
 		I.table_name = self.table_name
 		self.indicators[indicatorName] = I
+		self._input_requirements[indicatorName] = (bool(I.requires_geometry),bool(I.requires_geogrid_props))
+		self._picklable_indicators.pop(indicatorName,None)
+		self._composite_order_cache = None
+		self.result_cache.invalidate(indicatorName)
+		self._incremental_state.pop(indicatorName,None)
 		if test:
 			geogrid_data = self._get_grid_data()
 			if I.indicator_type not in set(['numeric','heatmap','access','textual','hybrid','grid']):
 				raise NameError('Indicator type should either be numeric, heatmap, textual, or hybrid. Current type: '+str(I.indicator_type))
 			try:
-				if I.is_composite:
+				if self._is_numeric_composite(indicatorName):
 					indicator_values = self.get_indicator_values(geogrid_data=geogrid_data,include_composite=False)
-					self._new_value(indicator_values,indicatorName)
+					self._evaluate_composites(indicator_values,targets=[indicatorName],raise_error=True)
 				else:
 					self._new_value(geogrid_data,indicatorName)
 			except:
@@ -756,11 +2070,12 @@ class Handler(Thread):
 		'''
 		geogrid_data = self._get_grid_data()
 		I = self.indicators[indicator_name]
-		if I.is_composite:
+		if self._is_numeric_composite(indicator_name):
 			indicator_values = self.get_indicator_values(geogrid_data=geogrid_data,include_composite=False)
+			indicator_values = self._composite_inputs(indicator_values,indicator_name)
 			return I.return_indicator(indicator_values)
 		else:
-			return I.return_indicator(geogrid_data)
+			return I.return_indicator(self._indicator_input(geogrid_data,indicator_name))
 
 	def _format_geojson(self,new_value,indicator_name):
 		'''
@@ -849,9 +2164,55 @@ class Handler(Thread):
 				}
 			}
 		'''
-		I = self.indicators[indicator_name]
-		new_value_raw = I.return_indicator(geogrid_data)
+		I = self.indicators[indicator_name]
+		new_value_raw = I.return_indicator(self._indicator_input(geogrid_data,indicator_name))
+		return self._format_value(new_value_raw,indicator_name)
+
+	def _indicator_input(self,geogrid_data,indicator_name,views=None):
+		'''
+		Returns the version of geogrid_data the given indicator declared it needs, with geometries and/or type properties attached.
+		Requirements are read from the indicator when it is added. See :func:`brix.GEOGRIDDATA.with_inputs`.
+		Indicators that need nothing get geogrid_data itself.
+
+		Parameters
+		----------
+		geogrid_data : :class:`brix.GEOGRIDDATA`
+		indicator_name : str
+		views : dict, optional
+			Variants of geogrid_data already built, keyed by requirements. New variants are added to it, so that each one is built at most once and shared by all the indicators that declared the same requirements.
+			When a variant with geometries and properties is needed, it is built from the variant with only one of them if that one already exists.
+		'''
+		if not isinstance(geogrid_data,GEOGRIDDATA):
+			return geogrid_data
+		requirements = self._indicator_requirements(indicator_name)
+		if not any(requirements):
+			return geogrid_data
+		if views is None:
+			return geogrid_data.with_inputs(*requirements)
+		if requirements not in views:
+			if (requirements==(True,True)) and ((True,False) in views):
+				views[requirements] = views[(True,False)].with_inputs(with_properties=True)
+			elif (requirements==(True,True)) and ((False,True) in views):
+				views[requirements] = views[(False,True)].with_inputs(include_geometries=True)
+			else:
+				views[requirements] = geogrid_data.with_inputs(*requirements)
+		return views[requirements]
+
+	def _indicator_requirements(self,indicator_name):
+		'''
+		Returns the tuple (requires_geometry, requires_geogrid_props) of the given indicator, as it was when the indicator was added.
+		'''
+		if indicator_name not in self._input_requirements:
+			I = self.indicators[indicator_name]
+			self._input_requirements[indicator_name] = (bool(I.requires_geometry),bool(I.requires_geogrid_props))
+		return self._input_requirements[indicator_name]
 
+	def _format_value(self,new_value_raw,indicator_name):
+		'''
+		Formats the raw value returned by the indicator's return_indicator function.
+		See :func:`brix.Handler._new_value`.
+		'''
+		I = self.indicators[indicator_name]
 		if I.indicator_type   in ['access','heatmap']:
 			return self._new_value_heatmap(new_value_raw,I,indicator_name)
 
@@ -913,15 +2274,17 @@ class Handler(Thread):
 	def _new_value_heatmap(self,new_value,I,indicator_name):
 		'''
 		Handles multiple formats of a new_value for a heatmap indicator.
-		GEOPANDAS.GEODATAFRAME IS ALSO SUPPORTED BUT HAS NOT BEEN TESTED
+		:class:`brix.HeatmapFrame` objects are passed as they are, and GeoDataFrames of points are converted to one.
 
 		Parameters
 		----------
 		new_value: object
 			Object returned by some subclass of :func:`brix.Indicator.return_indicator` when :attr:`brix.Indicator.indicator_type` is `heatmap` or `access`.
 		'''
+		if isinstance(new_value, HeatmapFrame):
+			return [new_value]
 		if isinstance(new_value, gpd.GeoDataFrame):
-			new_value = json.loads(new_value.to_json())
+			return [HeatmapFrame.from_geodataframe(new_value)]
 		new_value = self._format_geojson(new_value,indicator_name)
 		return [new_value]
 
@@ -939,10 +2302,9 @@ class Handler(Thread):
 			for i in range(len(new_value)):
 				val = new_value[i]
 				if not isinstance(val,dict):
-					try:
-						json.dumps(val)
+					if is_json_value(val):
 						new_value[i] = {'value':val}
-					except:
+					else:
 						warn('Indicator return invalid type:'+str(indicator_name))
 				if ('indicator_type' not in val.keys())&(I.indicator_type is not None):
 					val['indicator_type'] = I.indicator_type
@@ -951,10 +2313,9 @@ class Handler(Thread):
 			return list(new_value)
 		else:
 			if not isinstance(new_value,dict):
-				try:
-					json.dumps(new_value)
+				if is_json_value(new_value):
 					new_value = {'value':new_value}
-				except:
+				else:
 					warn('Indicator return invalid type:'+str(indicator_name))
 			if ('name' not in new_value.keys()):
 				new_value['name'] = indicator_name
@@ -964,66 +2325,67 @@ class Handler(Thread):
 				new_value['viz_type'] = I.viz_type
 			return [new_value]
 
-	def get_GEOGRID_EDGES(self):
+	def get_GEOGRID_EDGES(self,neighborhood=4):
 		'''
 		Gets the edges of a graph that connects each cell to its nearest neighbors.
+		See :func:`brix.GeometryStore.edge_array`.
+
+		Parameters
+		----------
+		neighborhood: int, defaults to 4
+			Either 4 (cells sharing a side) or 8 (cells sharing a side or a corner).
 
 		Returns
 		-------
 		GEOGRID_EDGES: list
-			Edge list of cell ids. Each cell has at most 4 neighbors.
+			Edge list of cell ids. Each cell has at most 4 (or 8) neighbors.
 		'''
+		if neighborhood!=4:
+			return self.get_geometry_store().edges(neighborhood=neighborhood)
 		if self.GEOGRID_EDGES is None:
-			try:
-				geos = pd.DataFrame([(cell['properties']['id'],cell['geometry']) for cell in self.get_GEOGRID()['features']],columns=['id','geometry'])
-			except:
-				geos = pd.DataFrame([(i,cell['geometry']) for i,cell in enumerate(self.get_GEOGRID()['features'])],columns=['id','geometry'])
-			geos = gpd.GeoDataFrame(geos.drop('geometry',1),geometry=geos['geometry'].apply(lambda x: shape(x))) # no crs to avoid warning
-			geos['lon'] = round(geos.geometry.centroid.x,4)
-			geos['lat'] = round(geos.geometry.centroid.y,4)
-
-			edge_list = []
-			for xlabel,ylabel in [('lon','lat'),('lat','lon')]:
-				rows = geos.groupby(xlabel)
-				for name, group in rows:
-					ids = group.sort_values(by=ylabel)['id'].values.tolist()
-					edge_list += list(zip(ids[:-1],ids[1:]))
-			self.GEOGRID_EDGES = edge_list
+			self.GEOGRID_EDGES = self.get_geometry_store().edges()
 		return self.GEOGRID_EDGES
 
-	def _combine_heatmap_values(self,new_values_heatmap):
+	def get_geometry_store(self):
 		'''
-		Combines a list of heatmap features (formatted as geojsons) into one cityIO GeoJson
-		'''
-
-		all_properties = set([])
-		combined_features = {}
-		for new_value in new_values_heatmap:
-			for f in new_value['features']:
-				if f['geometry'] is None:
-					raise NameError('Unknown geometry found in heatmap:',f)
-				if f['geometry']['type']=='Point':
-					all_properties = all_properties|set(f['properties'].keys())
-					lon,lat = f['geometry']['coordinates']
-					hashed = pgh.encode(lat,lon)
-					
-					if hashed in combined_features.keys():
-						combined_features[hashed]['properties'] = {**combined_features[hashed]['properties'], **f['properties']} 
-						combined_features[hashed]['properties'] = defaultdict(lambda: self.none_character,combined_features[hashed]['properties'])
-					else:
-						combined_features[pgh.encode(lat,lon)] = f
-				else:
-					raise NameError('Only Points supported at this point')
-		all_properties = list(all_properties)
-		combined_features = list(combined_features.values())
-		for f in combined_features:
-			f['properties'] = [f['properties'][p] for p in all_properties]
+		Returns the parsed geometries of GEOGRID.
+		The store is built once per GEOGRID and discarded only when GEOGRID changes (see :func:`brix.Handler.get_GEOGRID`).
+
+		Returns
+		-------
+		geometry_store : :class:`brix.GeometryStore`
+			Shapely geometries, centroids, bounds, and id index of the cells of GEOGRID.
+		'''
+		if self.geometry_store is None:
+			self.geometry_store = GeometryStore(self.get_GEOGRID())
+		return self.geometry_store
+
+	def get_type_table(self):
+		'''
+		Returns the colors and interactive flags of the types defined in GEOGRID.
+		The table is built once per GEOGRID and rebuilt if the types of GEOGRID change.
+
+		Returns
+		-------
+		type_table : :class:`brix.TypeTable`
+			Arrays of colors and interactive flags indexed by type code.
+		'''
+		GEOGRID = self.get_GEOGRID()
+		if (self.type_table is None) or (not self.type_table.matches(GEOGRID)):
+			self.type_table = TypeTable(GEOGRID)
+		return self.type_table
 
-		return {'type':'FeatureCollection','properties':all_properties,'features':combined_features}
+	def _combine_heatmap_values(self,new_values_heatmap):
+		'''
+		Combines a list of heatmaps (formatted as geojsons or :class:`brix.HeatmapFrame`) into one cityIO GeoJson.
+		See :func:`brix.merge_heatmaps`.
+		'''
+		return merge_heatmaps(new_values_heatmap,none_character=self.none_character)
 
 	def get_indicator_values(self,geogrid_data=None,include_composite=False):
 		'''
 		Returns the current values of NUMERIC indicators. Used for developing a composite indicator.
+		Each indicator is evaluated once, and composite indicators are evaluated following their dependencies (see :func:`brix.Handler.composite_order`).
 
 		Parameters
 		----------
@@ -1037,24 +2399,145 @@ class Handler(Thread):
 		'''
 		if geogrid_data is None:
 			geogrid_data = self._get_grid_data()
-		new_values_numeric = []
-
-		for indicator_name in self.indicators:
-			I = self.indicators[indicator_name]
-			if (I.indicator_type not in ['access','heatmap'])&(not I.is_composite):
-				if I.indicator_type=='hybrid':
-					new_values_numeric += self._new_value(geogrid_data,indicator_name)['numeric']
-				else:
-					new_values_numeric += self._new_value(geogrid_data,indicator_name)
+		new_values_numeric = self._numeric_values(geogrid_data)
 		indicator_values = {i['name']:i['value'] for i in new_values_numeric}
 		if include_composite:
-			for indicator_name in self.indicators:
-				I = self.indicators[indicator_name]
-				if (I.indicator_type not in ['access','heatmap'])&(I.is_composite):
-					new_values_numeric += self._new_value(indicator_values,indicator_name)
+			new_values_numeric += self._evaluate_composites(indicator_values,raise_error=True)
 		indicator_values = {i['name']:i['value'] for i in new_values_numeric}
 		return indicator_values
 
+	def _numeric_values(self,geogrid_data,indicator_names=None,raise_error=True):
+		'''
+		Runs the given indicators once and returns their formatted numeric values.
+		If indicator_names is not provided, it will run all non-composite numeric and hybrid indicators.
+		'''
+		if indicator_names is None:
+			indicator_names = [indicator_name for indicator_name in self.indicators if (self.indicators[indicator_name].indicator_type not in ['access','heatmap','grid']) and (not self.indicators[indicator_name].is_composite)]
+		raw_values = self._compute_raw_values(geogrid_data,indicator_names)
+		new_values_numeric = []
+		for indicator_name in indicator_names:
+			new_value_raw,error = raw_values[indicator_name]
+			if error is not None:
+				if raise_error:
+					raise error
+				continue
+			new_value = self._format_value(new_value_raw,indicator_name)
+			if self.indicators[indicator_name].indicator_type=='hybrid':
+				new_values_numeric += new_value.get('numeric',[])
+			elif self.indicators[indicator_name].indicator_type=='numeric':
+				new_values_numeric += new_value
+		return new_values_numeric
+
+	def composite_order(self,targets=None):
+		'''
+		Returns the names of the numeric composite indicators in the order they should be evaluated.
+		Composite indicators of other types are evaluated on geogrid_data, like non-composite indicators.
+		The order is built from the dependency graph declared in :attr:`brix.CompositeIndicator.selected_indicators`: a composite indicator that selects another composite indicator is evaluated after it.
+
+		Parameters
+		----------
+		targets : list, optional
+			If provided, it will only return the given composite indicators and the composite indicators they depend on.
+
+		Returns
+		-------
+		composite_order : list
+			Names of composite indicators in topological order.
+		'''
+		if self._composite_order_cache is None:
+			composites = [indicator_name for indicator_name in self.indicators if self._is_numeric_composite(indicator_name)]
+			dependencies = {indicator_name:self._composite_dependencies(indicator_name) for indicator_name in composites}
+			order = []
+			visiting = set()
+			def visit(indicator_name):
+				if indicator_name in order:
+					return
+				if indicator_name in visiting:
+					raise NameError('Circular dependency found in composite indicator: '+str(indicator_name))
+				visiting.add(indicator_name)
+				for dependency in dependencies[indicator_name]:
+					visit(dependency)
+				visiting.remove(indicator_name)
+				order.append(indicator_name)
+			for indicator_name in composites:
+				visit(indicator_name)
+			self._composite_order_cache = order
+
+		if targets is None:
+			return list(self._composite_order_cache)
+		selected = set()
+		pending = list(targets)
+		while len(pending)!=0:
+			indicator_name = pending.pop()
+			if indicator_name not in selected:
+				selected.add(indicator_name)
+				pending += self._composite_dependencies(indicator_name)
+		return [indicator_name for indicator_name in self._composite_order_cache if indicator_name in selected]
+
+	def _composite_dependencies(self,indicator_name):
+		'''
+		Returns the composite indicators selected by the given composite indicator.
+		'''
+		selected_indicators = getattr(self.indicators[indicator_name],'selected_indicators',[])
+		return [k for k in selected_indicators if (k in self.indicators) and (k!=indicator_name) and self._is_numeric_composite(k)]
+
+	def _composite_inputs(self,indicator_values,indicator_name):
+		'''
+		Returns the values passed to the given composite indicator, evaluating the composite indicators it depends on.
+
+		Parameters
+		----------
+		indicator_values : dict
+			Values of the non-composite indicators. See :func:`brix.Handler.get_indicator_values`.
+		indicator_name : str
+			Name of the composite indicator.
+		'''
+		dependencies = [k for k in self.composite_order(targets=[indicator_name]) if k!=indicator_name]
+		if len(dependencies)==0:
+			return indicator_values
+		indicator_values = dict(indicator_values)
+		new_values = self._evaluate_composites(indicator_values,targets=dependencies,raise_error=True)
+		indicator_values.update({i['name']:i['value'] for i in new_values})
+		return indicator_values
+
+	def _evaluate_composites(self,indicator_values,targets=None,raise_error=None):
+		'''
+		Evaluates the composite indicators in the order given by :func:`brix.Handler.composite_order`.
+		Each composite indicator is fed the values of the non-composite indicators and of all the composite indicators evaluated before it.
+
+		Parameters
+		----------
+		indicator_values : dict
+			Values of the non-composite indicators. See :func:`brix.Handler.get_indicator_values`.
+		targets : list, optional
+			If provided, it will only evaluate these composite indicators and the composite indicators they depend on.
+		raise_error : boolean, optional
+			If `False`, it will warn and skip the composite indicators that fail.
+			If not provided, errors are raised unless the Handler is listening with `robust=True` (see :func:`brix.Handler.listen`).
+
+		Returns
+		-------
+		new_values : list
+			Formatted values of the composite indicators.
+		'''
+		if raise_error is None:
+			raise_error = not self.robust
+		all_values = dict(indicator_values)
+		new_values = []
+		for indicator_name in self.composite_order(targets=targets):
+			I = self.indicators[indicator_name]
+			try:
+				new_value = self._format_value(I.return_indicator(dict(all_values)),indicator_name)
+				all_values.update({i['name']:i['value'] for i in new_value})
+			except Exception:
+				if raise_error:
+					raise
+				warn('Indicator not working:'+str(indicator_name))
+				warn(traceback.format_exc())
+				continue
+			new_values += new_value
+		return new_values
+
 	def update_package(self,geogrid_data=None,append=False):
 		'''
 		Returns the package that will be posted in CityIO.
@@ -1073,16 +2556,50 @@ class Handler(Thread):
 		'''
 		if geogrid_data is None:
 			geogrid_data = self._get_grid_data()
+		new_values = self._evaluate_indicators(geogrid_data)
+
+		if append:
+			current_numeric = (self.see_current() if len(new_values['numeric'])!=0 else None)
+			current_access  = (self.see_current(indicator_type='access') if len(new_values['heatmap'])!=0 else None)
+			self._append_current(new_values,current_numeric,current_access)
+
+		return self._package_values(new_values)
+
+	def _evaluate_indicators(self,geogrid_data):
+		'''
+		Runs every indicator on the given geogrid_data and returns the formatted values grouped by type.
+		Composite indicators are evaluated after all other indicators.
+
+		Returns
+		-------
+		new_values : dict
+			Dict formated as: {'numeric':numeric_values,'heatmap':list_of_heatmaps,'textual':textual_values}
+		'''
 		new_values_numeric = []
 		new_values_heatmap = []
 		new_values_textual = []
 
-		# Get values for non-composite indicators first
+		# Get values for non-composite indicators first (non-numeric composite indicators are also evaluated on geogrid_data)
+		indicator_names = [indicator_name for indicator_name in self.indicators if (not self._is_numeric_composite(indicator_name)) and (self.indicators[indicator_name].indicator_type not in ['grid']) and (not self._is_static_heatmap(indicator_name))]
+		raw_values = self._compute_raw_values(geogrid_data,indicator_names)
+		static_added = False
 		for indicator_name in self.indicators:
 			try:
 				I = self.indicators[indicator_name]
-				if I.indicator_type in ['hybrid']:
-					new_value_hybrid = self._new_value(geogrid_data,indicator_name)
+				if self._is_numeric_composite(indicator_name):
+					# Evaluated below, once all numeric values are known
+					continue
+				if indicator_name in raw_values:
+					new_value_raw,error = raw_values[indicator_name]
+					if error is not None:
+						raise error
+				if self._is_static_heatmap(indicator_name):
+					# All static heatmaps are added once, already merged
+					if not static_added:
+						static_added = True
+						new_values_heatmap.append(self._get_static_heatmap())
+				elif I.indicator_type in ['hybrid']:
+					new_value_hybrid = self._format_value(new_value_raw,indicator_name)
 					if 'heatmap' in new_value_hybrid.keys():
 						new_values_heatmap += new_value_hybrid['heatmap']
 					if 'numeric' in new_value_hybrid.keys():
@@ -1090,61 +2607,222 @@ class Handler(Thread):
 					if 'textual' in new_value_hybrid.keys():
 						new_values_textual += new_value_hybrid['textual']
 				elif I.indicator_type in ['access','heatmap']:
-					new_values_heatmap += self._new_value(geogrid_data,indicator_name)
+					new_values_heatmap += self._format_value(new_value_raw,indicator_name)
 				elif I.indicator_type in ['text','textual','annotation']:
-					new_values_textual += self._new_value(geogrid_data,indicator_name)
+					new_values_textual += self._format_value(new_value_raw,indicator_name)
 				elif (I.indicator_type in ['numeric'])&(not I.is_composite):
-					new_values_numeric += self._new_value(geogrid_data,indicator_name)
-				elif (I.indicator_type in ['grid']):
+					new_values_numeric += self._format_value(new_value_raw,indicator_name)
+				elif (I.indicator_type in ['grid'])|(I.is_composite):
 					pass
 				else:
 					raise NameError(f'Unrecognized indicator type {I.indicator_type} for {indicator_name}')
-			except Exception:
+			except Exception as e:
 				warn('Indicator not working:'+str(indicator_name))
-				warn(traceback.format_exc())
+				warn(''.join(traceback.format_exception(type(e),e,e.__traceback__)))
 
 		# Get values for composite indicators
-		for indicator_name in self.indicators:
-			I = self.indicators[indicator_name]
-			if (I.is_composite)&(I.indicator_type not in ['access','heatmap']):
-				indicator_values = {i['name']:i['value'] for i in new_values_numeric}
-				new_values_numeric += self._new_value(indicator_values,indicator_name)
+		indicator_values = {i['name']:i['value'] for i in new_values_numeric}
+		new_values_numeric += self._evaluate_composites(indicator_values)
 
 		# add ref values if they exist
 		if self.reference is not None:
 			for new_value in new_values_numeric:
 				if new_value['name'] in self.reference:
 					new_value['ref_value']=self.reference[new_value['name']]
-		
-		if append:
-			if len(new_values_numeric)!=0:
-				current = self.see_current()
-				self.previous_indicators = current
-				current = [indicator for indicator in current if indicator['name'] not in self.indicators.keys()]
-				new_values_numeric += current
-
-			if len(new_values_heatmap)!=0:
-				current_access = self.see_current(indicator_type='access')
-				self.previous_access = current_access
-				current_access = self._format_geojson(current_access,None)
-				new_values_heatmap = [current_access]+new_values_heatmap
-
-		new_values_heatmap = self._combine_heatmap_values(new_values_heatmap)
+
+		return {'numeric':new_values_numeric,'heatmap':new_values_heatmap,'textual':new_values_textual}
+
+	def _is_numeric_composite(self,indicator_name):
+		I = self.indicators[indicator_name]
+		return I.is_composite and (I.indicator_type in ['numeric'])
+
+	def _is_static_heatmap(self,indicator_name):
+		I = self.indicators[indicator_name]
+		return I.is_static and (I.indicator_type in ['access','heatmap']) and (not I.is_composite)
+
+	def _get_static_heatmap(self):
+		'''
+		Returns the combined heatmap of all static heatmap indicators (see :attr:`brix.Indicator.is_static`) as a :class:`brix.HeatmapFrame`.
+		Static indicators are evaluated and merged the first time this is called, and the result is reused until the indicators or :attr:`brix.Handler.none_character` change.
+		Only the dynamic heatmaps are merged with it on every update.
+		'''
+		indicator_names = [indicator_name for indicator_name in self.indicators if self._is_static_heatmap(indicator_name)]
+		key = (tuple([(indicator_name,id(self.indicators[indicator_name])) for indicator_name in indicator_names]),self.none_character)
+		if (self._static_heatmap is None) or (self._static_heatmap[0]!=key):
+			layers = []
+			for indicator_name in indicator_names:
+				layers += self._format_value(self.indicators[indicator_name].return_indicator(None),indicator_name)
+			self._static_heatmap = (key,merge_heatmaps(layers,none_character=self.none_character,as_frame=True))
+		return self._static_heatmap[1]
+
+	def get_indicator_executor(self):
+		'''
+		Returns the pool used to compute indicators concurrently, creating it if needed.
+		Returns `None` if :attr:`brix.Handler.executor_mode` is not set.
+		The pool belongs to this Handler, and is not shared with the executors used to run the Handler (e.g. by :class:`brix.AsyncHandler` or :class:`brix.HandlerPool`).
+		Each worker of a process pool receives GEOGRID once when it starts, and the pool is replaced when GEOGRID changes.
+		'''
+		if (self.indicator_executor is not None) and (self.executor_mode=='process') and (self._worker_GEOGRID is not self.GEOGRID):
+			self.shutdown_indicator_executor()
+		if (self.indicator_executor is None) and (self.executor_mode is not None):
+			if self.executor_mode=='thread':
+				self.indicator_executor = ThreadPoolExecutor(max_workers=self.max_workers,thread_name_prefix='brix-indicators',initializer=self._register_indicator_thread)
+			else:
+				self._worker_GEOGRID = self.GEOGRID
+				self.indicator_executor = ProcessPoolExecutor(max_workers=self.max_workers,initializer=_init_indicator_worker,initargs=(self.GEOGRID,))
+		return self.indicator_executor
+
+	def _register_indicator_thread(self):
+		self._indicator_threads.add(get_ident())
+
+	def shutdown_indicator_executor(self):
+		'''
+		Shuts down the pool used to compute indicators concurrently.
+		A new pool will be created the next time it is needed.
+		'''
+		if self.indicator_executor is not None:
+			self.indicator_executor.shutdown(wait=True)
+			self.indicator_executor = None
+			self._indicator_threads = set()
+			self._worker_GEOGRID = None
+
+	def _is_picklable(self,indicator_name):
+		'''
+		Checks once whether the indicator can be sent to a process pool.
+		'''
+		if indicator_name not in self._picklable_indicators:
+			try:
+				pickle.dumps(self.indicators[indicator_name])
+				self._picklable_indicators[indicator_name] = True
+			except Exception:
+				warn(f'Indicator {indicator_name} cannot be pickled and will be computed in the main process')
+				self._picklable_indicators[indicator_name] = False
+		return self._picklable_indicators[indicator_name]
+
+	def _compute_raw_values(self,geogrid_data,indicator_names):
+		'''
+		Runs the return_indicator function of the given indicators, concurrently if :attr:`brix.Handler.executor_mode` is set.
+		Indicators that define :func:`brix.Indicator.update_indicator` only receive the cells that changed since the last time they were evaluated.
+
+		Returns
+		-------
+		raw_values : dict
+			Dictionary formated as ``{indicator_name: (raw_value, error), ...}``, where error is the exception raised by the indicator or `None`.
+		'''
+		raw_values = {}
+		content_hash = None
+		if (self.result_cache.max_size>0) and any([self.indicators[indicator_name].cache_results for indicator_name in indicator_names]):
+			content_hash = geogrid_data.content_hash()
+			for indicator_name in indicator_names:
+				if self.indicators[indicator_name].cache_results:
+					found,value = self.result_cache.lookup((indicator_name,content_hash))
+					if found:
+						# The cached value is shared, so the copy is formatted instead
+						raw_values[indicator_name] = (deepcopy(value),None)
+		pending = [indicator_name for indicator_name in indicator_names if indicator_name not in raw_values]
+
+		calls = {}
+		snapshot = None
+		diffs = {}
+		# Each variant of the input is built the first time an indicator needs it
+		views = {}
+		for indicator_name in pending:
+			I = self.indicators[indicator_name]
+			indicator_input = self._indicator_input(geogrid_data,indicator_name,views=views)
+			if not I.is_incremental():
+				calls[indicator_name] = (_return_indicator,(I,indicator_input))
+				continue
+			if snapshot is None:
+				snapshot = geogrid_data.snapshot()
+			changed_cells = None
+			if indicator_name in self._incremental_state:
+				previous_snapshot,prev_value = self._incremental_state[indicator_name]
+				if id(previous_snapshot) not in diffs:
+					diffs[id(previous_snapshot)] = geogrid_data.diff(previous_snapshot)
+				changed_cells = diffs[id(previous_snapshot)]
+			if changed_cells is None:
+				calls[indicator_name] = (_return_indicator,(I,indicator_input))
+			else:
+				calls[indicator_name] = (_update_indicator,(I,deepcopy(prev_value),changed_cells,indicator_input))
+
+		# Indicators are evaluated one after another when called from one of the workers of the pool, which would otherwise wait on itself
+		executor = (self.get_indicator_executor() if (len(pending)>1) and (get_ident() not in self._indicator_threads) else None)
+		futures = {}
+		worker_inputs = {}
+		for indicator_name in pending:
+			if (executor is None) or ((self.executor_mode=='process') and (not self._is_picklable(indicator_name))):
+				continue
+			func,args = calls[indicator_name]
+			indicator_input = args[-1]
+			if (self.executor_mode=='process') and isinstance(indicator_input,GEOGRIDDATA) and (indicator_input.GEOGRID is not None) and (indicator_input.GEOGRID is self._worker_GEOGRID):
+				# Workers already have GEOGRID, so only the cells are sent
+				if id(indicator_input) not in worker_inputs:
+					worker_inputs[id(indicator_input)] = indicator_input._for_worker()
+				args = args[:-1]+(worker_inputs[id(indicator_input)],)
+			futures[indicator_name] = executor.submit(func,*args)
+
+		for indicator_name in pending:
+			if indicator_name in futures:
+				error = futures[indicator_name].exception()
+				raw_values[indicator_name] = ((futures[indicator_name].result() if error is None else None),error)
+			else:
+				func,args = calls[indicator_name]
+				try:
+					raw_values[indicator_name] = (func(*args),None)
+				except Exception as e:
+					raw_values[indicator_name] = (None,e)
+			new_value_raw,error = raw_values[indicator_name]
+			if (content_hash is not None) and (error is None) and self.indicators[indicator_name].cache_results:
+				self.result_cache.store((indicator_name,content_hash),new_value_raw)
+			if self.indicators[indicator_name].is_incremental():
+				if error is None:
+					self._incremental_state[indicator_name] = (snapshot,deepcopy(new_value_raw))
+				else:
+					self._incremental_state.pop(indicator_name,None)
+		return raw_values
+
+	def _append_current(self,new_values,current_numeric=None,current_access=None):
+		'''
+		Appends the values currently posted in the table to the values returned by :func:`brix.Handler._evaluate_indicators`.
+		Modification is done in-place.
+
+		Parameters
+		----------
+		new_values : dict
+			Result of :func:`brix.Handler._evaluate_indicators`.
+		current_numeric : list, optional
+			Current value of the indicators endpoint. See :func:`brix.Handler.see_current`.
+		current_access : dict, optional
+			Current value of the access endpoint. See :func:`brix.Handler.see_current`.
+		'''
+		if current_numeric is not None:
+			self.previous_indicators = current_numeric
+			current_numeric = [indicator for indicator in current_numeric if indicator['name'] not in self.indicators.keys()]
+			new_values['numeric'] += current_numeric
+
+		if current_access is not None:
+			self.previous_access = current_access
+			current_access = self._format_geojson(current_access,None)
+			new_values['heatmap'] = [current_access]+new_values['heatmap']
+
+	def _package_values(self,new_values):
+		'''
+		Groups all heatmap values returned by :func:`brix.Handler._evaluate_indicators` into the package that will be posted in CityIO.
+		'''
 		out = {}
-		out['numeric'] = new_values_numeric
-		out['heatmap'] = new_values_heatmap
-		out['textual'] = new_values_textual
+		out['numeric'] = new_values['numeric']
+		out['heatmap'] = self._combine_heatmap_values(new_values['heatmap'])
+		out['textual'] = new_values['textual']
 		return out
 		
 	def test_indicators(self):
-		'''Dry run over all indicators.'''
+		'''Dry run over all indicators.
+		Every indicator is evaluated once, and composite indicators are fed the values computed in the same run.'''
 		geogrid_data = self._get_grid_data()
-		for indicator_name in self.indicators:
-			if self.indicators[indicator_name].is_composite:
-				indicator_values = self.get_indicator_values(geogrid_data=geogrid_data,include_composite=False)
-				self._new_value(indicator_values,indicator_name)
-			else:
-				self._new_value(geogrid_data,indicator_name)
+		indicator_names = [indicator_name for indicator_name in self.indicators if not self._is_numeric_composite(indicator_name)]
+		new_values_numeric = self._numeric_values(geogrid_data,indicator_names=indicator_names)
+		indicator_values = {i['name']:i['value'] for i in new_values_numeric}
+		self._evaluate_composites(indicator_values,raise_error=True)
             
 	def get_geogrid_props(self):
 		'''
@@ -1171,20 +2849,35 @@ class Handler(Thread):
 		Retreives the GEOGRID hash from:
 		http://cityio.media.mit.edu/api/table/table_name/meta/hashes
 		'''
-		r = self._get_url(urljoin(self.cityIO_get_url,'meta/hashes'))
+		self.poll_policy.on_poll()
+		try:
+			r = self._get_url(urljoin(self.cityIO_get_url,'meta/hashes'))
+		except requests.exceptions.RequestException as e:
+			warn('Cant access cityIO hashes: '+str(e))
+			self.poll_policy.on_error()
+			return self.grid_hash_id
 		if r.status_code==200:
-			hashes = r.json()
-			try:
-				grid_hash_id = hashes[self.GEOGRIDDATA_varname]
-			except:
-				warn('WARNING: Table does not have a '+self.GEOGRIDDATA_varname+' variable.')
-				grid_hash_id = self.grid_hash_id
+			self.poll_policy.on_success()
+			grid_hash_id = self._parse_grid_hash(self.codec.loads(r.content))
 		else:
 			warn('Cant access cityIO hashes')
-			sleep(1)
+			self.poll_policy.on_error()
 			grid_hash_id=self.grid_hash_id
 		return grid_hash_id
 
+	def _parse_grid_hash(self,hashes):
+		'''
+		Returns the GEOGRIDDATA hash from the dict returned by the meta/hashes endpoint.
+		'''
+		if isinstance(hashes,dict):
+			self._hashes = (right_now(),hashes)
+		try:
+			grid_hash_id = hashes[self.GEOGRIDDATA_varname]
+		except:
+			warn('WARNING: Table does not have a '+self.GEOGRIDDATA_varname+' variable.')
+			grid_hash_id = self.grid_hash_id
+		return grid_hash_id
+
 	def get_GEOGRID(self,force_get=False):
 		'''
 		Returns geogrid object stored locally. If force_get=True, it will return remote object and overwrite local object.
@@ -1195,18 +2888,33 @@ class Handler(Thread):
 			If `True` it will GET request the geogrid object and overwrite the locally stored one.
 		'''
 		if (self.GEOGRID is None)|force_get:
-			r = self._get_url(urljoin(self.cityIO_get_url,self.GEOGRID_varname))
-			if r.status_code==200:
-				geogrid = r.json()
-				try:
-					geogrid = self.parse_classifications(geogrid)
-				except:
-					warn('NAICS and LBCS classifications were not properly parsed.')
-				self.GEOGRID = geogrid
-			else:
+			status_code,geogrid = self._get_json(urljoin(self.cityIO_get_url,self.GEOGRID_varname),self.GEOGRID_varname,decode_unchanged=(self.GEOGRID is None))
+			if geogrid is not None:
+				self._set_GEOGRID(geogrid)
+			elif status_code!=304:
 				warn('WARNING: Cant access GEOGRID')
 		return self.GEOGRID
 
+	def _set_GEOGRID(self,geogrid):
+		'''
+		Parses and stores the given GEOGRID.
+		If it differs from the stored one, everything derived from the previous GEOGRID is discarded. Otherwise, the stored object is kept, together with its geometry store.
+		'''
+		try:
+			geogrid = self.parse_classifications(geogrid)
+		except:
+			warn('NAICS and LBCS classifications were not properly parsed.')
+		if self.GEOGRID is None:
+			self.GEOGRID = geogrid
+		elif geogrid!=self.GEOGRID:
+			self.geogrid_props = None
+			self.GEOGRID_EDGES = None
+			self.geometry_store = None
+			self.type_table = None
+			self.result_cache.invalidate()
+			self._incremental_state = {}
+			self.GEOGRID = geogrid
+
 	def normalize_codes(self,code_proportion):
 		'''
 		Helper function to transform:
@@ -1269,7 +2977,7 @@ class Handler(Thread):
 					cell['properties']['color'] = cell['properties']['color'][:3]+[int(default_alpha*255)]
 			else:
 				cell['properties']['color'] = cell['properties']['color'][:3]+[int(alpha*255)]
-		r = requests.post(urljoin(self.cityIO_GEOGRID_post_url,'features'),data=json.dumps(features),headers=self.post_headers)
+		r = self._post_url(urljoin(self.cityIO_GEOGRID_post_url,'features'),data=self.codec.dumps(features))
 		geogrid = self.get_GEOGRID(force_get=True)
 
 	def get_GEOGRIDDATA(self):
@@ -1277,54 +2985,51 @@ class Handler(Thread):
 		Returns the raw GEOGRIDDATA object.
 		This function should be treated as a low-level function, please use :func:`brix.Handler.get_geogrid_data` instead.
 		'''
-		r = self._get_url(urljoin(self.cityIO_get_url,self.GEOGRIDDATA_varname))
-		if r.status_code==200:
-			geogrid_data = r.json()
-		else:
+		status_code,geogrid_data = self._get_json(urljoin(self.cityIO_get_url,self.GEOGRIDDATA_varname),self.GEOGRIDDATA_varname)
+		if status_code not in [200,304]:
 			warn('WARNING: Cant access GEOGRIDDATA')
-			sleep(1)
 			geogrid_data = None
 		return geogrid_data
 
 	def _get_grid_data(self,include_geometries=False,with_properties=False):
 		geogrid_data = self.get_GEOGRIDDATA()
+		return self._build_grid_data(geogrid_data,include_geometries=include_geometries,with_properties=with_properties)
+
+	def _build_grid_data(self,geogrid_data,include_geometries=False,with_properties=False):
+		'''
+		Turns the raw GEOGRIDDATA returned by :func:`brix.Handler.get_GEOGRIDDATA` into the :class:`brix.GEOGRIDDATA` object passed to the indicators.
+		'''
 		geogrid = self.get_GEOGRID()
 		geogrid_edges = self.get_GEOGRID_EDGES()
 		
-		geogrid_data = GEOGRIDDATA(geogrid_data)
+		geogrid_data = (ColumnarGEOGRIDDATA(geogrid_data) if self.columnar else GEOGRIDDATA(geogrid_data))
 		geogrid_data.set_classification_list(self.classification_list)
 		geogrid_data.set_geogrid(geogrid)
 		geogrid_data.set_geogrid_edges(geogrid_edges)
+		geogrid_data.set_geometry_store(self.get_geometry_store())
+		geogrid_data.set_type_table(self.get_type_table())
 		
-		if not geogrid_data.check_id_validity():
-			geogrid_data.fill_missing_cells()
-			if not geogrid_data.check_id_validity():
-				warn('WARNING: Current GEOGRIDDATA includes undefined types.')
+		report = geogrid_data.validate(fill_missing=True)
+		if not report['valid_ids']:
+			warn('WARNING: Current GEOGRIDDATA includes undefined types.')
 	
-		if include_geometries|any([I.requires_geometry for I in self.indicators.values()]):
-			for i in range(len(geogrid_data)):
-				geogrid_data[i]['geometry'] = self.get_GEOGRID()['features'][i]['geometry']
-
-		if with_properties|any([I.requires_geogrid_props for I in self.indicators.values()]):
-			geogrid_props = geogrid['properties']
-			types_def = geogrid_props['types'].copy()
-			if 'static_types' in geogrid_props:
-				types_def.update(geogrid_props['static_types'])
-			types_def['None'] = None
-			for cell in geogrid_data:
-				if cell['name'] in types_def.keys():
-					cell['properties'] = types_def[cell['name']]
+		# Indicators get the geometries and properties they need through Handler._indicator_input
+		if include_geometries:
+			geogrid_data.attach_geometries()
+		if with_properties:
+			geogrid_data.attach_properties()
 
 		return geogrid_data
 
-	def _get_url(self,url,params=None,raise_warning=True):
+	def _get_url(self,url,params=None,raise_warning=True,headers=None):
 		attempts = 0
 		success = False
 		while (attempts < self.nAttempts)&(not success):
 			if not self.quietly:
 				print(url,'Attempt:',attempts)
-			r = requests.get(url,params=params)
-			if r.status_code==200:
+			r = self.session.get(url,params=params,headers=self._request_headers(headers),timeout=self.timeout)
+			self._count_received(url,r.content,r.headers)
+			if r.status_code in [200,304]:
 				success=True
 			else:
 				attempts+=1
@@ -1333,6 +3038,153 @@ class Handler(Thread):
 				warn('FAILED TO RETRIEVE URL: '+url)
 		return r
 
+	def _get_json(self,url,varname=None,decode_unchanged=True):
+		'''
+		GETs the given url and decodes its JSON body, using conditional requests when :attr:`brix.Handler.conditional_get` is `True`.
+
+		Parameters
+		----------
+		url : str
+			Url to get.
+		varname : str, optional
+			Name of the endpoint in the cityIO hashes (e.g. GEOGRIDDATA). If the hash was polled recently and did not change, no request is made.
+		decode_unchanged : boolean, defaults to `True`
+			If `False`, the cached body is not decoded when the endpoint did not change.
+
+		Returns
+		-------
+		status_code : int
+			200 if the body was downloaded, 304 if the cached body was reused, or the status code of the failed request.
+		content : dict or list
+			Decoded body, or `None` if the request failed or if the endpoint did not change and `decode_unchanged` is `False`.
+		'''
+		skip,headers,hash_id = self._conditional_headers(url,varname)
+		if skip:
+			status_code,content,response_headers = 304,None,{}
+		else:
+			r = self._get_url(url,headers=headers)
+			status_code,content,response_headers = r.status_code,r.content,r.headers
+		return self._handle_conditional(url,status_code,content,response_headers,hash_id,decode_unchanged=decode_unchanged)
+
+	def _conditional_headers(self,url,varname=None):
+		'''
+		Returns the headers of a conditional request to the given url.
+
+		Returns
+		-------
+		skip : boolean
+			`True` if the cached body is known to be current and no request is needed.
+		headers : dict
+			Conditional headers to send.
+		hash_id : str
+			Current cityIO hash of the endpoint, if it was polled recently.
+		'''
+		if not self.conditional_get:
+			return False,{},None
+		hashes_time,hashes = self._hashes
+		hash_id = None
+		if (varname is not None) and (hashes_time is not None) and (right_now()-hashes_time<=self.hash_max_age):
+			hash_id = hashes.get(varname)
+		cached = self._validators.get(url)
+		if cached is None:
+			return False,{},hash_id
+		if (hash_id is not None) and (cached['hash_id']==hash_id):
+			return True,{},hash_id
+		headers = {}
+		if cached['etag'] is not None:
+			headers['If-None-Match'] = cached['etag']
+		if cached['last_modified'] is not None:
+			headers['If-Modified-Since'] = cached['last_modified']
+		return False,headers,hash_id
+
+	def _handle_conditional(self,url,status_code,content,headers,hash_id=None,decode_unchanged=True):
+		'''
+		Stores the validators of a response and decodes its body, reusing the cached body on 304.
+		See :func:`brix.Handler._get_json`.
+		'''
+		if not self.conditional_get:
+			return status_code,(self.codec.loads(content) if status_code==200 else None)
+		cached = self._validators.get(url)
+		if status_code==304:
+			if cached is None:
+				warn('Server answered 304 to an unconditional request: '+url)
+				return status_code,None
+			if hash_id is not None:
+				cached['hash_id'] = hash_id
+			return status_code,(self.codec.loads(cached['content']) if decode_unchanged else None)
+		if status_code!=200:
+			return status_code,None
+		etag = headers.get('ETag')
+		last_modified = headers.get('Last-Modified')
+		if (etag is not None) or (last_modified is not None) or (hash_id is not None):
+			self._validators[url] = {'etag':etag,'last_modified':last_modified,'hash_id':hash_id,'content':content}
+		else:
+			self._validators.pop(url,None)
+		return status_code,self.codec.loads(content)
+
+	def _post_url(self,url,data=None,headers=None):
+		'''
+		Posts data to the given url using the pooled session of the Handler.
+
+		Parameters
+		----------
+		url : str
+			Url to post to.
+		data : str
+			Serialized body of the request.
+		headers : dict, optional
+			Defaults to :attr:`brix.Handler.post_headers`.
+		'''
+		if headers is None:
+			headers = self.post_headers
+		body,headers = self._encode_body(url,data,headers)
+		return self.session.post(url,data=body,headers=headers,timeout=self.timeout)
+
+	def _request_headers(self,headers=None):
+		'''
+		Adds :attr:`brix.Handler.get_headers` to the headers of a GET request.
+		'''
+		return self.get_headers if headers is None else {**self.get_headers,**headers}
+
+	def _encode_body(self,url,data,headers):
+		'''
+		Encodes the body of a POST request, gzipping it if :attr:`brix.Handler.compress_posts` is `True` and it is at least :attr:`brix.Handler.compress_min_size` bytes long.
+		Updates :attr:`brix.Handler.transfer_stats`.
+
+		Returns
+		-------
+		body : bytes
+			Body to send.
+		headers : dict
+			Headers to send, with `Content-Encoding` set if the body was compressed.
+		'''
+		body = data.encode('utf-8') if isinstance(data,str) else data
+		if body is None:
+			return body,headers
+		size = len(body)
+		if self.compress_posts and (size>=self.compress_min_size):
+			body = gzip.compress(body,compresslevel=6)
+			headers = {**headers,'Content-Encoding':'gzip'}
+		self._count_transfer(url,'sent',size,len(body))
+		return body,headers
+
+	def _count_received(self,url,content,headers):
+		'''
+		Counts the bytes of a response in :attr:`brix.Handler.transfer_stats`.
+		When the response was compressed, the size on the wire is taken from its `Content-Length` header.
+		'''
+		size = len(content) if content is not None else 0
+		wire_size = size
+		if (headers.get('Content-Encoding') is not None) and (headers.get('Content-Length') is not None):
+			wire_size = int(headers.get('Content-Length'))
+		self._count_transfer(url,'received',size,wire_size)
+
+	def _count_transfer(self,url,direction,size,wire_size):
+		stats = self.transfer_stats.setdefault(url,{'sent':0,'sent_bytes':0,'sent_wire_bytes':0,'received':0,'received_bytes':0,'received_wire_bytes':0})
+		stats[direction] += 1
+		stats[direction+'_bytes'] += size
+		stats[direction+'_wire_bytes'] += wire_size
+
 	def get_geogrid_data(self,include_geometries=False,with_properties=False):
 		'''
 		Returns the geogrid data from:
@@ -1374,15 +3226,7 @@ class Handler(Thread):
 
 		new_values = self.update_package(append=append)
 
-		i_count = 0
-		if 'numeric' in new_values.keys():
-			i_count += len(new_values['numeric'])
-		if 'textual' in new_values.keys():
-			i_count += len(new_values['textual'])
-		if 'heatmap' in new_values.keys():
-			i_count += len(new_values['heatmap']['properties'])
-
-		if i_count==0:
+		if self._count_values(new_values)==0:
 			if not self.quietly:
 				print('No values to update')
 		else:
@@ -1395,6 +3239,19 @@ class Handler(Thread):
 		if return_update_package:
 			return new_values
 
+	def _count_values(self,new_values):
+		'''
+		Returns the number of indicator values in the package returned by :func:`brix.Handler.update_package`.
+		'''
+		i_count = 0
+		if 'numeric' in new_values.keys():
+			i_count += len(new_values['numeric'])
+		if 'textual' in new_values.keys():
+			i_count += len(new_values['textual'])
+		if 'heatmap' in new_values.keys():
+			i_count += len(new_values['heatmap']['properties'])
+		return i_count
+
 	def _post_indicators(self,new_values,post_empty=False):
 		'''
 		Post indicators to numeric, heatmap, and textual endpoints.
@@ -1407,14 +3264,63 @@ class Handler(Thread):
 			If False, it will prevent the function from posting empty indicators.
 		'''
 
+		for url,data in self._changed_posts(self._indicator_posts(new_values,post_empty=post_empty)):
+			r = self._post_url(url,data=data)
+			self._record_post(url,data,r.status_code)
+
+	def _changed_posts(self,posts):
+		'''
+		Filters out the posts whose payload is the same as the last one successfully posted to that url, and counts them in :attr:`brix.Handler.post_stats`.
+		Returns the posts unchanged if :attr:`brix.Handler.skip_unchanged` is `False`.
+		'''
+		if not self.skip_unchanged:
+			return posts
+		changed = []
+		for url,data in posts:
+			body = data.encode('utf-8')
+			if self._post_fingerprints.get(url)==hashlib.md5(body).hexdigest():
+				self.post_stats['skipped'] += 1
+				self.post_stats['skipped_bytes'] += len(body)
+			else:
+				changed.append((url,data))
+		return changed
+
+	def _record_post(self,url,data,status_code):
+		'''
+		Updates the fingerprint of the given url and :attr:`brix.Handler.post_stats` after posting.
+		Failed posts forget the fingerprint, so that the next payload is posted no matter what.
+		'''
+		if status_code<400:
+			body = data.encode('utf-8')
+			self.post_stats['sent'] += 1
+			self.post_stats['sent_bytes'] += len(body)
+			if self.skip_unchanged:
+				self._post_fingerprints[url] = hashlib.md5(body).hexdigest()
+		else:
+			self._post_fingerprints.pop(url,None)
+
+	def reset_post_fingerprints(self):
+		'''
+		Forgets the payloads posted so far, so that the next update posts every endpoint.
+		Useful when the indicator endpoints are changed by someone else.
+		'''
+		self._post_fingerprints = {}
+
+	def _indicator_posts(self,new_values,post_empty=False):
+		'''
+		Returns the list of (url,data) requests needed to post the given values.
+		See :func:`brix.Handler._post_indicators`.
+		'''
+		posts = []
 		if ('numeric' in new_values.keys()) and (post_empty or len(new_values['numeric'])!=0):
-			r = requests.post(urljoin(self.cityIO_post_url,'indicators'), data=json.dumps(new_values['numeric']), headers=self.post_headers)
+			posts.append((urljoin(self.cityIO_post_url,'indicators'), self.codec.dumps(new_values['numeric'])))
 
 		if ('heatmap' in new_values.keys()) and (post_empty or len(new_values['heatmap']['features'])!=0):
-			r = requests.post(urljoin(self.cityIO_post_url,'access'),     data=json.dumps(new_values['heatmap']), headers=self.post_headers)
+			posts.append((urljoin(self.cityIO_post_url,'access'),     self.codec.dumps(new_values['heatmap'])))
 
 		if ('textual' in new_values.keys()) and (post_empty or len(new_values['textual'])!=0):
-			r = requests.post(urljoin(self.cityIO_post_url,'textual'),    data=json.dumps(new_values['textual']), headers=self.post_headers)
+			posts.append((urljoin(self.cityIO_post_url,'textual'),    self.codec.dumps(new_values['textual'])))
+		return posts
 
 	def clear_endpoints(self):
 		'''
@@ -1464,16 +3370,18 @@ class Handler(Thread):
 		''':class:`brix.Handler` keeps track of the previous value of the indicators and access values.This function rollsback the current values to whatever the locally stored values are.
 		See also :func:`brix.Handler.previous_indicators` and :func:`brix.Handler.previous_access`.
 		'''
-		r = requests.post(urljoin(self.cityIO_post_url,'indicators'), data=json.dumps(self.previous_indicators), headers=self.post_headers)
-		r = requests.post(urljoin(self.cityIO_post_url,'access'),     data=json.dumps(self.previous_access),     headers=self.post_headers)
+		self.reset_post_fingerprints()
+		r = self._post_url(urljoin(self.cityIO_post_url,'indicators'), data=self.codec.dumps(self.previous_indicators))
+		r = self._post_url(urljoin(self.cityIO_post_url,'access'),     data=self.codec.dumps(self.previous_access))
 
 
 	def clear_table(self):
 		'''Clears all indicators from the table.'''
 		grid_hash_id = self.get_grid_hash()
 		empty_update = {'numeric': [],'heatmap': {'type': 'FeatureCollection', 'properties': [], 'features': []}}
-		r = requests.post(urljoin(self.cityIO_post_url,'indicators'), data=json.dumps(empty_update['numeric']), headers=self.post_headers)
-		r = requests.post(urljoin(self.cityIO_post_url,'access')    , data=json.dumps(empty_update['heatmap']), headers=self.post_headers)
+		self.reset_post_fingerprints()
+		r = self._post_url(urljoin(self.cityIO_post_url,'indicators'), data=self.codec.dumps(empty_update['numeric']))
+		r = self._post_url(urljoin(self.cityIO_post_url,'access')    , data=self.codec.dumps(empty_update['heatmap']))
 		if not self.quietly:
 			print('Cleared table')
 		self.grid_hash_id = grid_hash_id
@@ -1507,35 +3415,65 @@ class Handler(Thread):
 
 		if showFront:
 			webbrowser.open(self.front_end_url, new=2)
+		self.listening = True
+		self.change_source.start()
 		self.grid_hash_id = self.get_grid_hash()
-		while True:
-			sleep(self.sleep_time())
-			grid_hash_id = self.get_grid_hash()
-			if grid_hash_id!=self.grid_hash_id:
-				self.wake_up()
-				if not robust:
-					if self.perform_geogrid_data_update():
-						grid_hash_id = self.get_grid_hash()
-					self.perform_update(grid_hash_id=grid_hash_id,append=self.append_on_post)
+		try:
+			while self.listening:
+				grid_hash_id = self.change_source.wait_for_change(self.grid_hash_id)
+				if not self.listening:
+					break
+				if grid_hash_id!=self.grid_hash_id:
+					self.wake_up()
+					self._update_on_change(grid_hash_id,robust=robust)
 				else:
-					try:
-						if self.perform_geogrid_data_update():
-							grid_hash_id = self.get_grid_hash()
-						self.perform_update(grid_hash_id=grid_hash_id,append=self.append_on_post)
-					except Exception:
-						warn('I was not able to update grid with hash:',grid_hash_id)
-						warn(traceback.format_exc())
-						warn('Waiting until a new grid appears')
-						self.grid_hash_id = grid_hash_id
-			else:
-				self.check_rest()
+					self.check_rest()
+		finally:
+			self.change_source.close()
+
+	def stop(self):
+		'''
+		Stops :func:`brix.Handler.listen` after the current iteration and closes the change source.
+		'''
+		self.listening = False
+		self.change_source.close()
+
+	def _update_on_change(self,grid_hash_id,robust=False):
+		'''
+		Updates GEOGRIDDATA (if needed) and all indicators after a change in the grid.
+
+		Parameters
+		----------
+		grid_hash_id : str
+			Hash of the new grid.
+		robust : boolean, defaults to `False`
+			If `True`, errors are not raised. The Handler will wait until the grid changes and try to update again.
+
+		Returns
+		-------
+		success : boolean
+			`False` if the update failed when `robust=True`.
+		'''
+		try:
+			if self.perform_geogrid_data_update():
+				grid_hash_id = self.get_grid_hash()
+			self.perform_update(grid_hash_id=grid_hash_id,append=self.append_on_post)
+		except Exception:
+			if not robust:
+				raise
+			warn('I was not able to update grid with hash: '+str(grid_hash_id))
+			warn(traceback.format_exc())
+			warn('Waiting until a new grid appears')
+			self.grid_hash_id = grid_hash_id
+			return False
+		return True
 
 	def run(self):
 		'''
 		Run method to be called by :func:`threading.Thread.start`. 
 		It runs :func:`brix.Handler._listen`.
 		'''
-		self._listen(showFront=False)
+		self._listen(showFront=False,robust=self.robust)
 
 	def listen(self,new_thread=False,showFront=False,append=False,clear_endpoints=False,robust=False):
 		'''
@@ -1561,7 +3499,7 @@ class Handler(Thread):
 			This is not recommended for deployment, only for testing. 
 		robust : boolean, defaults to `False`
 			If `True`, whenever a grid configuration breaks an indicator, the module will not stop, but rather wait until the grid changes and try to update again.
-			Incompatible with `new_thread=True`
+			To listen to many tables from one process, see :class:`brix.HandlerPool`.
 		'''
 
 		unlinked_indicators = self.list_all_unlinked_indicators()
@@ -1569,6 +3507,7 @@ class Handler(Thread):
 			unlinked_indicators = ', '.join(unlinked_indicators)
 			warn(f'You have unlinked indicators: {unlinked_indicators}')
 		self.append_on_post = append
+		self.robust = robust
 		if clear_endpoints:
 			self.clear_endpoints()
 		if new_thread:
@@ -1610,11 +3549,12 @@ class Handler(Thread):
 		if not override_verification:
 			geogrid_data = GEOGRIDDATA(geogrid_data)
 			geogrid_data.set_geogrid(self.get_GEOGRID())
-			geogrid_data.check_type_validity()
-			if not geogrid_data.check_id_validity():
-				geogrid_data.fill_missing_cells()
-				if not geogrid_data.check_id_validity():
-					raise NameError('IDs do not match.')
+			geogrid_data.set_type_table(self.get_type_table())
+			report = geogrid_data.validate(fill_missing=True)
+			if not report['valid_types']:
+				raise NameError('Some types defined in GEOGRIDDATA do not match those in GEOGRID\n. Unrecognized types:',set(report['unknown_types']))
+			if not report['valid_ids']:
+				raise NameError('IDs do not match.')
 
 			geogrid_data.remap_colors()
 			geogrid_data.remap_interactive()
@@ -1623,13 +3563,13 @@ class Handler(Thread):
 			if not self.quietly:
 				print('Proceeding without reviewing GEOGRIDDATA')
 
-		geogrid_data = list(geogrid_data)
+		geogrid_data = (geogrid_data.to_records() if isinstance(geogrid_data,GEOGRIDDATA) else list(geogrid_data))
 
 		ids = [cell['id'] for cell in geogrid_data]
 		ids = np.argsort(ids)
 		geogrid_data = [geogrid_data[i] for i in ids]
 
-		r = requests.post(urljoin(self.cityIO_post_url,self.GEOGRIDDATA_varname), data=json.dumps(geogrid_data), headers=self.post_headers)
+		r = self._post_url(urljoin(self.cityIO_post_url,self.GEOGRIDDATA_varname), data=self.codec.dumps(geogrid_data))
 		self.grid_hash_id = self.get_grid_hash()
 		if not self.quietly:
 			print('GEOGRIDDATA successfully updated:',self.grid_hash_id)
@@ -1667,8 +3607,58 @@ class Handler(Thread):
 
 
 
+_worker_state = {}
+
+def _init_indicator_worker(GEOGRID):
+	'''
+	Initializer of the process pool of :class:`brix.Handler`. Keeps GEOGRID in the worker, so that it is not sent with every indicator.
+	'''
+	_worker_state.clear()
+	_worker_state['GEOGRID'] = GEOGRID
+
+def _restore_worker_input(geogrid_data):
+	'''
+	Sets the GEOGRID kept by the worker, and the objects built from it in previous calls, in an object built by :func:`brix.GEOGRIDDATA._for_worker`.
+	'''
+	if getattr(geogrid_data,'_worker_GEOGRID',False):
+		geogrid_data._worker_GEOGRID = False
+		geogrid_data.GEOGRID = _worker_state['GEOGRID']
+		geogrid_data.geometry_store = _worker_state.get('geometry_store')
+		geogrid_data.type_table = _worker_state.get('type_table')
+		return True
+	return False
+
+def _keep_worker_state(geogrid_data):
+	for k in ['geometry_store','type_table']:
+		if getattr(geogrid_data,k) is not None:
+			_worker_state[k] = getattr(geogrid_data,k)
+
+def _return_indicator(I,geogrid_data):
+	'''
+	Module level wrapper around :func:`brix.Indicator.return_indicator` that can be sent to a process pool.
+	'''
+	restored = _restore_worker_input(geogrid_data)
+	new_value = I.return_indicator(geogrid_data)
+	if restored:
+		_keep_worker_state(geogrid_data)
+	return new_value
+
+def _update_indicator(I,prev_value,changed_cells,geogrid_data):
+	'''
+	Module level wrapper around :func:`brix.Indicator.update_indicator` that can be sent to a process pool.
+	'''
+	restored = _restore_worker_input(geogrid_data)
+	new_value = I.update_indicator(prev_value,changed_cells,geogrid_data)
+	if restored:
+		_keep_worker_state(geogrid_data)
+	return new_value
+
 class Indicator:
-	'''Parent class to build indicators from. To use, you need to define a subclass than inherets properties from this class. Doing so, ensures your indicator inherets the necessary methods and properties to connect with a CityScipe table.'''
+	'''Parent class to build indicators from. To use, you need to define a subclass than inherets properties from this class. Doing so, ensures your indicator inherets the necessary methods and properties to connect with a CityScipe table.
+
+	Indicators whose value only depends on the grid can set `self.cache_results = True` in :func:`brix.Indicator.setup`, so that the :class:`brix.Handler` reuses their value when the grid goes back to a state it already evaluated (see :class:`brix.ResultCache`).
+	The value returned by `return_indicator` is stored as it is, so the indicator should not modify it afterwards.
+	Indicators that use random numbers or external data should keep the default (`False`).'''
 	def __init__(self,*args,**kwargs):
 		self.name = None
 		self.indicator_type = 'numeric'
@@ -1682,6 +3672,8 @@ class Indicator:
 		# self.geogrid_header=None
 		self.override_verification = False
 		self.is_composite = False
+		self.is_static = False
+		self.cache_results = False
 		self.tableHandler = None
 		self.table_name = None
 		for k in ['name','model_path','requires_geometry','indicator_type','viz_type','requires_geogrid_props']:
@@ -1711,7 +3703,7 @@ class Indicator:
 		Parameters
 		----------
 		geogrid_data : dict
-			Current state of the table. See :func:`brix.Indicator.get_geogrid_data` and :func:`brix.Handler.get_geogrid_data`. The content of this object will depend on the needs of the indicator. In particular, the values of :attr:`brix.Indicator.requires_geometry` and :attr:`brix.Indicator.requires_geogrid_props`.
+			Current state of the table. See :func:`brix.Indicator.get_geogrid_data` and :func:`brix.Handler.get_geogrid_data`. The content of this object will depend on the needs of the indicator. In particular, the values of :attr:`brix.Indicator.requires_geometry` and :attr:`brix.Indicator.requires_geogrid_props`. The same object may be passed to other indicators with the same needs, so it should be treated as read-only.
 
 		Returns
 		-------
@@ -1740,6 +3732,34 @@ class Indicator:
 		else:
 			return {}
 
+	def update_indicator(self,prev_value,changed_cells,geogrid_data):
+		'''
+		Optional user defined function to update the value of the indicator when only a few cells changed.
+		If defined, :class:`brix.Handler` will call this function instead of :func:`brix.Indicator.return_indicator` whenever the previous value is known and the grid can be compared cell by cell.
+		When the hook is not defined, or the previous value is not available, the indicator is computed from scratch using :func:`brix.Indicator.return_indicator`.
+
+		Parameters
+		----------
+		prev_value : list, dict, or float
+			Value returned by this indicator for the previous state of the grid. This object is a copy and can be modified.
+		changed_cells : list
+			Ids of the cells that changed since the previous state. See :func:`brix.GEOGRIDDATA.diff`.
+		geogrid_data : dict
+			Current state of the table. See :func:`brix.Indicator.return_indicator`.
+
+		Returns
+		-------
+		indicator_value : list, dict, or float
+			Value of indicator, in the same format as :func:`brix.Indicator.return_indicator`.
+		'''
+		return self.return_indicator(geogrid_data)
+
+	def is_incremental(self):
+		'''
+		Returns `True` if the indicator defines :func:`brix.Indicator.update_indicator`.
+		'''
+		return type(self).update_indicator is not Indicator.update_indicator
+
 	def return_indicator_numeric(self,geogrid_data):
 		'''
 		Placeholder for user to define.
@@ -1896,6 +3916,7 @@ class StaticHeatmap(Indicator):
 	'''
 	Wrapper to create a simple static heatmap indicator.
 	The indicator will post the given shapefile to the table.
+	The shapefile is formatted once in setup, and the indicator is flagged as static (`is_static`), so that the :class:`brix.Handler` merges it once and reuses it on every update (see :func:`brix.Handler._get_static_heatmap`).
 
 	Parameters
 	----------
@@ -1919,6 +3940,7 @@ class StaticHeatmap(Indicator):
 	def setup(self,shapefile,columns=None,name=None,normalize_values=True):
 		self.indicator_type = 'heatmap'
 		self.requires_geometry = True
+		self.is_static = True
 		if isinstance(shapefile,str):
 			shapefile = gpd.read_file(shapefile)
 		else:
@@ -1936,9 +3958,9 @@ class StaticHeatmap(Indicator):
 				c_min = self.shapefile[c].min()
 				c_max = self.shapefile[c].max()
 				self.shapefile[c] = (self.shapefile[c]-c_min)/(c_max-c_min)
+		self.heatmap = HeatmapFrame.from_geodataframe(self.shapefile,columns=self.columns)
 		hashed_columns = hashlib.md5('-'.join(list(set(self.columns))).encode('utf-8')).hexdigest()[:5]
 		self.name = (f'StaticHeatmap_{hashed_columns}' if (name is None) else name)
 
 	def return_indicator(self, geogrid_data):
-		out = json.loads(self.shapefile.to_json())['features']
-		return out
\ No newline at end of file
+		return self.heatmap
\ No newline at end of file
@@ -0,0 +1,123 @@
+import json
+import numpy as np
+try:
+	import orjson
+except:
+	orjson = None
+try:
+	import ujson
+except:
+	ujson = None
+
+def _default(obj):
+	'''
+	Converts the objects the json encoders do not know about (numpy scalars and arrays, sets, mappings) to python objects.
+	'''
+	if isinstance(obj,np.generic):
+		return obj.item()
+	if isinstance(obj,np.ndarray):
+		return obj.tolist()
+	if isinstance(obj,(set,frozenset,tuple)):
+		return list(obj)
+	if hasattr(obj,'keys') and hasattr(obj,'__getitem__'):
+		return {k:obj[k] for k in obj.keys()}
+	raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+class JSONCodec:
+	'''
+	Encodes and decodes the payloads exchanged with cityIO using the standard library.
+	numpy scalars and arrays are serialized as python numbers and lists.
+	This is the default codec. Subclasses use faster encoders, which have to be selected explicitly, see :func:`brix.get_codec`.
+
+	Attributes
+	----------
+	name : str
+		Name of the codec.
+	'''
+	name = 'json'
+
+	def dumps(self,obj):
+		'''
+		Returns the given object serialized as a JSON string.
+		'''
+		return json.dumps(obj,default=_default)
+
+	def loads(self,data):
+		'''
+		Parses the given JSON string or bytes.
+		'''
+		return json.loads(data)
+
+class OrjsonCodec(JSONCodec):
+	'''
+	Codec based on orjson. Install it with: pip install cs-brix[orjson]
+	Unlike the standard library, NaN and infinite values are serialized as `null`, and dictionary keys that are not strings are turned into strings.
+	'''
+	name = 'orjson'
+
+	def __init__(self):
+		if orjson is None:
+			raise NameError('OrjsonCodec requires orjson. Install it with: pip install cs-brix[orjson]')
+		self.options = orjson.OPT_SERIALIZE_NUMPY|orjson.OPT_NON_STR_KEYS
+
+	def dumps(self,obj):
+		return orjson.dumps(obj,default=_default,option=self.options).decode('utf-8')
+
+	def loads(self,data):
+		return orjson.loads(data)
+
+class UjsonCodec(JSONCodec):
+	'''
+	Codec based on ujson. Requires ujson>=5.4, which accepts the `default` argument. Install it with: pip install cs-brix[ujson]
+	'''
+	name = 'ujson'
+
+	def __init__(self):
+		if ujson is None:
+			raise NameError('UjsonCodec requires ujson. Install it with: pip install cs-brix[ujson]')
+		try:
+			ujson.dumps(None,default=_default)
+		except TypeError:
+			raise NameError('UjsonCodec requires ujson>=5.4. Install it with: pip install cs-brix[ujson]')
+
+	def dumps(self,obj):
+		return ujson.dumps(obj,default=_default,ensure_ascii=False)
+
+	def loads(self,data):
+		return ujson.loads(data)
+
+_codecs = {'json':JSONCodec,'orjson':OrjsonCodec,'ujson':UjsonCodec}
+
+def get_codec(codec=None):
+	'''
+	Returns the codec used to encode and decode cityIO payloads.
+
+	Parameters
+	----------
+	codec : str or :class:`brix.JSONCodec`, optional
+		Either 'orjson', 'ujson', 'json', or a codec object, which is returned as is.
+		If not provided, it uses the standard library. Faster codecs are only used when selected, since they do not produce exactly the same payloads (see :class:`brix.OrjsonCodec`).
+
+	Returns
+	-------
+	codec : :class:`brix.JSONCodec`
+	'''
+	if isinstance(codec,JSONCodec):
+		return codec
+	if codec is None:
+		return JSONCodec()
+	if codec not in _codecs:
+		raise NameError('codec should either be orjson, ujson, or json. Current codec: '+str(codec))
+	return _codecs[codec]()
+
+def is_json_value(value):
+	'''
+	Checks if the value can be serialized by the codecs without serializing it: numbers (including numpy scalars), strings, booleans, `None`, numpy arrays, and lists or dicts of those.
+	'''
+	if (value is None) or isinstance(value,(str,int,float,bool,np.generic,np.ndarray)):
+		return True
+	if isinstance(value,(list,tuple)):
+		return all(is_json_value(v) for v in value)
+	if isinstance(value,dict):
+		return all(isinstance(k,str) and is_json_value(v) for k,v in value.items())
+	return False
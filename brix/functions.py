@@ -348,7 +348,13 @@ def griddify(geogrid_data,shapefile,extend_grid=True,buffer_percent=1.3,columns=
 	geogrid_data_df = geogrid_data.as_df(include_geometries=True)
 	if local_crs is not None:
 		geogrid_data_df = geogrid_data_df.to_crs(local_crs)
-	geogrid_data_df.geometry = geogrid_data_df.geometry.centroid
+		geogrid_data_df.geometry = geogrid_data_df.geometry.centroid
+	elif geogrid_data.GEOGRID is not None:
+		geometry_store = geogrid_data.get_geometry_store()
+		centroids = geometry_store.centroids[geometry_store.rows(geogrid_data_df['id'])]
+		geogrid_data_df.geometry = gpd.points_from_xy(centroids[:,0],centroids[:,1],crs=geogrid_data_df.crs)
+	else:
+		geogrid_data_df.geometry = geogrid_data_df.geometry.centroid
 
 	if extend_grid:
 		limit = geogrid_data.bounds(buffer_percent=buffer_percent)
@@ -369,7 +375,7 @@ def griddify(geogrid_data,shapefile,extend_grid=True,buffer_percent=1.3,columns=
 
 		extended_grid = [Point(lon,lat) for lat in all_lats for lon in all_lons]
 		extended_grid = gpd.GeoDataFrame([],geometry=extended_grid,crs='EPSG:4326').reset_index().rename(columns={'index':'extended_id'})
-		grid_match = sjoin(geogrid_data.as_df(include_geometries=True),extended_grid)
+		grid_match = sjoin(geogrid_data.as_df(include_geometries=True,copy=False),extended_grid)
 		extended_grid = pd.merge(extended_grid,grid_match[['id','extended_id']].rename(columns={'id':'grid_id'}),how='left')
 		selected_grid = extended_grid
 		grid_ids = ['extended_id','grid_id']
@@ -0,0 +1,374 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from shapely.geometry import shape
+from .graph import GridGraph
+try:
+	from scipy.spatial import cKDTree
+except:
+	cKDTree = None
+
+class GeometryStore:
+	'''
+	Parsed geometries of the cells of a GEOGRID.
+	Geometries are parsed once, when the store is created, and the centroids, bounds, and id index are derived from them.
+	:class:`brix.Handler` builds one store per GEOGRID (see :func:`brix.Handler.get_geometry_store`) and shares it with every :class:`brix.GEOGRIDDATA` object it creates.
+
+	The store should be treated as read-only.
+
+	Parameters
+	----------
+	GEOGRID : dict
+		GEOGRID object, as returned by :func:`brix.Handler.get_GEOGRID`.
+
+	Attributes
+	----------
+	ids : numpy.ndarray
+		Id of each cell, in the same order as the features of GEOGRID.
+	geometries : numpy.ndarray
+		Array of shapely geometries.
+	centroids : numpy.ndarray
+		Array of shape (n_cells, 2) with the lon and lat of the centroid of each cell.
+	cell_bounds : numpy.ndarray
+		Array of shape (n_cells, 4) with the bounds of each cell [W, S, E, N].
+	total_bounds : list
+		Bounding box of the grid [W, S, E, N].
+	index : dict
+		Dictionary that maps each cell id to its row in the arrays.
+	'''
+	def __init__(self,GEOGRID):
+		features = GEOGRID['features']
+		try:
+			ids = [cell['properties']['id'] for cell in features]
+		except:
+			ids = list(range(len(features)))
+		self.GEOGRID = GEOGRID
+		self.ids = np.array(ids)
+		self.geometries = _parse_geometries([cell['geometry'] for cell in features])
+		if hasattr(shapely,'centroid'):
+			self.centroids = shapely.get_coordinates(shapely.centroid(self.geometries)).reshape(len(features),2)
+			self.cell_bounds = shapely.bounds(self.geometries).reshape(len(features),4)
+		else:
+			self.centroids = np.array([(g.centroid.x,g.centroid.y) for g in self.geometries]).reshape(len(features),2)
+			self.cell_bounds = np.array([g.bounds for g in self.geometries]).reshape(len(features),4)
+		if len(features)!=0:
+			self.total_bounds = [self.cell_bounds[:,0].min(),self.cell_bounds[:,1].min(),self.cell_bounds[:,2].max(),self.cell_bounds[:,3].max()]
+		else:
+			self.total_bounds = None
+		self.index = dict(zip(ids,range(len(ids))))
+		self._geometry_rows = {id(cell['geometry']):i for i,cell in enumerate(features)}
+		self._frame = None
+		self._edges = {}
+		self._edge_rows = {}
+		self._graphs = {}
+
+	def __len__(self):
+		return len(self.ids)
+
+	def __copy__(self):
+		return self
+
+	def __deepcopy__(self,memo):
+		return self
+
+	def rows(self,ids):
+		'''
+		Returns the rows of the given cell ids.
+
+		Parameters
+		----------
+		ids : list
+			List of cell ids.
+
+		Returns
+		-------
+		rows : numpy.ndarray
+			Position of each cell in the arrays of the store.
+		'''
+		index = self.index
+		return np.array([index[i] for i in ids],dtype=np.int64)
+
+	def shapes(self,geometries):
+		'''
+		Turns a list of geojson geometries into shapely geometries.
+		Geometries taken from the GEOGRID of the store are not parsed again.
+
+		Parameters
+		----------
+		geometries : list
+			List of geojson geometries.
+
+		Returns
+		-------
+		shapes : list
+			List of shapely geometries.
+		'''
+		geometry_rows = self._geometry_rows
+		stored = self.geometries
+		shapes = []
+		for g in geometries:
+			row = geometry_rows.get(id(g))
+			if (row is not None) and (self.GEOGRID['features'][row]['geometry'] is g):
+				shapes.append(stored[row])
+			else:
+				shapes.append(shape(g))
+		return shapes
+
+	def frame(self):
+		'''
+		Returns a GeoDataFrame with the id and geometry of every cell.
+		The frame is built once and shared, so it should not be modified in place.
+		'''
+		if self._frame is None:
+			self._frame = gpd.GeoDataFrame({'id':self.ids},geometry=gpd.GeoSeries(self.geometries,crs='EPSG:4326'),crs='EPSG:4326')
+		return self._frame
+
+	def centroid_frame(self,decimals=4):
+		'''
+		Returns a DataFrame with the id and the rounded centroid of every cell.
+
+		Parameters
+		----------
+		decimals : int, defaults to 4
+			Number of decimals to round the coordinates to. If `None`, coordinates are not rounded.
+		'''
+		centroids = self.centroids if decimals is None else np.round(self.centroids,decimals)
+		return pd.DataFrame({'id':self.ids,'lon':centroids[:,0],'lat':centroids[:,1]})
+
+	def edge_array(self,neighborhood=4):
+		'''
+		Returns the edges of a graph that connects each cell to its nearest neighbors, as an array of cell ids.
+		If the header of GEOGRID describes the grid (`nrows` and `ncols`) and the cells follow that layout, edges are taken from the layout, which also handles rotated grids.
+		Otherwise, neighbors are found with a spatial index over the centroids.
+
+		Parameters
+		----------
+		neighborhood : int, defaults to 4
+			Either 4 (cells sharing a side) or 8 (cells sharing a side or a corner).
+
+		Returns
+		-------
+		edges : numpy.ndarray
+			Array of shape (n_edges, 2) with the ids of the cells connected by each edge.
+		'''
+		if neighborhood not in [4,8]:
+			raise NameError(f'neighborhood should either be 4 or 8. Current value: {neighborhood}')
+		if neighborhood not in self._edges:
+			self._edges[neighborhood] = self.ids[self.edge_rows(neighborhood=neighborhood)]
+		return self._edges[neighborhood]
+
+	def edges(self,neighborhood=4):
+		'''
+		Returns the edges of a graph that connects each cell to its nearest neighbors.
+
+		Parameters
+		----------
+		neighborhood : int, defaults to 4
+			Either 4 (cells sharing a side) or 8 (cells sharing a side or a corner).
+
+		Returns
+		-------
+		edges : list
+			Edge list of cell ids. Each cell has at most 4 (or 8) neighbors.
+		'''
+		return [tuple(edge) for edge in self.edge_array(neighborhood=neighborhood).tolist()]
+
+	def edge_rows(self,neighborhood=4):
+		'''
+		Same as :func:`brix.GeometryStore.edge_array`, but returns rows of the store instead of cell ids.
+		'''
+		if neighborhood not in self._edge_rows:
+			header = self.GEOGRID.get('properties',{}).get('header',{})
+			edge_rows = None
+			if ('nrows' in header) and ('ncols' in header):
+				edge_rows = _lattice_edges(self.centroids,header['nrows'],header['ncols'],neighborhood)
+			if edge_rows is None:
+				edge_rows = _nearest_edges(self.centroids,neighborhood)
+			self._edge_rows[neighborhood] = edge_rows
+		return self._edge_rows[neighborhood]
+
+	def neighbor_rows(self,neighborhood=4):
+		'''
+		Returns the adjacency of the cells in compressed sparse row format.
+		The neighbors of the cell in row `i` are ``indices[indptr[i]:indptr[i+1]]``.
+
+		Parameters
+		----------
+		neighborhood : int, defaults to 4
+			Either 4 (cells sharing a side) or 8 (cells sharing a side or a corner).
+
+		Returns
+		-------
+		indptr : numpy.ndarray
+			Array of length n_cells+1 with the offset of the neighbors of each row.
+		indices : numpy.ndarray
+			Rows of the neighbors of each cell.
+		'''
+		graph = self.graph(neighborhood=neighborhood)
+		return graph.indptr,graph.indices
+
+	def graph(self,neighborhood=4):
+		'''
+		Returns the :class:`brix.GridGraph` of the grid. It is built once per neighborhood.
+
+		Parameters
+		----------
+		neighborhood : int, defaults to 4
+			Either 4 (cells sharing a side) or 8 (cells sharing a side or a corner).
+		'''
+		if neighborhood not in self._graphs:
+			self._graphs[neighborhood] = GridGraph(self.ids,self.edge_rows(neighborhood=neighborhood))
+		return self._graphs[neighborhood]
+
+	def within(self,poly):
+		'''
+		Returns a boolean mask of the cells whose centroid falls within the given polygon.
+
+		Parameters
+		----------
+		poly : shapely.Polygon
+			Polygon to test against.
+
+		Returns
+		-------
+		mask : numpy.ndarray
+			Boolean array with one value per cell.
+		'''
+		if hasattr(shapely,'contains_xy'):
+			return shapely.contains_xy(poly,self.centroids[:,0],self.centroids[:,1])
+		return np.array([shapely.geometry.Point(x,y).within(poly) for x,y in self.centroids],dtype=bool)
+
+def _parse_geometries(geometries):
+	'''
+	Turns a list of geojson geometries into an array of shapely geometries.
+	Grids made of polygons with the same number of vertices and no holes are built in a single call.
+	'''
+	shapes = np.empty(len(geometries),dtype=object)
+	if len(geometries)==0:
+		return shapes
+	if hasattr(shapely,'polygons') and all([(g['type']=='Polygon') and (len(g['coordinates'])==1) for g in geometries]):
+		try:
+			coords = np.array([g['coordinates'][0] for g in geometries],dtype=float)
+		except ValueError:
+			coords = None
+		if (coords is not None) and (coords.ndim==3) and (coords.shape[2]==2):
+			shapes[:] = shapely.polygons(coords)
+			return shapes
+	shapes[:] = [shape(g) for g in geometries]
+	return shapes
+
+def _lattice_edges(centroids,nrows,ncols,neighborhood=4):
+	'''
+	Returns the edges of a grid of `nrows` by `ncols` cells stored row by row, as pairs of rows.
+	The layout is checked against the centroids: the first cells give the step between two columns and two rows, and every centroid should be close to its position in the lattice.
+	Returns `None` if the centroids do not follow the layout.
+	'''
+	try:
+		nrows = int(nrows)
+		ncols = int(ncols)
+	except (TypeError,ValueError):
+		return None
+	if (nrows*ncols!=len(centroids)) or (nrows*ncols==0):
+		return None
+	col_step = (centroids[1]-centroids[0]) if ncols>1 else np.zeros(2)
+	row_step = (centroids[ncols]-centroids[0]) if nrows>1 else np.zeros(2)
+	steps = [np.hypot(*step) for step,n in [(col_step,ncols),(row_step,nrows)] if n>1]
+	if len(steps)==0:
+		return np.zeros((0,2),dtype=np.int64)
+	if min(steps)==0:
+		return None
+	i,j = np.divmod(np.arange(nrows*ncols),ncols)
+	expected = centroids[0]+np.outer(i,row_step)+np.outer(j,col_step)
+	if np.hypot(*(centroids-expected).T).max()>0.25*min(steps):
+		return None
+
+	rows = np.arange(nrows*ncols).reshape(nrows,ncols)
+	pairs = [
+		(rows[:,:-1],rows[:,1:]),
+		(rows[:-1,:],rows[1:,:])
+	]
+	if neighborhood==8:
+		pairs+= [
+			(rows[:-1,:-1],rows[1:,1:]),
+			(rows[:-1,1:],rows[1:,:-1])
+		]
+	return np.concatenate([np.stack([a.ravel(),b.ravel()],axis=1) for a,b in pairs]).astype(np.int64)
+
+def _nearest_edges(centroids,neighborhood=4):
+	'''
+	Returns the edges of a grid of unknown layout, as pairs of rows.
+	The two steps of the lattice are estimated from the displacements between each centroid and its nearest neighbors, and each cell is connected to the cell found one step away (or one step in each direction for 8-neighborhoods).
+	Uses scipy if available, and a shapely spatial index otherwise.
+	'''
+	n_cells = len(centroids)
+	if n_cells<2:
+		return np.zeros((0,2),dtype=np.int64)
+	if (cKDTree is None) and (not hasattr(shapely,'STRtree')):
+		return _rounded_edges(centroids,neighborhood)
+	points = np.column_stack([centroids[:,0]*np.cos(np.radians(centroids[:,1].mean())),centroids[:,1]])
+	# Steps are estimated on a sample of the cells, spread over the whole grid
+	sample = np.unique(np.linspace(0,n_cells-1,min(n_cells,2000)).astype(np.int64))
+	if cKDTree is not None:
+		tree = cKDTree(points)
+		distances,neighbors = tree.query(points[sample],k=min(5,n_cells))
+		cell_size = np.median(distances[:,1])
+		displacements = (points[neighbors[:,1:]]-points[sample][:,None,:]).reshape(-1,2)
+	else:
+		tree = shapely.STRtree(shapely.points(points))
+		_,distances = tree.query_nearest(shapely.points(points[sample]),exclusive=True,return_distance=True,all_matches=False)
+		cell_size = np.median(distances)
+		sources,targets = tree.query(shapely.points(points[sample]),predicate='dwithin',distance=2*cell_size)
+		displacements = points[targets]-points[sample][sources]
+		displacements = displacements[sample[sources]!=targets]
+	if (cell_size==0) or (len(displacements)==0):
+		return np.zeros((0,2),dtype=np.int64)
+	tolerance = 0.25*cell_size
+	flip = (displacements[:,0]<0)|((displacements[:,0]==0)&(displacements[:,1]<0))
+	displacements[flip] *= -1
+
+	# The two shortest frequent, non-parallel displacements are the steps of the lattice
+	quantized = np.round(displacements/tolerance).astype(np.int64)
+	quantized -= quantized.min(axis=0)
+	keys = quantized[:,0]*(quantized[:,1].max()+1)+quantized[:,1]
+	clusters,labels,counts = np.unique(keys,return_inverse=True,return_counts=True)
+	candidates = [displacements[labels==c].mean(axis=0) for c in np.flatnonzero(counts>=0.25*counts.max())]
+	candidates = sorted(candidates,key=lambda step: np.hypot(*step))
+	steps = []
+	for step in candidates:
+		if all([abs(np.cross(step,other))>=0.5*np.hypot(*step)*np.hypot(*other) for other in steps]):
+			steps.append(step)
+		if len(steps)==2:
+			break
+	if neighborhood==8 and len(steps)==2:
+		steps+= [steps[0]+steps[1],steps[0]-steps[1]]
+
+	pairs = []
+	for step in steps:
+		for sign in [1,-1]:
+			if cKDTree is not None:
+				distances,matches = tree.query(points+sign*step,k=1,distance_upper_bound=tolerance)
+				sources = np.flatnonzero(np.isfinite(distances))
+				targets = matches[sources]
+			else:
+				sources,targets = tree.query_nearest(shapely.points(points+sign*step),max_distance=tolerance,all_matches=False)
+			pairs.append(np.stack([sources,targets],axis=1))
+	pairs = np.sort(np.concatenate(pairs).astype(np.int64),axis=1)
+	pairs = pairs[pairs[:,0]!=pairs[:,1]]
+	keys = np.unique(pairs[:,0]*n_cells+pairs[:,1])
+	return np.stack(np.divmod(keys,n_cells),axis=1)
+
+def _rounded_edges(centroids,neighborhood=4):
+	'''
+	Connects consecutive cells of each row and column of centroids rounded to 4 decimals, as pairs of rows.
+	Only used for 4-neighborhoods when neither scipy nor shapely 2 are available.
+	'''
+	if neighborhood!=4:
+		raise NameError('8-neighborhoods on grids without header require scipy or shapely>=2.0. Install scipy with: pip install cs-brix[graph]')
+	geos = pd.DataFrame({'row':np.arange(len(centroids)),'lon':np.round(centroids[:,0],4),'lat':np.round(centroids[:,1],4)})
+	edge_list = []
+	for xlabel,ylabel in [('lon','lat'),('lat','lon')]:
+		for name, group in geos.groupby(xlabel):
+			rows = group.sort_values(by=ylabel)['row'].values.tolist()
+			edge_list += list(zip(rows[:-1],rows[1:]))
+	return np.array(edge_list,dtype=np.int64).reshape(-1,2)
@@ -0,0 +1,224 @@
+import numpy as np
+try:
+	from scipy import sparse
+	from scipy.sparse import csgraph
+except:
+	sparse = None
+	csgraph = None
+try:
+	import networkx as nx
+except:
+	nx = None
+
+class GridGraph:
+	'''
+	Graph that connects each cell of a GEOGRID to its neighbors, stored as a compressed sparse row (CSR) adjacency.
+	It is built once per GEOGRID (see :func:`brix.GeometryStore.graph`) and shared by all the :class:`brix.GEOGRIDDATA` objects of that GEOGRID.
+	Use :func:`brix.GEOGRIDDATA.as_graph` with `backend='sparse'` to get it.
+
+	Traversals work on numpy arrays, and scipy is used for connected components when available.
+	Use :func:`brix.GridGraph.to_networkx` to convert the graph.
+
+	Parameters
+	----------
+	ids : numpy.ndarray
+		Id of the cell of each row.
+	edge_rows : numpy.ndarray
+		Array of shape (n_edges, 2) with the rows of the cells connected by each edge.
+
+	Attributes
+	----------
+	ids : numpy.ndarray
+		Id of the cell of each row.
+	index : dict
+		Dictionary that maps each cell id to its row.
+	indptr : numpy.ndarray
+		CSR offsets: the neighbors of row `i` are ``indices[indptr[i]:indptr[i+1]]``.
+	indices : numpy.ndarray
+		CSR rows of the neighbors.
+	'''
+	def __init__(self,ids,edge_rows):
+		self.ids = np.asarray(ids)
+		self.index = dict(zip(self.ids.tolist(),range(len(self.ids))))
+		self.edge_rows = np.asarray(edge_rows,dtype=np.int64).reshape(-1,2)
+		n_nodes = len(self.ids)
+		sources = np.concatenate([self.edge_rows[:,0],self.edge_rows[:,1]])
+		targets = np.concatenate([self.edge_rows[:,1],self.edge_rows[:,0]])
+		order = np.lexsort((targets,sources))
+		self.indptr = np.zeros(n_nodes+1,dtype=np.int64)
+		np.cumsum(np.bincount(sources,minlength=n_nodes),out=self.indptr[1:])
+		self.indices = targets[order]
+		self._adjacency = None
+
+	def __len__(self):
+		return len(self.ids)
+
+	def number_of_edges(self):
+		return len(self.edge_rows)
+
+	def adjacency(self):
+		'''
+		Returns the adjacency matrix as a :class:`scipy.sparse.csr_matrix`. Requires scipy.
+		'''
+		if sparse is None:
+			raise NameError('GridGraph.adjacency requires scipy. Install it with: pip install cs-brix[graph]')
+		if self._adjacency is None:
+			data = np.ones(len(self.indices),dtype=np.int8)
+			self._adjacency = sparse.csr_matrix((data,self.indices,self.indptr),shape=(len(self),len(self)))
+		return self._adjacency
+
+	def rows(self,ids):
+		'''
+		Returns the rows of the given cell ids.
+		'''
+		index = self.index
+		return np.array([index[i] for i in ids],dtype=np.int64)
+
+	def _expand(self,rows):
+		'''
+		Returns the rows of the neighbors of the given rows (with repetitions).
+		'''
+		starts = self.indptr[rows]
+		lengths = self.indptr[rows+1]-starts
+		if lengths.sum()==0:
+			return np.zeros(0,dtype=np.int64)
+		offsets = np.repeat(starts-np.cumsum(lengths)+lengths,lengths)
+		return self.indices[offsets+np.arange(lengths.sum())]
+
+	def neighbors(self,cell_id):
+		'''
+		Returns the ids of the neighbors of the given cell.
+		'''
+		return self.ids[self._expand(np.array([self.index[cell_id]]))].tolist()
+
+	def hop_rows(self,sources,cutoff=None):
+		'''
+		Breadth-first search from the given rows.
+
+		Parameters
+		----------
+		sources : list
+			Rows to start from.
+		cutoff : int, optional
+			Maximum number of hops. If not provided, the whole component is traversed.
+
+		Returns
+		-------
+		hops : numpy.ndarray
+			Number of hops from the closest source to each row, or -1 for rows that were not reached.
+		'''
+		hops = np.full(len(self),-1,dtype=np.int64)
+		frontier = np.unique(np.asarray(sources,dtype=np.int64))
+		hops[frontier] = 0
+		k = 0
+		while (len(frontier)!=0) and ((cutoff is None) or (k<cutoff)):
+			k += 1
+			frontier = np.unique(self._expand(frontier))
+			frontier = frontier[hops[frontier]==-1]
+			hops[frontier] = k
+		return hops
+
+	def hop_distances(self,cell_id,cutoff=None):
+		'''
+		Returns the number of hops from the given cell to every cell it can reach.
+		Same output as :func:`networkx.single_source_shortest_path_length`.
+
+		Parameters
+		----------
+		cell_id : int
+			Id of the source cell.
+		cutoff : int, optional
+			Maximum number of hops.
+
+		Returns
+		-------
+		distances : dict
+			Dictionary with cell ids as keys and number of hops as values, ordered by number of hops.
+		'''
+		hops = self.hop_rows([self.index[cell_id]],cutoff=cutoff)
+		reached = np.flatnonzero(hops!=-1)
+		reached = reached[np.argsort(hops[reached],kind='stable')]
+		return dict(zip(self.ids[reached].tolist(),hops[reached].tolist()))
+
+	def k_hop(self,cell_id,k):
+		'''
+		Returns the ids of the cells that are at most `k` hops away from the given cell, including itself.
+		'''
+		return list(self.hop_distances(cell_id,cutoff=k).keys())
+
+	def connected_components(self,mask=None):
+		'''
+		Labels the connected components of the graph.
+
+		Parameters
+		----------
+		mask : numpy.ndarray, optional
+			Boolean array with one value per row. If provided, only the rows where it is `True` (and the edges between them) are considered.
+
+		Returns
+		-------
+		labels : numpy.ndarray
+			Component of each row, numbered from 0. Rows outside of the mask get -1.
+		'''
+		return _components(len(self),self.edge_rows,mask)
+
+	def clusters(self,labels):
+		'''
+		Finds the clusters of neighboring cells that share the same label (e.g. the same type).
+
+		Parameters
+		----------
+		labels : array-like
+			Label of each row. Rows labeled `None` do not belong to any cluster.
+
+		Returns
+		-------
+		clusters : numpy.ndarray
+			Cluster of each row, numbered from 0, or -1 for rows without label.
+		'''
+		labels = np.asarray(labels,dtype=object)
+		keep = np.array([l is not None for l in labels],dtype=bool)
+		_,codes = np.unique(np.where(keep,labels,'').astype(str),return_inverse=True)
+		same = codes[self.edge_rows[:,0]]==codes[self.edge_rows[:,1]]
+		return _components(len(self),self.edge_rows[same],keep)
+
+	def to_networkx(self,node_data=None):
+		'''
+		Converts the graph to a :class:`networkx.Graph` with cell ids as nodes.
+
+		Parameters
+		----------
+		node_data : dict, optional
+			Dictionary with cell ids as keys and dictionaries of node attributes as values.
+		'''
+		if nx is None:
+			raise NameError('GridGraph.to_networkx requires networkx. Install it with: pip install networkx')
+		G = nx.Graph()
+		if node_data is not None:
+			G.add_nodes_from(node_data.items())
+		G.add_nodes_from(self.ids.tolist())
+		G.add_edges_from(self.ids[self.edge_rows].tolist())
+		return G
+
+def _components(n_nodes,edge_rows,mask=None):
+	'''
+	Labels the connected components of the graph with `n_nodes` nodes and the given edges. See :func:`brix.GridGraph.connected_components`.
+	'''
+	keep = np.ones(n_nodes,dtype=bool) if mask is None else np.asarray(mask,dtype=bool)
+	edges = edge_rows[keep[edge_rows[:,0]]&keep[edge_rows[:,1]]]
+	labels = np.full(n_nodes,-1,dtype=np.int64)
+	if csgraph is not None:
+		matrix = sparse.coo_matrix((np.ones(len(edges),dtype=np.int8),(edges[:,0],edges[:,1])),shape=(n_nodes,n_nodes))
+		_,component = csgraph.connected_components(matrix,directed=False)
+	else:
+		# Each node takes the smallest label among its neighbors until no label changes
+		component = np.arange(n_nodes)
+		while True:
+			previous = component.copy()
+			np.minimum.at(component,edges[:,0],component[edges[:,1]])
+			np.minimum.at(component,edges[:,1],component[edges[:,0]])
+			component = component[component]
+			if np.array_equal(component,previous):
+				break
+	_,labels[keep] = np.unique(component[keep],return_inverse=True)
+	return labels
@@ -7,6 +7,7 @@ Created on Mon Jul 29 18:57:59 2019
 @contributors: crisjf, guadalupebabio
 """
 from .classes import Handler
+from .geometry import GeometryStore
 from .helpers import deg_to_rad, rad_to_deg, get_timezone_offset, hex_to_rgb
 from .functions import normalize_table_name, check_table_name
 
@@ -17,12 +18,10 @@ import matplotlib.path as mplPath
 import requests
 import matplotlib.pyplot as plt
 import copy
-import json
 import traceback
 import matplotlib
 from vincenty import vincenty
 from warnings import warn
-from shapely.geometry import shape
 
 class Grid_maker(Handler):
     """
@@ -325,7 +324,7 @@ class Grid_maker(Handler):
         if post_table:
             self.generate_missing()
             geogrid = self.get_grid_geojson()
-            r = requests.post(self.cityIO_post_url, data = json.dumps({'GEOGRID':geogrid}), headers=self.post_headers)
+            r = self._post_url(self.cityIO_post_url, data = self.codec.dumps({'GEOGRID':geogrid}))
             if not self.quietly:
                 print('Geogrid posted to:')
                 print(r.url)
@@ -375,9 +374,9 @@ class Grid_maker(Handler):
         '''
         if self.geojson_object is None:
             self.set_grid_geojson()
-        for cell in self.geojson_object['features']:
-            cell_shape = shape(cell['geometry'])
-            if not cell_shape.centroid.within(poly):
+        inside = GeometryStore(self.geojson_object).within(poly)
+        for cell,cell_inside in zip(self.geojson_object['features'],inside):
+            if not cell_inside:
                 cell['properties']['name'] = 'None'
                 cell['properties']['color'] = [0,0,0,0]
                 cell['properties'].pop('interactive',None)
@@ -0,0 +1,312 @@
+import traceback
+from warnings import warn
+from threading import Thread, Lock, Event
+from time import time as right_now
+from concurrent.futures import ThreadPoolExecutor
+from .classes import Handler
+
+class HandlerPool(Thread):
+	'''
+	Supervisor that listens to many tables from one process.
+	Instead of running one thread per :class:`brix.Handler`, all hash polling is driven by a single scheduler that shares a poll budget between tables.
+	Updates run in a pool of workers, so a slow table does not delay polling for the others.
+	Tables that crash are restarted after `restart_delay` seconds.
+
+	Parameters
+	----------
+	handlers : list, optional
+		List of :class:`brix.Handler` objects to register. See :func:`brix.HandlerPool.add_handler`.
+	max_polls_per_second : float, defaults to 10
+		Maximum number of hash polls per second, shared by all tables.
+	max_workers : int, defaults to 4
+		Maximum number of tables that can be updated at the same time.
+	poll_workers : int, defaults to 2
+		Number of threads used to poll the hashes.
+	robust : boolean, defaults to `True`
+		Default value of `robust` for registered tables. See :func:`brix.Handler.listen`.
+	restart_delay : float, defaults to 10
+		Time, in seconds, to wait before restarting a table that crashed.
+	max_restarts : int, optional
+		Maximum number of restarts per table. If not provided, tables will always be restarted.
+	quietly : boolean, defaults to `True`
+		If `False`, it will print every change of status.
+
+	Example
+	-------
+	>>> pool = HandlerPool()
+	>>> for table_name in table_list:
+			H = Handler(table_name)
+			H.add_indicator(MyIndicator())
+			pool.add_handler(H)
+	>>> pool.listen()
+	'''
+	def __init__(self,handlers=None,
+			max_polls_per_second = 10,
+			max_workers = 4,
+			poll_workers = 2,
+			robust = True,
+			restart_delay = 10,
+			max_restarts = None,
+			quietly = True
+		):
+		super(HandlerPool, self).__init__()
+		self.max_polls_per_second = max_polls_per_second
+		self.max_workers = max_workers
+		self.poll_workers = poll_workers
+		self.robust = robust
+		self.restart_delay = restart_delay
+		self.max_restarts = max_restarts
+		self.quietly = quietly
+
+		self.entries = {}
+		self._lock = Lock()
+		self._stop_event = Event()
+		self.running = False
+		self._next_slot = right_now()
+		self._update_executor = None
+		self._poll_executor = None
+		handlers = handlers or []
+		for H in handlers:
+			self.add_handler(H)
+
+	def add_handler(self,H,robust=None,append=False,clear_endpoints=False):
+		'''
+		Registers a table in the pool.
+		If the pool is already listening, the table will start right away.
+
+		Parameters
+		----------
+		H : :class:`brix.Handler`
+			Handler of the table, with its indicators already added.
+		robust : boolean, optional
+			If not provided, it will use :attr:`brix.HandlerPool.robust`.
+		append : boolean, defaults to `False`
+			If `True` it will append the new indicators to whatever is already there.
+		clear_endpoints : boolean, defaults to `False`
+			If `True`, it will clear all existing heatmap, numeric, and textual indicators before the first update.
+		'''
+		if not isinstance(H,Handler):
+			raise NameError('Only brix.Handler objects can be added to a HandlerPool')
+		if H.table_name in self.entries.keys():
+			warn(f'Table {H.table_name} already exists and will be overwritten')
+		H.append_on_post = append
+		H.robust = (self.robust if robust is None else robust)
+		entry = {
+			'handler': H,
+			'state': 'starting',
+			'clear_endpoints': clear_endpoints,
+			'next_poll': right_now(),
+			'n_polls': 0,
+			'n_updates': 0,
+			'n_errors': 0,
+			'n_restarts': 0,
+			'last_update': None,
+			'last_error': None
+		}
+		with self._lock:
+			self.entries[H.table_name] = entry
+			running = self.running
+		if running:
+			self._submit_start(entry)
+
+	def remove_handler(self,table_name):
+		'''
+		Stops polling the given table.
+
+		Parameters
+		----------
+		table_name : str
+			Name of the table to remove.
+		'''
+		with self._lock:
+			entry = self.entries.pop(table_name,None)
+		if entry is not None:
+			entry['state'] = 'removed'
+
+	def handler(self,table_name):
+		'''
+		Returns the :class:`brix.Handler` registered for the given table.
+		'''
+		return self.entries[table_name]['handler']
+
+	def list_tables(self):
+		'''
+		Returns the names of all registered tables.
+		'''
+		return list(self.entries.keys())
+
+	def status(self):
+		'''
+		Returns the status of every registered table.
+
+		Returns
+		-------
+		status : dict
+			Dictionary formated as ``{table_name: {'state':..., 'grid_hash_id':..., 'n_updates':..., ...}, ...}``.
+			State is one of `starting`, `idle`, `polling`, `updating`, `crashed`, or `failed`.
+		'''
+		status = {}
+		with self._lock:
+			for table_name,entry in self.entries.items():
+				table_status = {k:v for k,v in entry.items() if k not in ['handler','clear_endpoints']}
+				table_status['grid_hash_id'] = entry['handler'].grid_hash_id
+				table_status['robust'] = entry['handler'].robust
+				table_status['polls_per_minute'] = entry['handler'].poll_policy.stats()['polls_per_minute']
+				status[table_name] = table_status
+		return status
+
+	def _set_state(self,entry,state,next_poll=None):
+		with self._lock:
+			if entry['state']=='removed':
+				return
+			entry['state'] = state
+			if next_poll is not None:
+				entry['next_poll'] = next_poll
+		if not self.quietly:
+			print(entry['handler'].table_name,'->',state)
+
+	def _count(self,entry,key,**values):
+		'''
+		Increments the given counter of the table and sets the given values.
+		Counters are updated by the scheduler and by the workers, so they are always changed holding the lock.
+		'''
+		with self._lock:
+			entry[key] += 1
+			entry.update(values)
+
+	def _crash(self,entry):
+		'''
+		Marks the table as crashed and schedules a restart, unless it has reached the maximum number of restarts.
+		'''
+		H = entry['handler']
+		self._count(entry,'n_errors',last_error=traceback.format_exc())
+		warn(f'Table {H.table_name} crashed')
+		warn(entry['last_error'])
+		if (self.max_restarts is not None) and (entry['n_restarts']>=self.max_restarts):
+			self._set_state(entry,'failed')
+		else:
+			self._set_state(entry,'crashed',next_poll=right_now()+self.restart_delay)
+
+	def _submit_start(self,entry):
+		self._set_state(entry,'updating')
+		self._update_executor.submit(self._start,entry)
+
+	def _start(self,entry):
+		'''
+		Tests the indicators and performs the initial update of a table.
+		'''
+		H = entry['handler']
+		try:
+			if entry['clear_endpoints']:
+				H.clear_endpoints()
+				entry['clear_endpoints'] = False
+			H.test_indicators()
+			if H._update_on_change(None,robust=H.robust):
+				self._count(entry,'n_updates',last_update=right_now())
+			H.grid_hash_id = H.get_grid_hash()
+		except Exception:
+			self._crash(entry)
+			return
+		self._set_state(entry,'idle',next_poll=right_now()+H.sleep_time())
+
+	def _poll(self,entry):
+		'''
+		Polls the hash of a table and submits an update if the grid changed.
+		'''
+		H = entry['handler']
+		try:
+			grid_hash_id = H.get_grid_hash()
+			self._count(entry,'n_polls')
+		except Exception:
+			self._count(entry,'n_errors',last_error=traceback.format_exc())
+			self._set_state(entry,'idle',next_poll=right_now()+H.sleep_time())
+			return
+		if grid_hash_id!=H.grid_hash_id:
+			H.wake_up()
+			self._set_state(entry,'updating')
+			self._update_executor.submit(self._update,entry,grid_hash_id)
+		else:
+			H.check_rest()
+			self._set_state(entry,'idle',next_poll=right_now()+H.sleep_time())
+
+	def _update(self,entry,grid_hash_id):
+		'''
+		Updates a table after a change in its grid.
+		'''
+		H = entry['handler']
+		try:
+			if H._update_on_change(grid_hash_id,robust=H.robust):
+				self._count(entry,'n_updates',last_update=right_now())
+			else:
+				self._count(entry,'n_errors')
+		except Exception:
+			self._crash(entry)
+			return
+		self._set_state(entry,'idle',next_poll=right_now()+H.sleep_time())
+
+	def _schedule(self):
+		'''
+		Submits the polls and restarts that are due, within the poll budget.
+		Returns the time to wait before the next call.
+		'''
+		now = right_now()
+		with self._lock:
+			due = [entry for entry in self.entries.values() if (entry['state'] in ['idle','crashed']) and (entry['next_poll']<=now)]
+		due = sorted(due,key=lambda entry: entry['next_poll'])
+		interval = 1./self.max_polls_per_second
+		for entry in due:
+			if entry['state']=='crashed':
+				self._count(entry,'n_restarts')
+				self._submit_start(entry)
+				continue
+			if self._next_slot>now:
+				break
+			self._next_slot = max(self._next_slot+interval,now)
+			self._set_state(entry,'polling')
+			self._poll_executor.submit(self._poll,entry)
+
+		with self._lock:
+			next_polls = [entry['next_poll'] for entry in self.entries.values() if entry['state'] in ['idle','crashed']]
+		wait = min(next_polls+[now+interval])-now
+		wait = max(wait,self._next_slot-now)
+		return min(max(wait,0.01),interval)
+
+	def run(self):
+		'''
+		Run method to be called by :func:`threading.Thread.start`.
+		It runs the scheduler until :func:`brix.HandlerPool.stop` is called.
+		'''
+		self._update_executor = ThreadPoolExecutor(max_workers=self.max_workers,thread_name_prefix='brix-pool-update')
+		self._poll_executor   = ThreadPoolExecutor(max_workers=self.poll_workers,thread_name_prefix='brix-pool-poll')
+		# Tables added from now on are started by add_handler
+		with self._lock:
+			self.running = True
+			entries = list(self.entries.values())
+		for entry in entries:
+			self._submit_start(entry)
+		while not self._stop_event.is_set():
+			self._stop_event.wait(self._schedule())
+		with self._lock:
+			self.running = False
+		self._poll_executor.shutdown(wait=True)
+		self._update_executor.shutdown(wait=True)
+
+	def listen(self,new_thread=False):
+		'''
+		Starts listening to all registered tables.
+
+		Parameters
+		----------
+		new_thread : boolean, defaults to `False`
+			If `True` it will run the scheduler in a separate thread and return immediately.
+		'''
+		if new_thread:
+			self.start()
+		else:
+			self.run()
+
+	def stop(self):
+		'''
+		Stops the scheduler. Updates that are running will be allowed to finish.
+		'''
+		self._stop_event.set()
@@ -0,0 +1,227 @@
+import numpy as np
+
+def _point_columns(heatmap):
+	'''
+	Splits a heatmap formatted as a geojson into coordinate arrays and one array of values per property.
+	Properties that a feature does not define are left as `None` and flagged in the returned masks.
+
+	Returns
+	-------
+	lon : numpy.ndarray
+	lat : numpy.ndarray
+	columns : dict
+		Dictionary with one object array per property, in order of appearance.
+	defined : dict
+		Dictionary with one boolean array per property, `True` for the features that define it.
+	'''
+	features = heatmap['features']
+	for f in features:
+		if f['geometry'] is None:
+			raise NameError('Unknown geometry found in heatmap:',f)
+		if f['geometry']['type']!='Point':
+			raise NameError('Only Points supported at this point')
+	lon = np.array([f['geometry']['coordinates'][0] for f in features],dtype=float)
+	lat = np.array([f['geometry']['coordinates'][1] for f in features],dtype=float)
+
+	columns = {}
+	defined = {}
+	if len(features)==0:
+		return lon,lat,columns,defined
+	keys = list(features[0]['properties'].keys())
+	key_set = set(keys)
+	if all(f['properties'].keys()==key_set for f in features):
+		# Every feature defines the same properties
+		for p in keys:
+			columns[p] = np.empty(len(features),dtype=object)
+			columns[p][:] = [f['properties'][p] for f in features]
+			defined[p] = np.ones(len(features),dtype=bool)
+		return lon,lat,columns,defined
+	for i,f in enumerate(features):
+		for p,value in f['properties'].items():
+			if p not in columns:
+				columns[p] = np.full(len(features),None,dtype=object)
+				defined[p] = np.zeros(len(features),dtype=bool)
+			columns[p][i] = value
+			defined[p][i] = True
+	return lon,lat,columns,defined
+
+class HeatmapFrame:
+	'''
+	Heatmap stored as coordinate arrays and one array of values per property.
+	Heatmap indicators can return it from :func:`brix.Indicator.return_indicator` instead of a geojson: the Handler merges and serializes it without building one dictionary per point.
+
+	Parameters
+	----------
+	lon : array-like
+		Longitude of each point.
+	lat : array-like
+		Latitude of each point.
+	values : dict, optional
+		Dictionary with property names as keys and one value per point as values.
+
+	Attributes
+	----------
+	lon : numpy.ndarray
+	lat : numpy.ndarray
+	columns : dict
+		Dictionary with one array per property, in insertion order.
+	'''
+	def __init__(self,lon,lat,values=None):
+		self.lon = np.asarray(lon,dtype=float).ravel()
+		self.lat = np.asarray(lat,dtype=float).ravel()
+		if len(self.lon)!=len(self.lat):
+			raise NameError(f'HeatmapFrame got {len(self.lon)} longitudes and {len(self.lat)} latitudes')
+		self.columns = {}
+		if values is not None:
+			for p,v in values.items():
+				self[p] = v
+
+	@classmethod
+	def from_geodataframe(cls,gdf,columns=None):
+		'''
+		Builds a HeatmapFrame from a :class:`geopandas.GeoDataFrame` of points.
+
+		Parameters
+		----------
+		gdf : geopandas.GeoDataFrame
+			Table with one point per row.
+		columns : list, optional
+			Columns to keep. If not provided, all columns except the geometry are kept.
+		'''
+		if len(gdf)!=0 and any(gdf.geometry.type!='Point'):
+			raise NameError('Only Points supported at this point')
+		if columns is None:
+			columns = [c for c in gdf.columns if c!=gdf.geometry.name]
+		values = {}
+		for c in columns:
+			column = gdf[c]
+			if column.isnull().any():
+				# Missing values are posted as null, like GeoDataFrame.to_json does
+				column = column.astype(object).where(column.notnull(),None)
+			values[c] = column.tolist() if column.dtype==object else column.to_numpy()
+		return cls(gdf.geometry.x.to_numpy(),gdf.geometry.y.to_numpy(),values)
+
+	@classmethod
+	def from_geojson(cls,heatmap):
+		'''
+		Builds a HeatmapFrame from a heatmap formatted as a geojson, with Point features and properties as dictionaries.
+		Properties that a feature does not define are set to `None`.
+		'''
+		lon,lat,columns,defined = _point_columns(heatmap)
+		return cls(lon,lat,columns)
+
+	@property
+	def properties(self):
+		return list(self.columns.keys())
+
+	def __len__(self):
+		return len(self.lon)
+
+	def __getitem__(self,p):
+		return self.columns[p]
+
+	def __setitem__(self,p,values):
+		if isinstance(values,np.ndarray):
+			values = values.ravel()
+		else:
+			column = np.empty(len(values),dtype=object)
+			column[:] = list(values)
+			values = column
+		if len(values)!=len(self):
+			raise NameError(f'Property {p} has {len(values)} values for {len(self)} points')
+		self.columns[p] = values
+
+	def rename(self,mapping):
+		'''
+		Returns a new HeatmapFrame, sharing the same arrays, with the properties renamed according to `mapping`.
+		'''
+		out = HeatmapFrame(self.lon,self.lat)
+		out.columns = {mapping.get(p,p):v for p,v in self.columns.items()}
+		return out
+
+	def _layer(self):
+		'''
+		Returns the arrays used by :func:`brix.merge_heatmaps`. See :func:`brix.heatmap._point_columns`.
+		'''
+		return self.lon,self.lat,self.columns,{p:slice(None) for p in self.columns}
+
+	def to_cityio(self):
+		'''
+		Returns the heatmap in the cityIO layout, with the list of properties in `properties` and the values of each feature as a list.
+		'''
+		return _cityio_heatmap(self.lon,self.lat,self.properties,list(self.columns.values()))
+
+	def to_geojson(self):
+		'''
+		Returns the heatmap as a geojson, with properties as dictionaries.
+		'''
+		properties = self.properties
+		out = self.to_cityio()
+		for f in out['features']:
+			f['properties'] = dict(zip(properties,f['properties']))
+		out.pop('properties')
+		return out
+
+def merge_heatmaps(heatmaps,none_character=0,decimals=7,as_frame=False):
+	'''
+	Combines a list of heatmaps into one cityIO heatmap.
+	Points are matched by their coordinates rounded to `decimals` decimals (about 1cm with the default), and their properties are outer-joined: a point that is missing from a heatmap gets `none_character` for the properties of that heatmap.
+	When two heatmaps define the same property for the same point, the last one is kept.
+
+	Parameters
+	----------
+	heatmaps : list
+		List of :class:`brix.HeatmapFrame` or heatmaps formatted as geojsons, with Point features and properties as dictionaries.
+	none_character : object, defaults to 0
+		Value used for missing properties.
+	decimals : int, defaults to 7
+		Number of decimals used to match coordinates. If `None`, points are matched by their exact coordinates.
+	as_frame : boolean, defaults to `False`
+		If `True`, returns a :class:`brix.HeatmapFrame` instead of the cityIO layout.
+
+	Returns
+	-------
+	heatmap : dict
+		cityIO heatmap, with the list of properties in `properties` and the values of each feature as a list.
+	'''
+	layers = [heatmap._layer() if isinstance(heatmap,HeatmapFrame) else _point_columns(heatmap) for heatmap in heatmaps]
+	if len(layers)==0:
+		merged = HeatmapFrame([],[])
+		return merged if as_frame else merged.to_cityio()
+	lon = np.concatenate([layer[0] for layer in layers])
+	lat = np.concatenate([layer[1] for layer in layers])
+	if decimals is None:
+		keys = lon+1j*lat
+	else:
+		keys = np.round(lon,decimals)+1j*np.round(lat,decimals)
+	_,first,inverse = np.unique(keys,return_index=True,return_inverse=True)
+	# Points are numbered in order of first appearance
+	order = np.argsort(first,kind='stable')
+	position = np.empty(len(order),dtype=np.int64)
+	position[order] = np.arange(len(order))
+	inverse = position[inverse.ravel()]
+	first = first[order]
+	n_points = len(first)
+
+	merged = HeatmapFrame(lon[first],lat[first])
+	start = 0
+	for layer_lon,_,columns,defined in layers:
+		points = inverse[start:start+len(layer_lon)]
+		for p in columns:
+			if p not in merged.columns:
+				merged.columns[p] = np.full(n_points,none_character,dtype=object)
+			merged.columns[p][points[defined[p]]] = columns[p][defined[p]]
+		start += len(layer_lon)
+	return merged if as_frame else merged.to_cityio()
+
+def _cityio_heatmap(lon,lat,properties,values):
+	'''
+	Builds the cityIO heatmap layout from coordinate arrays and one array of values per property.
+	'''
+	coordinates = [list(c) for c in zip(np.asarray(lon).tolist(),np.asarray(lat).tolist())]
+	if len(values)!=0:
+		rows = [list(r) for r in zip(*[np.asarray(v).tolist() for v in values])]
+	else:
+		rows = [[] for c in coordinates]
+	features = [{'type':'Feature','geometry':{'type':'Point','coordinates':c},'properties':r} for c,r in zip(coordinates,rows)]
+	return {'type':'FeatureCollection','properties':list(properties),'features':features}
@@ -0,0 +1,176 @@
+import random
+from collections import deque
+from time import time as right_now
+
+class PollPolicy:
+	'''
+	Parent class of the objects that decide how long a :class:`brix.Handler` waits between two polls of the table hashes.
+	:func:`brix.Handler.sleep_time` returns :func:`brix.PollPolicy.sleep_time`, and the Handler reports every poll, successful or failed request, change, and idle poll to the policy.
+
+	The policy also keeps track of the requests made, see :func:`brix.PollPolicy.stats`.
+
+	Parameters
+	----------
+	rate_window : float, defaults to 60
+		Time window, in seconds, used to compute the current request rate.
+	'''
+	def __init__(self,rate_window=60):
+		self.H = None
+		self.rate_window = rate_window
+		self.started = right_now()
+		self.n_polls = 0
+		self.n_changes = 0
+		self.n_errors = 0
+		self._recent_polls = deque()
+
+	def attach(self,H):
+		'''
+		Links the policy to the :class:`brix.Handler` that will use it.
+		'''
+		self.H = H
+
+	def sleep_time(self):
+		'''
+		Returns the time, in seconds, to wait before the next poll.
+		'''
+		raise NotImplementedError
+
+	def on_poll(self):
+		'''
+		Called every time the hashes are requested.
+		'''
+		now = right_now()
+		self.n_polls += 1
+		self._recent_polls.append(now)
+		while (len(self._recent_polls)>0) and (now-self._recent_polls[0]>self.rate_window):
+			self._recent_polls.popleft()
+
+	def on_change(self):
+		'''
+		Called when the grid changed. See :func:`brix.Handler.wake_up`.
+		'''
+		self.n_changes += 1
+
+	def on_idle(self):
+		'''
+		Called when a poll shows that the grid did not change. See :func:`brix.Handler.check_rest`.
+		'''
+		pass
+
+	def on_success(self):
+		'''
+		Called when the hashes were retrieved.
+		'''
+		pass
+
+	def on_error(self):
+		'''
+		Called when the hashes could not be retrieved, either because cityIO returned an error or because the request failed.
+		'''
+		self.n_errors += 1
+
+	def stats(self):
+		'''
+		Returns the number of requests made and the effective request rates.
+
+		Returns
+		-------
+		stats : dict
+			Dictionary with the number of polls, changes, and errors, the number of polls per minute in the last `rate_window` seconds and since the policy was created, and the current sleep time.
+		'''
+		now = right_now()
+		recent = [t for t in self._recent_polls if now-t<=self.rate_window]
+		window = min(self.rate_window,now-self.started)
+		elapsed = now-self.started
+		return {
+			'n_polls': self.n_polls,
+			'n_changes': self.n_changes,
+			'n_errors': self.n_errors,
+			'polls_per_minute': (60.*len(recent)/window if window>0 else 0),
+			'average_polls_per_minute': (60.*self.n_polls/elapsed if elapsed>0 else 0),
+			'sleep_time': self.sleep_time()
+		}
+
+class RestModePolicy(PollPolicy):
+	'''
+	Polls every :attr:`brix.Handler.sleep_time_short` seconds, and every :attr:`brix.Handler.sleep_time_long` seconds once the grid has not changed for :attr:`brix.Handler.total_active_time` seconds (rest mode).
+	This is the default policy of :class:`brix.Handler`.
+	'''
+	def sleep_time(self):
+		if self.H.rest_mode:
+			return self.H.sleep_time_long
+		else:
+			return self.H.sleep_time_short
+
+	def on_change(self):
+		super(RestModePolicy, self).on_change()
+		self.H.rest_mode = False
+		self.H.active_start = right_now()
+
+	def on_idle(self):
+		H = self.H
+		if not H.rest_mode:
+			current_time = right_now()
+			if current_time-H.active_start>=H.total_active_time:
+				if not H.quietly:
+					print('Going into rest mode')
+					print('Time active:',current_time-H.active_start)
+				H.rest_mode = True
+
+class BackoffPolicy(PollPolicy):
+	'''
+	Polls every `min_sleep` seconds while the table is in use, and backs off exponentially once the grid has not changed for `active_time` seconds.
+	Any change resets the sleep time to `min_sleep`. Failed requests also back off exponentially, until the hashes are retrieved again.
+	A random jitter is applied to every sleep time, so that many Handlers started together do not poll in lockstep.
+
+	Parameters
+	----------
+	min_sleep : float, defaults to 0.5
+		Sleep time, in seconds, while the table is in use.
+	max_sleep : float, defaults to 60
+		Maximum sleep time, in seconds.
+	factor : float, defaults to 2
+		Factor by which the sleep time grows after each idle poll or failed request.
+	active_time : float, defaults to 60
+		Time, in seconds, after the last change before backing off.
+	jitter : float, defaults to 0.1
+		Relative amplitude of the random jitter. A value of 0.1 means that sleep times are multiplied by a random number between 0.9 and 1.1.
+	**kwargs :
+		Other keyword arguments are passed to :class:`brix.PollPolicy`.
+	'''
+	def __init__(self,min_sleep=0.5,max_sleep=60,factor=2,active_time=60,jitter=0.1,**kwargs):
+		super(BackoffPolicy, self).__init__(**kwargs)
+		self.min_sleep = min_sleep
+		self.max_sleep = max_sleep
+		self.factor = factor
+		self.active_time = active_time
+		self.jitter = jitter
+		self.current_sleep = min_sleep
+		self.last_change = right_now()
+		self.consecutive_errors = 0
+
+	def sleep_time(self):
+		sleep_time = self.current_sleep
+		if self.consecutive_errors>0:
+			sleep_time = max(sleep_time,self.min_sleep*self.factor**self.consecutive_errors)
+		sleep_time = min(sleep_time,self.max_sleep)
+		if self.jitter>0:
+			sleep_time *= random.uniform(1-self.jitter,1+self.jitter)
+		return sleep_time
+
+	def on_change(self):
+		super(BackoffPolicy, self).on_change()
+		self.current_sleep = self.min_sleep
+		self.last_change = right_now()
+		self.consecutive_errors = 0
+
+	def on_idle(self):
+		if right_now()-self.last_change>=self.active_time:
+			self.current_sleep = min(self.current_sleep*self.factor,self.max_sleep)
+
+	def on_success(self):
+		self.consecutive_errors = 0
+
+	def on_error(self):
+		super(BackoffPolicy, self).on_error()
+		self.consecutive_errors += 1
@@ -6,7 +6,6 @@ import networkx as nx
 import pandas as pd
 import geopandas as gpd
 import time
-from shapely.geometry import shape
 from time import sleep
 from .classes import Handler
 from .classes import Indicator
@@ -68,13 +67,16 @@ def make_cluster(geogrid_data,fraction=0.1):
 	'''
 	Update function for geogrid_data that propagates the type of a random cell to the neighboring cells.
 	'''
-	G = geogrid_data.as_graph()
 	n_flips = int(fraction*len(geogrid_data))
 	seed_cell = random.choice(geogrid_data)
 	new_type = seed_cell['name']
 
 	cutoff = int(0.5*(1+np.sqrt(1+4*n_flips)))
-	neighs = nx.single_source_shortest_path_length(G, seed_cell['id'], cutoff=cutoff)
+	if geogrid_data.GEOGRID is not None:
+		neighs = geogrid_data.as_graph(backend='sparse').hop_distances(seed_cell['id'], cutoff=cutoff)
+	else:
+		G = geogrid_data.as_graph()
+		neighs = nx.single_source_shortest_path_length(G, seed_cell['id'], cutoff=cutoff)
 	neighs_k = {}
 	for i,k in neighs.items():
 		if k not in neighs_k.keys():
@@ -201,13 +203,7 @@ class Conway(User):
 		super(Conway, self).__init__(*args,**kwargs)
 		self.sleep_time = sleep_time
 		self.name = name
-		try:
-			geos = pd.DataFrame([(cell['properties']['id'],cell['geometry']) for cell in self.get_GEOGRID()['features']],columns=['id','geometry'])
-		except:
-			geos = pd.DataFrame([(i,cell['geometry']) for i,cell in enumerate(self.get_GEOGRID()['features'])],columns=['id','geometry'])
-		geos = gpd.GeoDataFrame(geos.drop('geometry',1),geometry=geos['geometry'].apply(lambda x: shape(x))) # no crs to avoid warning
-		geos['lon'] = round(geos.geometry.centroid.x,4)
-		geos['lat'] = round(geos.geometry.centroid.y,4)
+		geos = self.get_geometry_store().centroid_frame()
 		M = pd.pivot_table(geos,index=['lat'],values=['id'],columns=['lon'])
 		self.M = M.values # matrix with ids
 		index_lookup = {}
@@ -10,7 +10,6 @@ except:
     INSTALL_REQUIRES = [
         "requests>=2.24",
         "pandas>=0.25.3",
-        "pygeohash>=1.2.0",
         "joblib>=0.13.2",
         "shapely>=1.6.2",
         "geopandas>=0.6.2",
@@ -37,6 +36,11 @@ setuptools.setup(
     download_url = 'https://github.com/CityScope/CS_Brix/archive/v_0.0.10.tar.gz',
     packages=setuptools.find_packages(),
     install_requires=INSTALL_REQUIRES,
+    extras_require={
+        "graph": ["scipy>=1.0"],
+        "orjson": ["orjson>=3.4"],
+        "ujson": ["ujson>=5.4"]
+    },
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Intended Audience :: Developers',
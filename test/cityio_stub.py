@@ -0,0 +1,167 @@
+# Local stand-in for cityIO used by the offline tests.
+# Serves one table with a small rectangular GEOGRID and keeps everything in memory.
+
+import json
+import gzip
+import queue
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+def make_geogrid(nrows=10,ncols=10,cell_size=0.001,top_left_lon=-71.0,top_left_lat=42.0):
+	'''
+	Returns a GEOGRID with nrows*ncols square cells, alternating between types A and B.
+	'''
+	features = []
+	for i in range(nrows):
+		for j in range(ncols):
+			x = top_left_lon+j*cell_size
+			y = top_left_lat-i*cell_size
+			coords = [[x,y],[x,y-cell_size],[x+cell_size,y-cell_size],[x+cell_size,y],[x,y]]
+			properties = {'id':i*ncols+j,'name':('A' if (i+j)%2 else 'B'),'height':1,'color':[255,0,0],'interactive':'Web'}
+			features.append({'type':'Feature','geometry':{'type':'Polygon','coordinates':[coords]},'properties':properties})
+	types = {
+		'A': {'color':'#ff0000','height':1,'interactive':'Web','LBCS':[{'proportion':1,'use':{'1000':1}}],'NAICS':None},
+		'B': {'color':[0,255,0,200],'height':2,'LBCS':None,'NAICS':'[{"proportion":1,"use":{"5000":1}}]'}
+	}
+	header = {'nrows':nrows,'ncols':ncols,'rotation':0,'latitude':top_left_lat,'longitude':top_left_lon,'cellSize':100}
+	return {'type':'FeatureCollection','features':features,'properties':{'types':types,'header':header}}
+
+class CityIOStub:
+	'''
+	In-memory cityIO server for one table.
+	Use :attr:`CityIOStub.host` as the `host_name` of a :class:`brix.Handler` in `shell_mode`.
+	'''
+	def __init__(self,nrows=10,ncols=10,etags=True,compress=False):
+		self.etags = etags
+		self.compress = compress
+		GEOGRID = make_geogrid(nrows=nrows,ncols=ncols)
+		self.table = {
+			'GEOGRID': GEOGRID,
+			'GEOGRIDDATA': [dict(f['properties']) for f in GEOGRID['features']]
+		}
+		self.requests = []
+		self.streams = []
+		self.stopped = threading.Event()
+		self.server = ThreadingHTTPServer(('127.0.0.1',0),self._request_handler())
+		self.host = 'http://127.0.0.1:%d'%self.server.server_address[1]
+		self.thread = threading.Thread(target=self.server.serve_forever,daemon=True)
+
+	def start(self):
+		self.thread.start()
+		return self
+
+	def stop(self):
+		self.stopped.set()
+		self.server.shutdown()
+		self.server.server_close()
+
+	def hash(self,branch):
+		return hashlib.md5(json.dumps(self.table.get(branch)).encode('utf-8')).hexdigest()
+
+	def notify(self):
+		'''
+		Sends the current hashes to every client connected to the meta/stream event stream.
+		'''
+		for stream in list(self.streams):
+			stream.put(json.dumps({k:self.hash(k) for k in self.table}))
+
+	def posts(self,branch=None):
+		'''
+		Returns the list of POST requests received, optionally only for the given branch.
+		'''
+		return [r for r in self.requests if (r['method']=='POST') and ((branch is None) or (r['path'][-1:]==[branch]))]
+
+	def gets(self,branch=None):
+		'''
+		Returns the list of GET requests received, optionally only for the given branch.
+		'''
+		return [r for r in self.requests if (r['method']=='GET') and ((branch is None) or (r['path'][-1:]==[branch]))]
+
+	def _request_handler(self):
+		stub = self
+		class RequestHandler(BaseHTTPRequestHandler):
+			protocol_version = 'HTTP/1.1'
+
+			def log_message(self,*args):
+				pass
+
+			def _path(self):
+				return self.path.split('?')[0].strip('/').split('/')[3:]
+
+			def _send(self,status_code,body=b'',headers={}):
+				self.send_response(status_code)
+				self.send_header('Content-Type','application/json')
+				for k in headers:
+					self.send_header(k,headers[k])
+				self.send_header('Content-Length',str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def do_GET(self):
+				path = self._path()
+				request = {'method':'GET','path':path,'headers':dict(self.headers)}
+				stub.requests.append(request)
+				if path==['meta','stream']:
+					return self._stream()
+				if path==['meta','hashes']:
+					request['status'] = 200
+					return self._send(200,json.dumps({k:stub.hash(k) for k in stub.table}).encode('utf-8'))
+				branch = stub.table
+				for k in path:
+					if isinstance(branch,dict) and (k in branch):
+						branch = branch[k]
+					else:
+						request['status'] = 404
+						return self._send(404,b'{}')
+				body = json.dumps(branch).encode('utf-8')
+				headers = {}
+				if stub.etags:
+					headers['ETag'] = '"%s"'%hashlib.md5(body).hexdigest()
+					if self.headers.get('If-None-Match')==headers['ETag']:
+						request['status'] = 304
+						return self._send(304,headers=headers)
+				request['status'] = 200
+				if stub.compress and ('gzip' in self.headers.get('Accept-Encoding','')):
+					body = gzip.compress(body)
+					headers['Content-Encoding'] = 'gzip'
+				return self._send(200,body,headers=headers)
+
+			def _stream(self):
+				self.send_response(200)
+				self.send_header('Content-Type','text/event-stream')
+				self.send_header('Connection','close')
+				self.end_headers()
+				self.close_connection = True
+				stream = queue.Queue()
+				stub.streams.append(stream)
+				try:
+					while not stub.stopped.is_set():
+						try:
+							message = stream.get(timeout=0.1)
+						except queue.Empty:
+							continue
+						self.wfile.write(('event: hashes\ndata: %s\n\n'%message).encode('utf-8'))
+						self.wfile.flush()
+				except OSError:
+					pass
+				finally:
+					stub.streams.remove(stream)
+
+			def do_POST(self):
+				path = self._path()
+				body = self.rfile.read(int(self.headers.get('Content-Length',0)))
+				stub.requests.append({'method':'POST','path':path,'headers':dict(self.headers),'body':body})
+				if self.headers.get('Content-Encoding')=='gzip':
+					body = gzip.decompress(body)
+				value = json.loads(body)
+				if len(path)==0:
+					stub.table.update(value)
+				else:
+					branch = stub.table
+					for k in path[:-1]:
+						branch = branch.setdefault(k,{})
+					branch[path[-1]] = value
+				return self._send(200,b'{}')
+
+		return RequestHandler
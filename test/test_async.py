@@ -0,0 +1,130 @@
+import unittest
+import asyncio
+from time import sleep
+from concurrent.futures import ThreadPoolExecutor
+from brix import AsyncHandler, ChangeSource
+from brix.examples import Diversity
+from brix.test_tools import SlowIndicator
+from cityio_stub import CityIOStub
+
+class CountingChangeSource(ChangeSource):
+	'''
+	Change source that polls the hashes with the synchronous handler methods and counts its calls.
+	'''
+	def __init__(self):
+		super(CountingChangeSource, self).__init__()
+		self.calls = 0
+
+	def wait_for_change(self,grid_hash_id):
+		self.calls += 1
+		sleep(0.05)
+		return self.H.get_grid_hash()
+
+class TestAsyncHandler(unittest.TestCase):
+
+	def setUp(self):
+		self.stub = CityIOStub().start()
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def make_handler(self,**kwargs):
+		return AsyncHandler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True,**kwargs)
+
+	def test_perform_update(self):
+		'''
+		Tests that the coroutine update posts the same package as the synchronous Handler.
+		'''
+		H = self.make_handler()
+		H.add_indicator(Diversity())
+		update_package = asyncio.run(H.perform_update(return_update_package=True))
+		self.assertEqual([i['name'] for i in update_package['numeric']],['Entropy'])
+		self.assertEqual(len(self.stub.posts('indicators')),1)
+		self.assertEqual(H.grid_hash_id,self.stub.hash('GEOGRIDDATA'))
+
+	def test_slow_table_does_not_block(self):
+		'''
+		Tests that a slow indicator in one table does not delay the update of another table on the same loop.
+		'''
+		H_slow = self.make_handler()
+		H_slow.add_indicator(SlowIndicator(delay=2),test=False)
+		H_fast = self.make_handler()
+		H_fast.add_indicator(Diversity())
+
+		async def run():
+			slow = asyncio.create_task(H_slow.perform_update())
+			await asyncio.wait_for(H_fast.perform_update(),timeout=1.5)
+			await slow
+
+		asyncio.run(run())
+		self.assertEqual(len(self.stub.posts('indicators')),2)
+
+	def test_more_tables_than_workers(self):
+		'''
+		Tests that tables do not wait on the pool they run in when there are more tables than workers.
+		'''
+		default_executor = AsyncHandler._default_executor
+		AsyncHandler._default_executor = ThreadPoolExecutor(max_workers=2)
+		try:
+			for executor_mode in [None,'thread']:
+				handlers = []
+				for i in range(4):
+					H = self.make_handler(executor_mode=executor_mode)
+					H.add_indicator(Diversity())
+					H.add_indicator(SlowIndicator(delay=0.1),test=False)
+					handlers.append(H)
+
+				async def run():
+					return await asyncio.wait_for(asyncio.gather(*[H.update_package() for H in handlers]),timeout=10)
+
+				packages = asyncio.run(run())
+				self.assertEqual([len(package['numeric']) for package in packages],[2]*4)
+				for H in handlers:
+					H.shutdown_indicator_executor()
+		finally:
+			AsyncHandler._default_executor.shutdown(wait=False)
+			AsyncHandler._default_executor = default_executor
+
+	def test_caller_executor(self):
+		'''
+		Tests that the executor passed to the AsyncHandler is not used for the indicator pool and is never shut down.
+		'''
+		executor = ThreadPoolExecutor(max_workers=1)
+		H = self.make_handler(executor=executor,executor_mode='thread')
+		H.add_indicator(Diversity())
+		H.add_indicator(SlowIndicator(delay=0.1),test=False)
+		package = asyncio.run(asyncio.wait_for(H.update_package(),timeout=10))
+		self.assertEqual(len(package['numeric']),2)
+		self.assertIsNot(H.get_indicator_executor(),executor)
+		H.shutdown_indicator_executor()
+		self.assertEqual(executor.submit(len,[1]).result(),1)
+		executor.shutdown()
+
+	def test_thread_uses_change_source(self):
+		'''
+		Tests that a handler listening in a thread keeps its options and waits on its change source.
+		'''
+		source = CountingChangeSource()
+		H = self.make_handler(change_source=source)
+		H.add_indicator(Diversity())
+		H.listen_in_thread(robust=True)
+		try:
+			for i in range(100):
+				if source.calls>0:
+					break
+				sleep(0.05)
+			self.assertTrue(H.robust)
+			self.assertGreater(source.calls,0)
+			self.stub.table['GEOGRIDDATA'][0]['name'] = 'A'
+			for i in range(100):
+				if len(self.stub.posts('indicators'))>=2:
+					break
+				sleep(0.05)
+			self.assertGreaterEqual(len(self.stub.posts('indicators')),2)
+		finally:
+			H.stop()
+			H.join(timeout=5)
+		self.assertFalse(H.is_alive())
+
+if __name__ == '__main__':
+	unittest.main()
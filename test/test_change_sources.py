@@ -0,0 +1,56 @@
+import unittest
+from time import sleep, time
+from brix import Handler, SSEChangeSource
+from brix.examples import Diversity
+from cityio_stub import CityIOStub
+
+class TestChangeSources(unittest.TestCase):
+
+	def setUp(self):
+		self.stub = CityIOStub().start()
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def listen(self,change_source=None):
+		H = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True,change_source=change_source)
+		H.add_indicator(Diversity())
+		H.daemon = True
+		H.listen(new_thread=True)
+		self.wait_for_posts(1)
+		sleep(0.2)
+		return H
+
+	def wait_for_posts(self,n_posts,timeout=3):
+		start = time()
+		while (len(self.stub.posts('indicators'))<n_posts) and (time()-start<timeout):
+			sleep(0.005)
+		return time()-start
+
+	def test_polling(self):
+		H = self.listen()
+		self.stub.table['GEOGRIDDATA'][0]['name'] = 'A'
+		self.wait_for_posts(2)
+		H.stop()
+		self.assertEqual(len(self.stub.posts('indicators')),2)
+
+	def test_sse(self):
+		'''
+		Tests that an event from the stream triggers the update without waiting for the next poll.
+		'''
+		url = self.stub.host+'/api/table/stub_table/meta/stream'
+		H = self.listen(SSEChangeSource(url,fallback_interval=10))
+		self.assertTrue(H.change_source.connected)
+		n_hash_requests = len(self.stub.gets('hashes'))
+		self.stub.table['GEOGRIDDATA'][0]['name'] = 'A'
+		self.stub.notify()
+		elapsed = self.wait_for_posts(2)
+		sleep(0.1)
+		H.stop()
+		self.assertEqual(len(self.stub.posts('indicators')),2)
+		self.assertLess(elapsed,0.4)
+		self.assertEqual(len(self.stub.gets('hashes')),n_hash_requests)
+		self.assertEqual(H.grid_hash_id,self.stub.hash('GEOGRIDDATA'))
+
+if __name__ == '__main__':
+	unittest.main()
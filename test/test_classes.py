@@ -1,9 +1,22 @@
 import unittest
-from brix.classes import Handler
+from brix.classes import Handler, Indicator, CompositeIndicator, GEOGRIDDATA, ColumnarGEOGRIDDATA, TypeTable
+from brix.geometry import GeometryStore
+from brix.heatmap import merge_heatmaps, HeatmapFrame
+from brix.classes import StaticHeatmap
+from brix.helpers import urljoin
+import geopandas as gpd
 from brix.examples import RandomIndicator, ShellIndicator, Diversity
-from brix.test_tools import User
-from time import sleep
+from brix.test_tools import User, SlowIndicator
+from cityio_stub import CityIOStub, make_geogrid
+from time import sleep, time
+from threading import Thread
 import requests
+import pickle
+import numpy as np
+from copy import deepcopy
+from shapely.geometry import shape
+from shapely import affinity
+import networkx as nx
 
 class TestHandler(unittest.TestCase):
 
@@ -114,5 +127,845 @@ class TestHandler(unittest.TestCase):
 			current_numeric = H.see_current(indicator_type='numeric')
 			self.compare_numeric(update_package['numeric'],current_numeric)
 
+class TestSession(unittest.TestCase):
+
+	def test_shared_session(self):
+		'''
+		Tests that Handlers pointing at the same host share one pooled session.
+		'''
+		H1 = Handler('table_one',shell_mode=True,quietly=True)
+		H2 = Handler('table_two',shell_mode=True,quietly=True)
+		H3 = Handler('table_one',shell_mode=True,quietly=True,host_name='http://127.0.0.1:5000')
+		self.assertIs(H1.session,H2.session)
+		self.assertIsNot(H1.session,H3.session)
+
+	def test_thread_sessions(self):
+		'''
+		Tests that each thread gets its own session on top of the same connection pool.
+		'''
+		H = Handler('table_one',shell_mode=True,quietly=True)
+		sessions = []
+		thread = Thread(target=lambda: sessions.append(H.session))
+		thread.start()
+		thread.join()
+		self.assertIsNot(sessions[0],H.session)
+		self.assertIs(sessions[0].get_adapter(H.cityIO_get_url),H.session.get_adapter(H.cityIO_get_url))
+		Handler.close_sessions()
+		self.assertIsNot(H.session.get_adapter(H.cityIO_get_url),sessions[0].get_adapter(H.cityIO_get_url))
+
+	def test_pool_settings(self):
+		'''
+		Tests that pool size and keep-alive settings are applied to the session.
+		'''
+		H = Handler('table_one',shell_mode=True,quietly=True,pool_size=3,keep_alive=False)
+		adapter = H.session.get_adapter(H.cityIO_get_url)
+		self.assertEqual(adapter._pool_maxsize,3)
+		self.assertEqual(H.session.headers['Connection'],'close')
+
+class TestParallelEvaluation(unittest.TestCase):
+
+	def setUp(self):
+		self.stub = CityIOStub().start()
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def make_handler(self,executor_mode):
+		H = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True,executor_mode=executor_mode,max_workers=4)
+		for i in range(4):
+			I = SlowIndicator(delay=0.5)
+			I.name = f'Slow indicator {i}'
+			H.add_indicator(I,test=False)
+		H.add_indicator(Diversity())
+		return H
+
+	def test_thread_pool(self):
+		'''
+		Tests that indicators run concurrently in a thread pool and that the package matches the sequential one.
+		'''
+		H_sequential = self.make_handler(None)
+		H_parallel = self.make_handler('thread')
+		geogrid_data = H_parallel.get_geogrid_data()
+
+		t0 = time()
+		update_package = H_parallel.update_package(geogrid_data=geogrid_data)
+		runtime = time()-t0
+		H_parallel.shutdown_indicator_executor()
+
+		self.assertLess(runtime,1.5)
+		self.assertEqual(update_package,H_sequential.update_package(geogrid_data=geogrid_data))
+
+	def test_process_pool(self):
+		'''
+		Tests that indicators that read GEOGRID get the same values in a process pool, which receives GEOGRID once.
+		'''
+		for columnar in [False,True]:
+			H_sequential = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True,columnar=columnar)
+			H_parallel = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True,columnar=columnar,executor_mode='process',max_workers=2)
+			for H in [H_sequential,H_parallel]:
+				H.add_indicators([Diversity(),AreaIndicator()],test=False)
+			geogrid_data = H_parallel.get_geogrid_data()
+			update_package = H_parallel.update_package(geogrid_data=geogrid_data)
+			self.assertIs(H_parallel._worker_GEOGRID,geogrid_data.GEOGRID)
+			H_parallel.shutdown_indicator_executor()
+			self.assertEqual(update_package,H_sequential.update_package(geogrid_data=H_sequential.get_geogrid_data()))
+
+class AreaIndicator(Indicator):
+	'''
+	Numeric indicator that reads the geometries of the cells from the geometry store.
+	'''
+	def setup(self):
+		self.name = 'area'
+
+	def return_indicator(self,geogrid_data):
+		return float(sum([geometry.area for geometry in geogrid_data.get_geometry_store().geometries]))
+
+class CountingIndicator(Indicator):
+	'''
+	Numeric indicator that counts how many times it has been evaluated.
+	'''
+	def setup(self,name,value):
+		self.name = name
+		self.value = value
+		self.calls = 0
+
+	def return_indicator(self,geogrid_data):
+		self.calls += 1
+		return self.value
+
+class CompositeTextIndicator(Indicator):
+	'''
+	Textual indicator flagged as composite, which is evaluated on geogrid_data.
+	'''
+	def setup(self):
+		self.name = 'composite_text'
+		self.indicator_type = 'textual'
+		self.is_composite = True
+
+	def return_indicator(self,geogrid_data):
+		return [{'id':cell['id'],'info':'cell'} for cell in geogrid_data[:2]]
+
+class TestCompositeIndicators(unittest.TestCase):
+
+	def setUp(self):
+		self.stub = CityIOStub().start()
+		self.H = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True)
+		self.base = [CountingIndicator('a',1),CountingIndicator('b',3)]
+		self.H.add_indicators(self.base)
+		self.H.add_indicator(CompositeIndicator(lambda values: 10*values['mean_ab'],selected_indicators=['mean_ab'],name='ten_times_mean'),test=False)
+		self.H.add_indicator(CompositeIndicator(lambda values: (values['a']+values['b'])/2,selected_indicators=['a','b'],name='mean_ab'))
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def test_order(self):
+		'''
+		Tests that composites of composites are evaluated after their inputs.
+		'''
+		self.assertEqual(self.H.composite_order(),['mean_ab','ten_times_mean'])
+		values = self.H.get_indicator_values(include_composite=True)
+		self.assertEqual(values['mean_ab'],2)
+		self.assertEqual(values['ten_times_mean'],20)
+
+	def test_single_evaluation(self):
+		'''
+		Tests that each base indicator is evaluated once per update.
+		'''
+		for I in self.base:
+			I.calls = 0
+		self.H.result_cache.invalidate()
+		self.H.update_package()
+		self.H.result_cache.invalidate()
+		self.H.test_indicators()
+		self.assertEqual([I.calls for I in self.base],[2,2])
+
+	def test_non_numeric_composite(self):
+		'''
+		Tests that non-numeric composite indicators get geogrid_data and do not break the numeric composites.
+		'''
+		self.H.add_indicator(CompositeTextIndicator(),test=False)
+		geogrid_data = self.H.get_geogrid_data()
+		package = self.H.update_package(geogrid_data=geogrid_data)
+		self.assertEqual(package['textual'],[{'id':cell['id'],'info':'cell'} for cell in geogrid_data[:2]])
+		numeric = {i['name']:i['value'] for i in package['numeric']}
+		self.assertEqual(numeric['ten_times_mean'],20)
+		self.assertEqual(self.H.composite_order(),['mean_ab','ten_times_mean'])
+		self.H.test_indicators()
+
+	def test_bad_composite(self):
+		'''
+		Tests that a composite indicator returning an invalid value raises an error, and only warns when the Handler is robust.
+		'''
+		self.H.add_indicator(CompositeIndicator(lambda values: [{'value':1}],selected_indicators=['a'],name='nameless'),test=False)
+		with self.assertRaises(TypeError):
+			self.H.update_package()
+		self.H.robust = True
+		with self.assertWarns(UserWarning):
+			package = self.H.update_package()
+		numeric = {i['name']:i['value'] for i in package['numeric']}
+		self.assertEqual(numeric['ten_times_mean'],20)
+		self.assertNotIn('nameless',numeric)
+
+	def test_all_values(self):
+		'''
+		Tests that composite indicators without selected indicators get the values of the composite indicators evaluated before them.
+		'''
+		self.H.add_indicator(CompositeIndicator(lambda values: values['ten_times_mean']+values['a'],name='all_values'),test=False)
+		values = self.H.get_indicator_values(include_composite=True)
+		self.assertEqual(values['all_values'],21)
+
+	def test_circular_dependency(self):
+		self.H.add_indicator(CompositeIndicator(sum,selected_indicators=['loop_b'],name='loop_a'),test=False)
+		self.H.add_indicator(CompositeIndicator(sum,selected_indicators=['loop_a'],name='loop_b'),test=False)
+		with self.assertRaises(NameError):
+			self.H.composite_order()
+
+class TestResultCache(unittest.TestCase):
+
+	def setUp(self):
+		self.stub = CityIOStub().start()
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def make_handler(self,**kwargs):
+		H = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True,**kwargs)
+		self.I = CountingIndicator('counter',1)
+		self.I.cache_results = True
+		H.add_indicator(self.I,test=False)
+		return H
+
+	def test_repeated_grid(self):
+		'''
+		Tests that going back to a previous grid reuses the value instead of calling return_indicator.
+		'''
+		H = self.make_handler()
+		H.update_package()
+		self.stub.table['GEOGRIDDATA'][0]['name'] = 'A'
+		H.update_package()
+		self.stub.table['GEOGRIDDATA'][0]['name'] = 'B'
+		H.update_package()
+		self.assertEqual(self.I.calls,2)
+		self.assertEqual(H.result_cache.stats()['hits'],1)
+		self.assertEqual(H.result_cache.stats()['misses'],2)
+
+	def test_disabled(self):
+		H = self.make_handler(cache_size=0)
+		H.update_package()
+		H.update_package()
+		self.assertEqual(self.I.calls,2)
+
+	def test_opt_in(self):
+		'''
+		Tests that indicators are not cached unless they set cache_results.
+		'''
+		H = self.make_handler()
+		random_indicator = RandomIndicator()
+		H.add_indicator(random_indicator,test=False)
+		first = {i['name']:i['value'] for i in H.update_package()['numeric']}
+		second = {i['name']:i['value'] for i in H.update_package()['numeric']}
+		self.assertEqual(self.I.calls,1)
+		self.assertNotEqual(first['Social Wellbeing'],second['Social Wellbeing'])
+
+	def test_eviction(self):
+		H = self.make_handler(cache_size=1)
+		H.update_package()
+		self.stub.table['GEOGRIDDATA'][0]['name'] = 'A'
+		H.update_package()
+		self.stub.table['GEOGRIDDATA'][0]['name'] = 'B'
+		H.update_package()
+		self.assertEqual(self.I.calls,3)
+		self.assertEqual(H.result_cache.stats()['evictions'],2)
+
+class IncrementalCounter(Indicator):
+	'''
+	Counts the cells of type A, updating the count with the cells that changed.
+	'''
+	def setup(self):
+		self.name = 'count_A'
+		self.changes = []
+
+	def return_indicator(self,geogrid_data):
+		self.changes.append(None)
+		return {cell['id']:cell['name']=='A' for cell in geogrid_data}
+
+	def update_indicator(self,prev_value,changed_cells,geogrid_data):
+		self.changes.append(changed_cells)
+		for cell in geogrid_data:
+			if cell['id'] in changed_cells:
+				prev_value[cell['id']] = cell['name']=='A'
+		return prev_value
+
+class TestIncrementalIndicators(unittest.TestCase):
+
+	def setUp(self):
+		self.stub = CityIOStub().start()
+		self.H = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True,cache_size=0)
+		self.I = IncrementalCounter()
+		self.H.add_indicator(self.I,test=False)
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def test_diff(self):
+		geogrid_data = self.H.get_geogrid_data()
+		previous = geogrid_data.snapshot()
+		geogrid_data[3]['name'] = 'Z'
+		geogrid_data[7]['height'] = 10
+		self.assertEqual(geogrid_data.diff(previous),[3,7])
+		self.assertIsNone(geogrid_data.diff(previous[:-1]))
+
+	def test_changed_cells(self):
+		'''
+		Tests that the hook receives only the cells that changed and that the value matches the full recompute.
+		'''
+		self.H._compute_raw_values(self.H.get_geogrid_data(),['count_A'])
+		self.stub.table['GEOGRIDDATA'][5]['name'] = 'B'
+		geogrid_data = self.H.get_geogrid_data()
+		value = self.H._compute_raw_values(geogrid_data,['count_A'])['count_A'][0]
+		self.assertEqual(self.I.changes,[None,[5]])
+		self.assertEqual(value,self.I.return_indicator(geogrid_data))
+
+class TestConditionalGet(unittest.TestCase):
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def make_handler(self,etags=True,**kwargs):
+		self.stub = CityIOStub(etags=etags).start()
+		return Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True,**kwargs)
+
+	def test_not_modified(self):
+		'''
+		Tests that GEOGRID is not downloaded again when the server answers 304.
+		'''
+		H = self.make_handler()
+		geogrid = H.get_GEOGRID()
+		self.assertIs(H.get_GEOGRID(force_get=True),geogrid)
+		self.assertEqual([r['status'] for r in self.stub.gets('GEOGRID')],[200,304])
+		self.assertIn('If-None-Match',self.stub.gets('GEOGRID')[1]['headers'])
+
+	def test_known_hash(self):
+		'''
+		Tests that GEOGRIDDATA is not requested when its hash was just polled and did not change.
+		'''
+		H = self.make_handler()
+		H.get_grid_hash()
+		first = H.get_GEOGRIDDATA()
+		H.get_grid_hash()
+		second = H.get_GEOGRIDDATA()
+		self.assertEqual(first,second)
+		self.assertIsNot(first,second)
+		self.assertEqual(len(self.stub.gets('GEOGRIDDATA')),1)
+		self.stub.table['GEOGRIDDATA'][0]['name'] = 'A'
+		H.get_grid_hash()
+		self.assertEqual(H.get_GEOGRIDDATA()[0]['name'],'A')
+		self.assertEqual(len(self.stub.gets('GEOGRIDDATA')),2)
+
+	def test_without_validators(self):
+		H = self.make_handler(etags=False)
+		H.get_GEOGRID()
+		H.get_GEOGRID(force_get=True)
+		self.assertEqual([r['status'] for r in self.stub.gets('GEOGRID')],[200,200])
+		self.assertNotIn('If-None-Match',self.stub.gets('GEOGRID')[1]['headers'])
+
+	def test_disabled(self):
+		H = self.make_handler(conditional_get=False)
+		H.get_GEOGRID()
+		H.get_GEOGRID(force_get=True)
+		self.assertEqual([r['status'] for r in self.stub.gets('GEOGRID')],[200,200])
+
+class TestSkipUnchanged(unittest.TestCase):
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def make_handler(self,**kwargs):
+		self.stub = CityIOStub().start()
+		return Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True,**kwargs)
+
+	def test_skip(self):
+		'''
+		Tests that only the endpoints whose payload changed are posted again.
+		'''
+		H = self.make_handler()
+		values = {'numeric':[{'name':'a','value':1}],'textual':[{'id':1,'info':'x'}]}
+		H._post_indicators(values)
+		H._post_indicators(values)
+		values['numeric'][0]['value'] = 2
+		H._post_indicators(values)
+		self.assertEqual([r['path'][-1] for r in self.stub.posts()],['indicators','textual','indicators'])
+		self.assertEqual(self.stub.table['indicators'],values['numeric'])
+		self.assertEqual(H.post_stats['sent'],3)
+		self.assertEqual(H.post_stats['skipped'],3)
+		self.assertEqual(H.post_stats['skipped_bytes'],2*len(H.codec.dumps(values['textual']))+len(H.codec.dumps([{'name':'a','value':1}])))
+		H.reset_post_fingerprints()
+		H._post_indicators(values)
+		self.assertEqual(len(self.stub.posts()),5)
+
+	def test_disabled(self):
+		H = self.make_handler(skip_unchanged=False)
+		values = {'numeric':[{'name':'a','value':1}]}
+		H._post_indicators(values)
+		H._post_indicators(values)
+		self.assertEqual(len(self.stub.posts()),2)
+		self.assertEqual(H.post_stats['skipped'],0)
+
+class TestCompression(unittest.TestCase):
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def test_post(self):
+		'''
+		Tests that only bodies above the threshold are gzipped, and that the bytes saved are counted.
+		'''
+		self.stub = CityIOStub().start()
+		H = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True,compress_posts=True,compress_min_size=100)
+		values = {'numeric':[{'name':f'indicator_{i}','value':i} for i in range(50)],'textual':[{'id':1,'info':'x'}]}
+		H._post_indicators(values)
+		self.assertEqual(self.stub.table['indicators'],values['numeric'])
+		self.assertEqual(self.stub.table['textual'],values['textual'])
+		headers = {r['path'][-1]:r['headers'] for r in self.stub.posts()}
+		self.assertEqual(headers['indicators'].get('Content-Encoding'),'gzip')
+		self.assertNotIn('Content-Encoding',headers['textual'])
+		stats = H.transfer_stats[urljoin(H.cityIO_post_url,'indicators')]
+		self.assertEqual(stats['sent'],1)
+		self.assertEqual(stats['sent_bytes'],len(H.codec.dumps(values['numeric'])))
+		self.assertLess(stats['sent_wire_bytes'],stats['sent_bytes'])
+
+	def test_get(self):
+		self.stub = CityIOStub(compress=True).start()
+		H = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True)
+		self.assertEqual(H.get_GEOGRID()['features'],self.stub.table['GEOGRID']['features'])
+		self.assertIn('gzip',self.stub.gets('GEOGRID')[0]['headers']['Accept-Encoding'])
+		stats = H.transfer_stats[H.cityIO_GEOGRID_get_url]
+		self.assertLess(stats['received_wire_bytes'],stats['received_bytes'])
+
+class TestColumnarGEOGRIDDATA(unittest.TestCase):
+
+	def setUp(self):
+		self.cells = [dict(f['properties']) for f in make_geogrid(4,4)['features']]
+		del self.cells[3]['interactive']
+		self.cells[4]['extra'] = [1,2]
+
+	def test_same_content(self):
+		'''
+		Tests that the columnar object behaves as the list of dictionaries it was built from.
+		'''
+		A = GEOGRIDDATA(deepcopy(self.cells))
+		B = ColumnarGEOGRIDDATA(deepcopy(self.cells))
+		self.assertEqual(A,B)
+		self.assertEqual(B.to_records(),self.cells)
+		self.assertEqual(list(B.types_array()),list(A.types_array()))
+		self.assertTrue((A.ids_array()==B.ids_array()).all())
+		self.assertTrue((A.heights_array()==B.heights_array()).all())
+		self.assertTrue((A.colors_array()==B.colors_array()).all())
+		self.assertTrue((A.interactive_array()==B.interactive_array()).all())
+		self.assertNotIn('interactive',B[3])
+		self.assertEqual(B[4]['extra'],[1,2])
+
+	def test_zero_copy(self):
+		B = ColumnarGEOGRIDDATA(self.cells)
+		self.assertFalse(B.type_codes_array().flags.writeable)
+		self.assertTrue(np.shares_memory(B.type_codes_array(),B.type_codes_array()))
+		categories = B.type_categories()
+		self.assertEqual([categories[c] for c in B.type_codes_array()],[cell['name'] for cell in self.cells])
+
+	def test_writes(self):
+		B = ColumnarGEOGRIDDATA(self.cells)
+		B[0]['name'] = 'New type'
+		B[1]['height'] = 2.5
+		B[2]['height'] = 'tall'
+		del B[5]['color']
+		self.assertEqual(B[0]['name'],'New type')
+		self.assertEqual(B.types_array()[0],'New type')
+		self.assertEqual(B[1]['height'],2.5)
+		self.assertEqual(B[2]['height'],'tall')
+		self.assertNotIn('color',B[5])
+		self.assertEqual(list(B.colors_array()[5]),[0,0,0,0])
+
+	def test_list_operations(self):
+		B = ColumnarGEOGRIDDATA(self.cells)
+		B.append({'id':99,'name':'A'})
+		del B[0]
+		B.insert(0,B.pop())
+		self.assertEqual(list(B.ids_array()[:3]),[99,1,2])
+		self.assertEqual(len(B.ids_array()),len(self.cells))
+		self.assertEqual(pickle.loads(pickle.dumps(B)).to_records(),B.to_records())
+		self.assertEqual(deepcopy(B).to_records(),B.to_records())
+
+	def test_handler(self):
+		'''
+		Tests that indicators return the same values when the Handler uses the columnar representation.
+		'''
+		stub = CityIOStub().start()
+		try:
+			packages = []
+			for columnar in [False,True]:
+				H = Handler('stub_table',host_name=stub.host,shell_mode=True,quietly=True,columnar=columnar)
+				H.add_indicator(Diversity())
+				self.assertEqual(isinstance(H.get_geogrid_data(),ColumnarGEOGRIDDATA),columnar)
+				packages.append(H.update_package())
+			self.assertEqual(packages[0],packages[1])
+		finally:
+			stub.stop()
+
+class InputIndicator(Indicator):
+	'''
+	Numeric indicator that keeps the geogrid_data it receives.
+	'''
+	def setup(self,name,requires_geometry=False,requires_geogrid_props=False):
+		self.name = name
+		self.requires_geometry = requires_geometry
+		self.requires_geogrid_props = requires_geogrid_props
+		self.inputs = []
+
+	def return_indicator(self,geogrid_data):
+		self.inputs.append(geogrid_data)
+		return len(geogrid_data)
+
+class TestIndicatorInputs(unittest.TestCase):
+
+	def test_views(self):
+		'''
+		Tests that each indicator only gets the geometries and properties it declared, with both storages.
+		'''
+		stub = CityIOStub(nrows=3,ncols=3).start()
+		try:
+			for columnar in [False,True]:
+				H = Handler('stub_table',host_name=stub.host,shell_mode=True,quietly=True,columnar=columnar)
+				plain = InputIndicator('plain')
+				geometry = InputIndicator('geometry',requires_geometry=True)
+				props = InputIndicator('props',requires_geogrid_props=True)
+				H.add_indicators([plain,geometry,props],test=False)
+				geogrid_data = H.get_geogrid_data()
+				H.update_package(geogrid_data=geogrid_data)
+				self.assertIs(plain.inputs[-1],geogrid_data)
+				self.assertTrue(all(['geometry' not in cell and 'properties' not in cell for cell in geogrid_data]))
+				features = stub.table['GEOGRID']['features']
+				self.assertEqual([cell['geometry'] for cell in geometry.inputs[-1]],[f['geometry'] for f in features])
+				self.assertTrue(all(['properties' not in cell for cell in geometry.inputs[-1]]))
+				types = H.get_GEOGRID()['properties']['types']
+				self.assertEqual([cell['properties'] for cell in props.inputs[-1]],[types[cell['name']] for cell in geogrid_data])
+				self.assertIs(props.inputs[-1].GEOGRID,geogrid_data.GEOGRID)
+				self.assertEqual(isinstance(props.inputs[-1],ColumnarGEOGRIDDATA),columnar)
+		finally:
+			stub.stop()
+
+	def test_shared_views(self):
+		'''
+		Tests that each variant is built once per update and shared among indicators with the same requirements.
+		'''
+		stub = CityIOStub(nrows=3,ncols=3).start()
+		try:
+			H = Handler('stub_table',host_name=stub.host,shell_mode=True,quietly=True)
+			first = InputIndicator('first',requires_geometry=True)
+			second = InputIndicator('second',requires_geometry=True)
+			both = InputIndicator('both',requires_geometry=True,requires_geogrid_props=True)
+			H.add_indicators([first,second,both],test=False)
+			geogrid_data = H.get_geogrid_data()
+			H.update_package(geogrid_data=geogrid_data)
+			self.assertIs(first.inputs[-1],second.inputs[-1])
+			self.assertIsNot(first.inputs[-1],geogrid_data)
+			self.assertTrue(all(['properties' not in cell for cell in first.inputs[-1]]))
+			self.assertTrue(all(['geometry' in cell and 'properties' in cell for cell in both.inputs[-1]]))
+
+			# Variants are not kept from one update to the next
+			H.update_package(geogrid_data=H.get_geogrid_data())
+			self.assertIs(first.inputs[-1],second.inputs[-1])
+			self.assertIsNot(first.inputs[-1],first.inputs[0])
+		finally:
+			stub.stop()
+
+class TestGEOGRIDDATAFrames(unittest.TestCase):
+
+	def setUp(self):
+		self.stub = CityIOStub().start()
+		self.H = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True)
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def test_variants(self):
+		geogrid_data = self.H.get_geogrid_data(with_properties=True)
+		df = geogrid_data.as_df()
+		self.assertIn('LBCS_1000',df.columns)
+		self.assertNotIn('geometry',df.columns)
+		self.assertIn('property_LBCS',geogrid_data.as_df(expand_classifications=False).columns)
+		geo_df = geogrid_data.as_df(include_geometries=True)
+		self.assertEqual(geo_df.columns[-1],'geometry')
+		self.assertEqual(list(geo_df['id']),list(df['id']))
+
+	def test_cached(self):
+		'''
+		Tests that frames are built once and that copies do not modify the cached frame.
+		'''
+		geogrid_data = self.H.get_geogrid_data()
+		cached = geogrid_data.as_df(include_geometries=True,copy=False)
+		self.assertIs(geogrid_data.as_df(include_geometries=True,copy=False),cached)
+		df = geogrid_data.as_df(include_geometries=True)
+		df.loc[0,'height'] = 100
+		self.assertEqual(cached.loc[0,'height'],1)
+		other = self.H.get_geogrid_data()
+		self.assertIs(other.as_df(include_geometries=True,copy=False)['geometry'].iloc[0],cached['geometry'].iloc[0])
+		geogrid_data.df = None
+		self.assertIsNot(geogrid_data.as_df(include_geometries=True,copy=False),cached)
+
+class TestGeometryStore(unittest.TestCase):
+
+	def setUp(self):
+		self.stub = CityIOStub().start()
+		self.H = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True)
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def test_store(self):
+		GEOGRID = make_geogrid(nrows=3,ncols=4)
+		store = GeometryStore(GEOGRID)
+		self.assertEqual(len(store),12)
+		self.assertEqual(store.index[5],5)
+		self.assertTrue(store.geometries[5].equals(shape(GEOGRID['features'][5]['geometry'])))
+		np.testing.assert_allclose(store.centroids[0],[-70.9995,41.9995])
+		np.testing.assert_allclose(store.total_bounds,[-71.0,41.997,-70.996,42.0])
+		self.assertEqual(len(store.edges()),3*3+4*2)
+		self.assertIn((0,1),store.edges())
+		self.assertEqual(list(store.within(store.geometries[5].buffer(0.0001))),[i==5 for i in range(12)])
+
+	def test_mixed_geometries(self):
+		'''
+		Tests that grids that cannot be built in a single call are parsed cell by cell.
+		'''
+		GEOGRID = make_geogrid(nrows=2,ncols=2)
+		GEOGRID['features'][0]['geometry']['coordinates'][0].insert(1,[-71.0,41.9995])
+		store = GeometryStore(GEOGRID)
+		for geometry,cell in zip(store.geometries,GEOGRID['features']):
+			self.assertTrue(geometry.equals(shape(cell['geometry'])))
+
+	def test_topology(self):
+		'''
+		Tests that rotated grids and grids without header give the same neighbors as the original grid.
+		'''
+		GEOGRID = make_geogrid(nrows=5,ncols=6)
+		expected = {n:set(map(frozenset,GeometryStore(GEOGRID).edges(neighborhood=n))) for n in [4,8]}
+		self.assertEqual(len(expected[4]),5*5+4*6)
+		self.assertEqual(len(expected[8]),5*5+4*6+2*4*5)
+		for cell in GEOGRID['features']:
+			rotated = affinity.rotate(shape(cell['geometry']),30,origin=(-71,42))
+			cell['geometry']['coordinates'] = [[list(c) for c in rotated.exterior.coords]]
+		for header in [True,False]:
+			if not header:
+				del GEOGRID['properties']['header']
+			store = GeometryStore(GEOGRID)
+			for n in [4,8]:
+				self.assertEqual(set(map(frozenset,store.edges(neighborhood=n))),expected[n])
+		indptr,indices = store.neighbor_rows()
+		self.assertEqual(sorted(indices[indptr[7]:indptr[8]]),[1,6,8,13])
+
+	def test_shared(self):
+		'''
+		Tests that the store is built once per GEOGRID and shared with the GEOGRIDDATA objects.
+		'''
+		store = self.H.get_geometry_store()
+		geogrid_data = self.H.get_geogrid_data(include_geometries=True)
+		self.assertIs(geogrid_data.get_geometry_store(),store)
+		self.assertIs(geogrid_data.as_df(copy=False)['geometry'].iloc[3],store.geometries[3])
+		self.H.get_GEOGRID(force_get=True)
+		self.assertIs(self.H.get_geometry_store(),store)
+		self.stub.table['GEOGRID'] = make_geogrid(cell_size=0.002)
+		self.H.get_GEOGRID(force_get=True)
+		self.assertIsNot(self.H.get_geometry_store(),store)
+		self.assertEqual(self.H.get_geometry_store().total_bounds[2],-70.98)
+
+class TestGridGraph(unittest.TestCase):
+
+	def setUp(self):
+		GEOGRID = make_geogrid(nrows=6,ncols=5)
+		self.geogrid_data = GEOGRIDDATA([dict(cell['properties']) for cell in GEOGRID['features']])
+		self.geogrid_data.set_geogrid(GEOGRID)
+		self.geogrid_data.set_geogrid_edges(self.geogrid_data.get_geometry_store().edges())
+
+	def test_traversal(self):
+		'''
+		Tests that the sparse backend gives the same distances as networkx.
+		'''
+		G = self.geogrid_data.as_graph()
+		graph = self.geogrid_data.as_graph(backend='sparse')
+		self.assertIs(graph,self.geogrid_data.get_geometry_store().graph())
+		self.assertEqual(sorted(graph.neighbors(6)),[1,5,7,11])
+		for cutoff in [None,2]:
+			self.assertEqual(graph.hop_distances(12,cutoff=cutoff),nx.single_source_shortest_path_length(G,12,cutoff=cutoff))
+		self.assertEqual(sorted(graph.k_hop(0,1)),[0,1,5])
+		self.assertEqual(graph.to_networkx().number_of_edges(),G.number_of_edges())
+
+	def test_clusters(self):
+		for cell in self.geogrid_data:
+			cell['name'] = 'A' if (cell['id']%5<2) or (cell['id']==24) else 'B'
+		clusters = self.geogrid_data.type_clusters().set_index('id')
+		self.assertEqual(clusters['cluster'].nunique(),3)
+		self.assertEqual(clusters.loc[0,'cluster'],clusters.loc[26,'cluster'])
+		self.assertNotEqual(clusters.loc[24,'cluster'],clusters.loc[0,'cluster'])
+		self.assertEqual(clusters.loc[29,'cluster'],clusters.loc[2,'cluster'])
+		self.assertEqual(len(self.geogrid_data.type_clusters(neighborhood=8).groupby('cluster')),3)
+
+class TestValidation(unittest.TestCase):
+
+	def make_grid_data(self,cls=GEOGRIDDATA):
+		GEOGRID = make_geogrid(nrows=3,ncols=3)
+		cells = [dict(cell['properties']) for cell in GEOGRID['features']]
+		geogrid_data = cls(cells[:2]+cells[3:]+[dict(cells[4]),dict(cells[5],id=20,name='C')])
+		geogrid_data.set_geogrid(GEOGRID)
+		return geogrid_data
+
+	def test_report(self):
+		geogrid_data = self.make_grid_data()
+		report = geogrid_data.validate()
+		self.assertFalse(report['valid'])
+		self.assertEqual(report['missing_ids'],[2])
+		self.assertEqual(report['duplicate_ids'],[4])
+		self.assertEqual(report['unknown_ids'],[20])
+		self.assertEqual(report['unknown_types'],['C'])
+		self.assertEqual(report['valid_ids'],geogrid_data.check_id_validity())
+		self.assertEqual(report['valid_types'],geogrid_data.check_type_validity(raise_error=False))
+
+	def test_fill(self):
+		'''
+		Tests that missing cells are filled from GEOGRID without sharing their properties.
+		'''
+		for cls in [GEOGRIDDATA,ColumnarGEOGRIDDATA]:
+			geogrid_data = self.make_grid_data(cls)
+			report = geogrid_data.validate(fill_missing=True)
+			self.assertEqual(report['filled'],1)
+			self.assertEqual(geogrid_data[-1]['id'],2)
+			self.assertEqual(geogrid_data.validate()['missing_ids'],[])
+			geogrid_data[-1]['name'] = 'A'
+			self.assertEqual(geogrid_data.GEOGRID['features'][2]['properties']['name'],'B')
+
+class TestTypeTable(unittest.TestCase):
+
+	def make_grid_data(self,cls=GEOGRIDDATA):
+		GEOGRID = make_geogrid(nrows=2,ncols=2)
+		cells = [dict(cell['properties']) for cell in GEOGRID['features']]
+		cells[0]['color'] = [1,2,3,50]
+		cells[1]['color'] = [1,2,3,60]
+		cells[3]['name'] = 'None'
+		geogrid_data = cls(cells)
+		geogrid_data.set_geogrid(GEOGRID)
+		return geogrid_data
+
+	def test_table(self):
+		table = TypeTable(make_geogrid())
+		self.assertEqual(table.types,['A','B','None'])
+		self.assertEqual(table.colors.tolist(),[[255,0,0,255],[0,255,0,200],[0,0,0,0]])
+		self.assertEqual(table.color_lengths.tolist(),[3,4,4])
+		self.assertEqual(table.interactive,['Web',None,None])
+		self.assertEqual(table.codes(['B','A','X']).tolist(),[1,0,2])
+
+	def test_remap(self):
+		'''
+		Tests that types colors are applied, that cells keep their transparency, and that both storages give the same result.
+		'''
+		results = []
+		for cls in [GEOGRIDDATA,ColumnarGEOGRIDDATA]:
+			geogrid_data = self.make_grid_data(cls)
+			geogrid_data.remap_colors()
+			geogrid_data.remap_interactive()
+			results.append(geogrid_data.to_records())
+		self.assertEqual([cell['color'] for cell in results[0]],[[0,255,0,50],[255,0,0,60],[255,0,0],[0,0,0,0]])
+		self.assertEqual([cell.get('interactive') for cell in results[0]],[None,'Web','Web',None])
+		self.assertEqual(results[0],results[1])
+
+	def test_rebuild(self):
+		geogrid_data = self.make_grid_data()
+		table = geogrid_data.get_type_table()
+		self.assertIs(geogrid_data.get_type_table(),table)
+		geogrid_data.GEOGRID['properties']['types']['B']['color'] = '#0000ff'
+		geogrid_data.remap_colors()
+		self.assertIsNot(geogrid_data.get_type_table(),table)
+		self.assertEqual(geogrid_data[0]['color'],[0,0,255,50])
+
+class PointIndicator(Indicator):
+	def setup(self):
+		self.name = 'dynamic'
+		self.indicator_type = 'heatmap'
+	def return_indicator(self,geogrid_data):
+		return [{'type':'Feature','geometry':{'type':'Point','coordinates':[-71.2,42.4]},'properties':{'b':1}}]
+
+class TestHeatmapMerge(unittest.TestCase):
+
+	def make_heatmap(self,points):
+		return {'type':'FeatureCollection','features':[{'type':'Feature','geometry':{'type':'Point','coordinates':list(c)},'properties':p} for c,p in points]}
+
+	def test_merge(self):
+		'''
+		Tests that points are matched by coordinates, that properties are outer-joined, and that the last heatmap wins.
+		'''
+		first = self.make_heatmap([((-71.1,42.3),{'a':1,'b':2}),((-71.2,42.4),{'a':3})])
+		second = self.make_heatmap([((-71.2,42.4+1e-9),{'c':4}),((-71.3,42.5),{'c':5,'a':6})])
+		merged = merge_heatmaps([first,second],none_character='x')
+		self.assertEqual(merged['properties'],['a','b','c'])
+		self.assertEqual([f['geometry']['coordinates'] for f in merged['features']],[[-71.1,42.3],[-71.2,42.4],[-71.3,42.5]])
+		self.assertEqual([f['properties'] for f in merged['features']],[[1,2,'x'],[3,'x',4],[6,'x',5]])
+		self.assertEqual(merge_heatmaps([])['features'],[])
+
+	def test_errors(self):
+		heatmap = self.make_heatmap([((-71.1,42.3),{'a':1})])
+		heatmap['features'][0]['geometry'] = {'type':'LineString','coordinates':[[-71.1,42.3],[-71.2,42.4]]}
+		with self.assertRaises(NameError):
+			merge_heatmaps([heatmap])
+		heatmap['features'][0]['geometry'] = None
+		with self.assertRaises(NameError):
+			merge_heatmaps([heatmap])
+
+	def test_frame(self):
+		'''
+		Tests that frames and geojsons merge into the same heatmap, and that GeoDataFrames keep their missing values as null.
+		'''
+		gdf = gpd.GeoDataFrame({'a':[1.0,np.nan],'b':[2,3]},geometry=gpd.points_from_xy([-71.1,-71.2],[42.3,42.4]))
+		frame = HeatmapFrame.from_geodataframe(gdf)
+		self.assertEqual(frame.properties,['a','b'])
+		self.assertEqual(frame.to_geojson()['features'][1]['properties'],{'a':None,'b':3})
+		other = self.make_heatmap([((-71.2,42.4),{'c':4})])
+		merged = merge_heatmaps([frame,other])
+		self.assertEqual(merged,merge_heatmaps([frame.to_geojson(),other]))
+		self.assertEqual([f['properties'] for f in merged['features']],[[1.0,2,0],[None,3,4]])
+		self.assertIsInstance(merge_heatmaps([frame,other],as_frame=True),HeatmapFrame)
+		with self.assertRaises(NameError):
+			HeatmapFrame([0,1],[0,1],{'a':[1]})
+
+	def test_static_heatmap(self):
+		gdf = gpd.GeoDataFrame({'a':[1.0,3.0,5.0],'b':[2.0,np.nan,4.0]},geometry=gpd.points_from_xy([-71.1,-71.2,-71.3],[42.3,42.4,42.5]))
+		I = StaticHeatmap(gdf,columns=['a','b'],name='static')
+		H = Handler('x',shell_mode=True,quietly=True)
+		H.add_indicator(I,test=False)
+		new_value = H._new_value(None,'static')
+		self.assertIs(new_value[0],I.heatmap)
+		merged = H._combine_heatmap_values(new_value)
+		self.assertEqual(merged['properties'],['a','b'])
+		self.assertEqual([f['properties'] for f in merged['features']],[[0.0,0.0],[0.5,None],[1.0,1.0]])
+
+	def test_static_cached(self):
+		'''
+		Tests that static heatmaps are evaluated once and merged with the dynamic heatmaps on every update.
+		'''
+		gdf = gpd.GeoDataFrame({'a':[1.0,3.0]},geometry=gpd.points_from_xy([-71.1,-71.2],[42.3,42.4]))
+		I = StaticHeatmap(gdf,columns=['a'],name='static')
+		calls = []
+		I.return_indicator = lambda geogrid_data: calls.append(1) or I.heatmap
+		D = PointIndicator()
+		H = Handler('x',shell_mode=True,quietly=True)
+		H.add_indicators([I,D],test=False)
+		H.result_cache.max_size = 0
+		for i in range(3):
+			merged = H._package_values(H._evaluate_indicators(None))['heatmap']
+		self.assertEqual(len(calls),1)
+		self.assertEqual(merged['properties'],['a','b'])
+		self.assertEqual([f['properties'] for f in merged['features']],[[0.0,0],[1.0,1]])
+		H.none_character = None
+		merged = H._package_values(H._evaluate_indicators(None))['heatmap']
+		self.assertEqual(len(calls),2)
+		self.assertEqual(merged['features'][0]['properties'],[0.0,None])
+
 if __name__ == '__main__':
 	unittest.main()
\ No newline at end of file
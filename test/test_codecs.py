@@ -0,0 +1,59 @@
+import unittest
+import json
+import numpy as np
+from collections import defaultdict
+from brix import Handler, JSONCodec, get_codec
+from brix.codecs import is_json_value
+from cityio_stub import CityIOStub
+
+class TestCodecs(unittest.TestCase):
+
+	def test_numpy(self):
+		'''
+		Tests that every available codec serializes numpy values and dict subclasses like the standard library does with python values.
+		'''
+		payload = {'value':np.float32(0.5),'count':np.int64(3),'values':np.arange(3),'flags':np.array([True,False]),'properties':defaultdict(int,{'a':1})}
+		expected = {'value':0.5,'count':3,'values':[0,1,2],'flags':[True,False],'properties':{'a':1}}
+		for name in ['json','orjson','ujson']:
+			try:
+				codec = get_codec(name)
+			except NameError:
+				continue
+			self.assertEqual(json.loads(codec.dumps(payload)),expected)
+			self.assertEqual(codec.loads(codec.dumps(expected).encode('utf-8')),expected)
+
+	def test_get_codec(self):
+		codec = JSONCodec()
+		self.assertIs(get_codec(codec),codec)
+		self.assertEqual(get_codec().name,'json')
+		with self.assertRaises(NameError):
+			get_codec('pickle')
+
+	def test_is_json_value(self):
+		self.assertTrue(is_json_value([1,np.float64(2),{'a':None}]))
+		self.assertFalse(is_json_value({'a':object()}))
+		self.assertFalse(is_json_value({1:2}))
+
+	def test_nan(self):
+		'''
+		Tests that the default codec keeps the payloads of the standard library.
+		'''
+		payload = [{'name':'a','value':float('nan')},{1:2}]
+		self.assertEqual(get_codec().dumps(payload),json.dumps(payload))
+
+	def test_handler(self):
+		'''
+		Tests that the Handler posts and reads payloads with the selected codec.
+		'''
+		stub = CityIOStub().start()
+		try:
+			H = Handler('stub_table',host_name=stub.host,shell_mode=True,quietly=True,codec='json')
+			self.assertEqual(H.codec.name,'json')
+			H._post_indicators({'numeric':[{'name':'a','value':np.int64(1)}]})
+			self.assertEqual(stub.table['indicators'],[{'name':'a','value':1}])
+			self.assertEqual(len(H.get_GEOGRID()['features']),len(stub.table['GEOGRID']['features']))
+		finally:
+			stub.stop()
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+from brix import Handler, BackoffPolicy, RestModePolicy
+from cityio_stub import CityIOStub
+
+class TestBackoffPolicy(unittest.TestCase):
+
+	def test_backoff(self):
+		'''
+		Tests that idle polls back off up to the cap and that a change resets the sleep time.
+		'''
+		P = BackoffPolicy(min_sleep=0.5,max_sleep=4,active_time=0,jitter=0)
+		sleep_times = []
+		for i in range(5):
+			P.on_idle()
+			sleep_times.append(P.sleep_time())
+		self.assertEqual(sleep_times,[1,2,4,4,4])
+		P.on_change()
+		self.assertEqual(P.sleep_time(),0.5)
+
+	def test_errors(self):
+		'''
+		Tests that failed polls keep backing off until the hashes are retrieved again.
+		'''
+		P = BackoffPolicy(min_sleep=0.5,max_sleep=4,jitter=0)
+		P.on_error()
+		P.on_idle()
+		P.on_error()
+		P.on_idle()
+		self.assertEqual(P.sleep_time(),2)
+		P.on_error()
+		self.assertEqual(P.sleep_time(),4)
+		P.on_success()
+		self.assertEqual(P.sleep_time(),0.5)
+
+	def test_jitter(self):
+		P = BackoffPolicy(min_sleep=1,jitter=0.2)
+		sleep_times = [P.sleep_time() for i in range(100)]
+		self.assertTrue(all([(0.8<=s<=1.2) for s in sleep_times]))
+		self.assertGreater(len(set(sleep_times)),1)
+
+class TestHandlerPolicy(unittest.TestCase):
+
+	def setUp(self):
+		self.stub = CityIOStub().start()
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def test_default(self):
+		H = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True)
+		self.assertIsInstance(H.poll_policy,RestModePolicy)
+		self.assertEqual(H.sleep_time(),H.sleep_time_short)
+		H.active_start -= H.total_active_time
+		H.check_rest()
+		self.assertEqual(H.sleep_time(),H.sleep_time_long)
+		H.wake_up()
+		self.assertEqual(H.sleep_time(),H.sleep_time_short)
+
+	def test_stats(self):
+		H = Handler('stub_table',host_name=self.stub.host,shell_mode=True,quietly=True,poll_policy=BackoffPolicy())
+		for i in range(3):
+			H.get_grid_hash()
+		stats = H.poll_stats()
+		self.assertEqual(stats['n_polls'],3)
+		self.assertEqual(stats['n_polls'],len(self.stub.gets('hashes')))
+		self.assertGreater(stats['polls_per_minute'],0)
+
+	def test_connection_error(self):
+		'''
+		Tests that a request that fails counts as an error and keeps the last hash.
+		'''
+		host = self.stub.host
+		self.stub.stop()
+		H = Handler('stub_table',host_name=host,shell_mode=True,quietly=True,poll_policy=BackoffPolicy(min_sleep=0.5,jitter=0))
+		H.grid_hash_id = 'last'
+		for i in range(2):
+			self.assertEqual(H.get_grid_hash(),'last')
+			H.check_rest()
+		self.assertEqual(H.poll_stats()['n_errors'],2)
+		self.assertEqual(H.sleep_time(),2)
+		self.stub = CityIOStub().start()
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from time import sleep
+from threading import Thread
+from brix import Handler, HandlerPool
+from brix.examples import Diversity
+from cityio_stub import CityIOStub
+
+class TestHandlerPool(unittest.TestCase):
+
+	def setUp(self):
+		self.stub = CityIOStub().start()
+
+	def tearDown(self):
+		self.stub.stop()
+
+	def make_handler(self,table_name):
+		H = Handler(table_name,host_name=self.stub.host,shell_mode=True,quietly=True)
+		H.add_indicator(Diversity())
+		return H
+
+	def test_update_on_change(self):
+		'''
+		Tests that the pool performs the initial update of every table and updates them again when the grid changes.
+		'''
+		pool = HandlerPool([self.make_handler(f'table_{i}') for i in range(3)],max_polls_per_second=20)
+		pool.listen(new_thread=True)
+		sleep(1.5)
+		self.stub.table['GEOGRIDDATA'][0]['name'] = 'A'
+		sleep(1.5)
+		pool.stop()
+		pool.join()
+		status = pool.status()
+		self.assertEqual(set(status.keys()),set(['table_0','table_1','table_2']))
+		for table_name in status:
+			self.assertEqual(status[table_name]['n_updates'],2)
+			self.assertEqual(status[table_name]['grid_hash_id'],self.stub.hash('GEOGRIDDATA'))
+
+	def test_restart_crashed(self):
+		'''
+		Tests that a table whose update raises an error is restarted.
+		'''
+		H = self.make_handler('crashing_table')
+		perform_update = H.perform_update
+		calls = []
+		def crashing_update(*args,**kwargs):
+			calls.append(1)
+			if len(calls)==1:
+				raise NameError('Simulated crash')
+			return perform_update(*args,**kwargs)
+		H.perform_update = crashing_update
+
+		pool = HandlerPool([H],robust=False,restart_delay=0.2)
+		pool.listen(new_thread=True)
+		sleep(1)
+		pool.stop()
+		pool.join()
+		status = pool.status()['crashing_table']
+		self.assertEqual(status['n_restarts'],1)
+		self.assertEqual(status['n_updates'],1)
+		self.assertIn(status['state'],['idle','polling'])
+
+	def test_add_while_listening(self):
+		'''
+		Tests that a table added from another thread starts when the pool listens in the thread that called listen.
+		'''
+		pool = HandlerPool(max_polls_per_second=20)
+		thread = Thread(target=pool.listen)
+		thread.start()
+		sleep(0.2)
+		pool.add_handler(self.make_handler('late_table'))
+		sleep(1)
+		pool.stop()
+		thread.join()
+		status = pool.status()['late_table']
+		self.assertEqual(status['n_updates'],1)
+		self.assertNotEqual(status['state'],'starting')
+
+if __name__ == '__main__':
+	unittest.main()